@@ -1,12 +1,31 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import Optional, Dict, Any, List, Union
+from urllib.parse import urlsplit
+
+
+def _check_webhook_scheme(url):
+    # The resolved address is checked by jobs.check_webhook_url when the job is queued
+    if url is not None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError("webhook_url must be an http(s) URL")
+    return url
 
 class UserRequest(BaseModel):
     prompt: str
+    session_id: Optional[str] = None
+    # /jobs routes only: POSTed the finished job
+    webhook_url: Optional[str] = None
+    validate_webhook_url = field_validator("webhook_url")(_check_webhook_scheme)
 
 class ClarrifyingUserReq(BaseModel):
     prompt: str
     clarrifying_answers: str
+    # Returned by /generate-iternary; lets this call reuse the Reddit crawl, summary and forecast
+    session_id: Optional[str] = None
+    # /jobs routes only: POSTed the finished job
+    webhook_url: Optional[str] = None
+    validate_webhook_url = field_validator("webhook_url")(_check_webhook_scheme)
     
 class StoryTelling(BaseModel):
     iternary: dict
@@ -0,0 +1,355 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+from metrics import CACHE_LOOKUPS
+
+# memory: per-process LRU only; sqlite: file shared by the workers on this host;
+# redis: any Redis-protocol server, comma-separated URLs are sharded; off: no caching
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite").lower()
+CACHE_SQLITE_PATH = os.getenv(
+    "CACHE_SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "shared_cache.sqlite3")
+)
+# Map the SQLite file into every worker's address space, so reads skip the read() syscalls
+CACHE_SQLITE_MMAP_BYTES = int(os.getenv("CACHE_SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+CACHE_REDIS_URLS = os.getenv("CACHE_REDIS_URLS", "redis://127.0.0.1:6379/0")
+CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5"))
+# Virtual nodes per shard on the consistent-hash ring
+CACHE_SHARD_REPLICAS = int(os.getenv("CACHE_SHARD_REPLICAS", "100"))
+# Per-process LRU in front of the shared backend
+CACHE_LOCAL_ITEMS = int(os.getenv("CACHE_LOCAL_ITEMS", "1024"))
+
+
+class CacheBackendError(Exception):
+    pass
+
+
+# What a shared backend may raise; callers degrade to a miss on these
+CACHE_ERRORS = (sqlite3.Error, OSError, CacheBackendError)
+
+
+class LRUBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_items=CACHE_LOCAL_ITEMS):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            expires_at, text = entry
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return text
+
+    def set(self, key, text, ttl, tag=None):
+        with self._lock:
+            self._items[key] = (time.time() + ttl, text)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class SQLiteBackend:
+    """
+    SQLite file shared by every worker on the host.
+    WAL mode lets several uvicorn workers read while one writes, and the file
+    is memory-mapped so hot reads come straight from the page cache.
+    `tag` (e.g. the LLM call site) is stored for inspection only.
+    """
+
+    PURGE_EVERY = 200  # writes between expired-row cleanups
+
+    def __init__(self, path=CACHE_SQLITE_PATH, table="cache", mmap_bytes=CACHE_SQLITE_MMAP_BYTES):
+        self.path = path
+        self.table = table
+        self.mmap_bytes = mmap_bytes
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, call_site TEXT, text TEXT, expires_at REAL)"
+        )
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            f"SELECT text, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key, text, ttl, tag=None):
+        conn = self._conn()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, call_site, text, expires_at) VALUES (?, ?, ?, ?)",
+            (key, tag, text, time.time() + ttl)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (time.time(),))
+        conn.commit()
+
+    def delete(self, key):
+        conn = self._conn()
+        conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        conn.commit()
+
+
+class RedisBackend:
+    """
+    Minimal client for a Redis-protocol (RESP2) server: GET, SET ... EX, DEL.
+    Works against Redis, Valkey, KeyDB or a local stand-in; one connection per
+    thread, reconnected once if the server dropped it.
+    """
+
+    def __init__(self, url=CACHE_REDIS_URLS.split(",")[0], timeout=CACHE_REDIS_TIMEOUT):
+        parsed = urlparse(url.strip())
+        self.url = url.strip()
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        self._local.conn = conn
+        if self.password:
+            self._send(conn, "AUTH", self.password)
+        if self.db:
+            self._send(conn, "SELECT", self.db)
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            try:
+                conn[1].close()
+                conn[0].close()
+            except OSError:
+                pass
+
+    def _send(self, conn, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        conn[0].sendall(b"".join(parts))
+        return self._read(conn[1])
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError(f"connection to {self.url} closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode("utf-8")
+        if kind == b"-":
+            raise CacheBackendError(body.decode("utf-8"))
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = reader.read(size + 2)
+            return data[:-2].decode("utf-8")
+        if kind == b"*":
+            size = int(body)
+            return None if size < 0 else [self._read(reader) for _ in range(size)]
+        raise CacheBackendError(f"unexpected reply from {self.url}: {line[:20]!r}")
+
+    def command(self, *args):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                return self._send(conn, *args)
+            except OSError:
+                # Server restarted or dropped the idle connection; retry once on a fresh one
+                self._close()
+        try:
+            return self._send(self._connect(), *args)
+        except OSError:
+            self._close()
+            raise
+
+    def get(self, key):
+        return self.command("GET", key)
+
+    def set(self, key, text, ttl, tag=None):
+        self.command("SET", key, text, "EX", max(1, int(ttl)))
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+
+class ShardedBackend:
+    """
+    Spreads keys over several backends (one per node) with a consistent-hash
+    ring, so adding or removing a node only remaps ~1/N of the keys.
+    """
+
+    def __init__(self, backends, replicas=CACHE_SHARD_REPLICAS):
+        self.backends = list(backends)
+        self._ring = []
+        for index, backend in enumerate(self.backends):
+            name = getattr(backend, "url", None) or f"shard-{index}"
+            for replica in range(replicas):
+                self._ring.append((self._hash(f"{name}#{replica}"), index))
+        self._ring.sort()
+        self._points = [point for point, _ in self._ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    def shard_for(self, key):
+        i = bisect.bisect(self._points, self._hash(key)) % len(self._ring)
+        return self.backends[self._ring[i][1]]
+
+    def get(self, key):
+        return self.shard_for(key).get(key)
+
+    def set(self, key, text, ttl, tag=None):
+        self.shard_for(key).set(key, text, ttl, tag)
+
+    def delete(self, key):
+        self.shard_for(key).delete(key)
+
+
+def create_backend(kind=CACHE_BACKEND):
+    """The shared backend CACHE_BACKEND selects, or None for memory-only/off."""
+    if kind == "sqlite":
+        return SQLiteBackend()
+    if kind == "redis":
+        nodes = [RedisBackend(url) for url in CACHE_REDIS_URLS.split(",") if url.strip()]
+        return nodes[0] if len(nodes) == 1 else ShardedBackend(nodes)
+    return None
+
+
+_SHARED = None
+_SHARED_READY = False
+_SHARED_LOCK = threading.Lock()
+
+
+def get_shared_backend():
+    """Process-wide shared backend (None when memory-only, off or unavailable)."""
+    global _SHARED, _SHARED_READY
+    with _SHARED_LOCK:
+        if not _SHARED_READY:
+            try:
+                _SHARED = create_backend()
+            except CACHE_ERRORS as e:
+                print(f"Shared cache unavailable, using memory only: {e}")
+                _SHARED = None
+            _SHARED_READY = True
+    return _SHARED
+
+
+def cache_key(value) -> str:
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class NamespacedCache:
+    """
+    JSON values for one feature (weather, reddit, images, ...) under
+    `<namespace>:<sha256 of the key>`, with a per-process LRU in front of the
+    shared backend. Lookups are counted in cache_lookups_total.
+    """
+
+    def __init__(self, namespace, ttl, local_items=256):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = LRUBackend(local_items)
+
+    def _key(self, key):
+        return f"{self.namespace}:{cache_key(key)}"
+
+    def get(self, key):
+        """Return (hit, value)."""
+        if CACHE_BACKEND == "off":
+            return False, None
+        key = self._key(key)
+        text = self.local.get(key)
+        result = "local_hit"
+        shared = get_shared_backend()
+        if text is None and shared is not None:
+            try:
+                text = shared.get(key)
+            except CACHE_ERRORS as e:
+                print(f"{self.namespace} cache read failed: {e}")
+            if text is not None:
+                result = "shared_hit"
+                self.local.set(key, text, self.ttl)
+        CACHE_LOOKUPS.inc(namespace=self.namespace, result="miss" if text is None else result)
+        return (False, None) if text is None else (True, json.loads(text))
+
+    def set(self, key, value):
+        if CACHE_BACKEND == "off":
+            return
+        key = self._key(key)
+        text = json.dumps(value, default=str)
+        self.local.set(key, text, self.ttl)
+        shared = get_shared_backend()
+        if shared is not None:
+            try:
+                shared.set(key, text, self.ttl, self.namespace)
+            except CACHE_ERRORS as e:
+                print(f"{self.namespace} cache write failed: {e}")
+
+    def get_or_compute(self, key, func, cacheable=bool):
+        """Cached value for `key`, else `func()`; results failing `cacheable` (empty by default) are not stored."""
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = func()
+        if cacheable(value):
+            self.set(key, value)
+        return value
+
+    async def get_or_compute_async(self, key, func, cacheable=bool):
+        """Same as get_or_compute for a coroutine function; the cache I/O runs in a worker thread."""
+        hit, value = await asyncio.to_thread(self.get, key)
+        if hit:
+            return value
+        value = await func()
+        if cacheable(value):
+            await asyncio.to_thread(self.set, key, value)
+        return value
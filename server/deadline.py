@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+from metrics import LLM_DEADLINE_SKIPS
+
+# End-to-end budget for one planning request, in seconds
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "45"))
+# Below this much remaining budget an LLM call is not worth starting
+LLM_MIN_CALL_SECONDS = float(os.getenv("LLM_MIN_CALL_SECONDS", "1.5"))
+# Requests whose deadlines fall in the same window of this many seconds may share work
+DEADLINE_BUCKET_SECONDS = float(os.getenv("DEADLINE_BUCKET_SECONDS", "5"))
+
+# Absolute time.monotonic() deadline of the request being served, or None
+_DEADLINE = contextvars.ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when there is not enough request budget left to start a call."""
+
+
+@contextmanager
+def deadline_scope(seconds=REQUEST_BUDGET_SECONDS):
+    """
+    Give everything run inside the block (including tasks and to_thread calls,
+    which copy the context) a shared deadline `seconds` from now.
+    A nested scope can only tighten an outer deadline, never extend it.
+    """
+    deadline = time.monotonic() + seconds
+    outer = _DEADLINE.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _DEADLINE.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _DEADLINE.reset(token)
+
+
+def remaining():
+    """Seconds left in the current request budget, or None outside a deadline scope."""
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def deadline_bucket():
+    """
+    The current deadline rounded down to DEADLINE_BUCKET_SECONDS, or None outside a scope.
+    Shared work runs under its first caller's deadline, so only requests in the same
+    bucket should share it.
+    """
+    deadline = _DEADLINE.get()
+    if deadline is None:
+        return None
+    return int(deadline // DEADLINE_BUCKET_SECONDS)
+
+
+def clamp_timeout(timeout, call_site="default"):
+    """
+    Shrink a per-call timeout to the remaining request budget.
+    Raises DeadlineExceeded when the budget is too small to start the call.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left < LLM_MIN_CALL_SECONDS:
+        LLM_DEADLINE_SKIPS.inc(call_site=call_site)
+        raise DeadlineExceeded(f"{call_site}: {left:.2f}s of request budget left")
+    return min(timeout, left) if timeout else left
+
+
+async def within_budget(coro, fallback, reserve=0.0, stage="default"):
+    """
+    Await `coro`, giving up once only `reserve` seconds of the request budget remain.
+    Returns `fallback` on timeout, or when a call inside `coro` finds too little
+    budget to start, so the caller can carry on with a degraded result;
+    `reserve` keeps time back for the stages that still have to run.
+    """
+    left = remaining()
+    if left is None:
+        return await coro
+    budget = left - reserve
+    if budget <= 0:
+        coro.close()
+        LLM_DEADLINE_SKIPS.inc(call_site=stage)
+        print(f"Skipping {stage}: request budget exhausted")
+        return fallback
+    try:
+        return await asyncio.wait_for(coro, budget)
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        LLM_DEADLINE_SKIPS.inc(call_site=stage)
+        print(f"{stage} ran out of request budget after {budget:.1f}s, using fallback")
+        return fallback
@@ -2,6 +2,7 @@ import requests
 from dotenv import load_dotenv
 import os
 import uuid
+from tracing import traced
 
 load_dotenv()
 
@@ -22,6 +23,7 @@ class EMTBooking:
     # -----------------------------
     # Authentication
     # -----------------------------
+    @traced("amadeus token", "client")
     def get_amadeus_token(self, client_id, client_secret):
         """Get Amadeus access token"""
         if self.use_mock:
@@ -51,6 +53,7 @@ class EMTBooking:
     # -----------------------------
     # Flight Operations (Amadeus)
     # -----------------------------
+    @traced("amadeus flight_offers", "client")
     def search_flights_amadeus(self, origin, destination, departure_date, adults=1):
         """Search flights using Amadeus Flight Offers Search API"""
         if self.use_mock:
@@ -78,6 +81,7 @@ class EMTBooking:
         except Exception as e:
             return {"error": f"Flight search failed: {str(e)}"}
 
+    @traced("amadeus flight_pricing", "client")
     def price_flight_offers(self, flight_offers):
         """Confirm flight pricing using Flight Offers Price API"""
         if self.use_mock:
@@ -110,6 +114,7 @@ class EMTBooking:
         except Exception as e:
             return {"error": f"Flight pricing failed: {str(e)}"}
 
+    @traced("amadeus flight_order", "client")
     def book_flight(self, flight_offer, traveler_info=None):
         """Book flight using Amadeus Flight Create Orders API"""
         if self.use_mock:
@@ -340,6 +345,7 @@ class EMTBooking:
     # -----------------------------
     # Hotel Booking
     # -----------------------------
+    @traced("amadeus hotel_offers", "client")
     def search_hotels_amadeus(self, city_code, checkin_date, checkout_date, adults=1, rooms=1):
         """Search hotels using Amadeus Hotel Search API"""
         if self.use_mock:
@@ -368,6 +374,7 @@ class EMTBooking:
         except Exception as e:
             return {"error": f"Hotel search failed: {str(e)}"}
 
+    @traced("amadeus hotel_booking", "client")
     def book_hotel(self, hotel_offer, guest_info=None, rooms=1, adults=1):
         """Book hotel using Amadeus Hotel Booking API or mock booking"""
         if self.use_mock:
@@ -598,6 +605,7 @@ class EMTBooking:
     # -----------------------------
     # Payment Operations (Razorpay)
     # -----------------------------
+    @traced("razorpay create_order", "client")
     def create_order(self, amount_inr, vendor="general"):
         """Create a Razorpay order for a specific vendor (flight/hotel)"""
         if self.use_mock:
@@ -627,6 +635,7 @@ class EMTBooking:
         except Exception as e:
             return {"error": f"Order creation failed: {str(e)}"}
 
+    @traced("razorpay capture_payment", "client")
     def capture_payment(self, payment_id, amount_inr, vendor="general"):
         """Capture a payment by payment_id and attach vendor info"""
         if self.use_mock:
@@ -3,9 +3,20 @@ import os
 import requests
 import time
 from dotenv import load_dotenv
+from cache_backend import NamespacedCache
+from tracing import traced
 
 load_dotenv()
 
+# Fares move quickly, so search results are only reused briefly
+EMT_SEARCH_CACHE_TTL = int(os.getenv("EMT_SEARCH_CACHE_TTL", "600"))
+
+search_cache = NamespacedCache("emt_search", EMT_SEARCH_CACHE_TTL)
+
+
+def _search_ok(result):
+    return isinstance(result, dict) and "error" not in result
+
 
 class EMTService:
     def __init__(self, use_mock=True):
@@ -22,6 +33,7 @@ class EMTService:
             self.amadeus_token = self.get_amadeus_token()
 
     # ------------------ TOKEN ------------------
+    @traced("amadeus token", "client")
     def get_amadeus_token(self):
         url = f"{self.base_url}/v1/security/oauth2/token"
         payload = {
@@ -45,6 +57,7 @@ class EMTService:
             return None
 
     # ------------------ HOTEL LIST ------------------
+    @traced("amadeus hotels_by_city", "client")
     def search_hotels_by_city(self, city_code, debug=True):
         if self.use_mock:
             return {
@@ -78,6 +91,7 @@ class EMTService:
             return {"error": str(e)}
 
     # ------------------ HOTEL OFFERS ------------------
+    @traced("amadeus hotel_offers", "client")
     def get_hotel_offers(self, hotel_ids, checkin_date, checkout_date, adults=1, debug=True):
         if self.use_mock:
             offers = []
@@ -130,6 +144,11 @@ class EMTService:
 
     # ------------------ COMPLETE HOTEL SEARCH ------------------
     def search_hotels_complete(self, city_code, checkin_date, checkout_date, adults=1, debug=True):
+        key = ["hotels", self.use_mock, city_code, checkin_date, checkout_date, adults]
+        return search_cache.get_or_compute(
+            key, lambda: self._search_hotels_complete(city_code, checkin_date, checkout_date, adults, debug), _search_ok)
+
+    def _search_hotels_complete(self, city_code, checkin_date, checkout_date, adults=1, debug=True):
         if debug:
             print(f"\n🏨 COMPLETE HOTEL SEARCH: {city_code} ({checkin_date} → {checkout_date})")
 
@@ -182,7 +201,15 @@ class EMTService:
     def search_flights_enhanced(self, origin, destination, departure_date, return_date=None, adults=1, debug=True):
         """
         Enhanced flight search with mock support for round-trip flights.
+        Successful results are cached for EMT_SEARCH_CACHE_TTL seconds.
         """
+        key = ["flights", self.use_mock, origin, destination, departure_date, return_date, adults]
+        return search_cache.get_or_compute(
+            key, lambda: self._search_flights_enhanced(origin, destination, departure_date, return_date, adults, debug),
+            _search_ok)
+
+    @traced("amadeus flight_offers", "client")
+    def _search_flights_enhanced(self, origin, destination, departure_date, return_date=None, adults=1, debug=True):
         if self.use_mock:
             flights = [
                 {
@@ -304,6 +331,7 @@ class EMTService:
         return simplified
 
     # ------------------ PAYMENT ------------------
+    @traced("razorpay create_order", "client")
     def create_payment_order(self, amount_inr, currency="INR"):
         if self.use_mock:
             return {"id": "pay_mock_123", "amount": amount_inr, "currency": currency, "status": "created"}
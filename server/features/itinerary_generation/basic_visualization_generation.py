@@ -1,29 +1,69 @@
-from llm_client import invoke_llm
-import json
-import re
+from llm_client import invoke_llm, invoke_llm_async
+from llm_json import decode_llm_json
+from prompt_builder import PromptBuilder
+import asyncio
 
-from features.maps_scrapper.image_scraper import fetch_place_image
+from features.maps_scrapper.image_scraper import fetch_place_image, fetch_place_image_async
 
-def visualization_generation(itinerary: dict):
-    """
-    Takes a structured itinerary and transforms it into
-    a storytelling JSON with places, using LLM.
-    """
+# Max concurrent SerpAPI image lookups per storytelling request
+IMAGE_FETCH_CONCURRENCY = 8
+
+# Structured-output schema for the storytelling format described in the prompt
+STORYTELLING_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "story": {"type": "STRING"},
+        "days": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "day": {"type": "INTEGER"},
+                    "title": {"type": "STRING"},
+                    "summary": {"type": "STRING"},
+                    "places": {
+                        "type": "ARRAY",
+                        "items": {
+                            "type": "OBJECT",
+                            "properties": {
+                                "id": {"type": "STRING"},
+                                "name": {"type": "STRING"},
+                                "description": {"type": "STRING"},
+                                "latitude": {"type": "NUMBER"},
+                                "longitude": {"type": "NUMBER"},
+                                "imageUrl": {"type": "STRING"},
+                                "category": {"type": "STRING"},
+                                "rating": {"type": "NUMBER"},
+                                "address": {"type": "STRING"},
+                                "tags": {"type": "ARRAY", "items": {"type": "STRING"}}
+                            },
+                            "required": ["id", "name", "description", "latitude", "longitude", "category"]
+                        }
+                    }
+                },
+                "required": ["day", "title", "summary", "places"]
+            }
+        }
+    },
+    "required": ["story", "days"]
+}
 
-    prompt = f"""
+def _build_visualization_prompt(itinerary: dict):
+    prompt = PromptBuilder("visualizer")
+    prompt.add_text("""
     You are a creative travel storyteller. 
     Transform the following itinerary into a JSON response that creates a visual storytelling experience.
 
     The format must be:
-    {{
+    {
       "story": "...",
       "days": [
-        {{
+        {
           "day": 1,
           "title": "...",
           "summary": "...",
           "places": [
-            {{
+            {
               "id": "...",
               "name": "...",
               "description": "...",
@@ -34,34 +74,48 @@ def visualization_generation(itinerary: dict):
               "rating": ...,
               "address": "...",
               "tags": ["...", "..."]
-            }}
+            }
           ]
-        }}
+        }
       ]
-    }}
+    }
 
     Use real locations.
-    Here is the itinerary:
-    {json.dumps(itinerary, indent=2)}
-    """
+    Here is the itinerary:""")
+    prompt.add_json(itinerary)
+    return prompt.build()
 
-    # Call LLM
-    response = invoke_llm(prompt)
 
+def _parse_visualization(response):
     # Handle response depending on LLM client return type
-    raw_text = response.text.strip() if hasattr(response, "text") else str(response).strip()
-
-    # Remove possible code fences
-    cleaned = re.sub(r"```(?:json)?", "", raw_text).strip("` \n")
-
-    try:
-        return json.loads(cleaned)
-    except Exception as e:
-        print(f"[ERROR] Failed to parse LLM output: {e}\nRaw Response:\n{raw_text}")
-        return {
-            "story": "",
-            "days": []
-        }
+    # None means the call failed or ran out of request budget
+    raw_text = response.text if hasattr(response, "text") else None
+    fallback = {
+        "story": "",
+        "days": []
+    }
+    return decode_llm_json(raw_text, "visualizer", default=fallback, expect=dict)
+
+
+def visualization_generation(itinerary: dict):
+    """
+    Takes a structured itinerary and transforms it into
+    a storytelling JSON with places, using LLM.
+    """
+    response = invoke_llm(_build_visualization_prompt(itinerary), call_site="visualizer", response_schema=STORYTELLING_SCHEMA)
+    return _parse_visualization(response)
+
+
+async def visualization_generation_async(itinerary: dict):
+    """
+    Async version of visualization_generation.
+    """
+    response = await invoke_llm_async(
+        _build_visualization_prompt(itinerary),
+        call_site="visualizer",
+        response_schema=STORYTELLING_SCHEMA
+    )
+    return _parse_visualization(response)
 
 
 def add_images_to_itinerary(itinerary_json: dict):
@@ -75,3 +129,22 @@ def add_images_to_itinerary(itinerary_json: dict):
                 place['imageUrl'] = fetch_place_image(place_name) or "default_image.jpg"
     return itinerary_json
 
+
+async def add_images_to_itinerary_async(itinerary_json: dict):
+    """
+    Async version of add_images_to_itinerary; looks up all places concurrently.
+    """
+    semaphore = asyncio.Semaphore(IMAGE_FETCH_CONCURRENCY)
+
+    async def attach_image(place):
+        async with semaphore:
+            place['imageUrl'] = await fetch_place_image_async(place["name"]) or "default_image.jpg"
+
+    places = [
+        place
+        for day in itinerary_json.get("days", [])
+        for place in day.get("places", [])
+        if place.get("name")
+    ]
+    await asyncio.gather(*(attach_image(place) for place in places))
+    return itinerary_json
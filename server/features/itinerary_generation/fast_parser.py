@@ -0,0 +1,207 @@
+import re
+
+from data import INDIAN_AIRPORTS
+
+# Gazetteer: airport cities plus the common alternate names people type
+CITY_ALIASES = {
+    "delhi": "New Delhi",
+    "bengaluru": "Bangalore",
+    "bombay": "Mumbai",
+    "madras": "Chennai",
+    "calcutta": "Kolkata",
+    "cochin": "Kochi",
+    "trivandrum": "Thiruvananthapuram",
+    "calicut": "Kozhikode",
+    "trichy": "Tiruchirappalli",
+    "mangaluru": "Mangalore",
+}
+GAZETTEER = {airport["city"].lower(): airport["city"] for airport in INDIAN_AIRPORTS}
+GAZETTEER.update({alias: city for alias, city in CITY_ALIASES.items() if alias not in GAZETTEER})
+# Longest names first so "new delhi" wins over "delhi"
+_CITY_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted(GAZETTEER, key=len, reverse=True)) + r")\b"
+)
+
+NUMBER_WORDS = {
+    "a": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "fourteen": 14, "fifteen": 15,
+}
+_NUMBER = r"\b(\d+|" + "|".join(NUMBER_WORDS) + r")"
+
+_DURATION = re.compile(_NUMBER + r"[\s-]*days?\b")
+_WEEKS = re.compile(_NUMBER + r"[\s-]*weeks?\b")
+_MONEY = re.compile(
+    r"(?P<cur>₹|rs\.?|inr)?\s*(?P<num>\d[\d,]*(?:\.\d+)?)\s*"
+    r"(?P<unit>k|thousand|lakhs?|lacs?|l)?\b\s*(?P<cur2>rs|inr|rupees)?"
+)
+_BUDGET_CUE = re.compile(r"(budget|under|within|upto|up to|below|max|around|spend|of)\s*(of|is|:)?\s*$")
+_TRAVELERS = re.compile(_NUMBER + r"\s+(?:of us|people|persons|pax|adults|travell?ers|friends|members|guys|girls)\b")
+_MONEY_UNITS = {"k": 1000, "thousand": 1000, "lakh": 100000, "lakhs": 100000, "lac": 100000, "lacs": 100000, "l": 100000}
+
+THEME_KEYWORDS = {
+    "heritage": r"heritage|histor\w*|forts?|palaces?|temples?|museums?|monuments?",
+    "nightlife": r"nightlife|part(?:y(?!\s+of\b)|ies)|clubs?|clubbing|bars?|pubs?",
+    "adventure": r"adventure|trek\w*|rafting|paragliding|scuba|diving|hik\w*|camping",
+    "food": r"food|foodie|cuisine|street food|cafes?|restaurants?",
+    "nature": r"nature|beach(?:es)?|mountains?|hills?|wildlife|lakes?|waterfalls?|backwaters",
+}
+# (field, value, pattern); the first matching pattern wins
+KEYWORD_FIELDS = [
+    ("traveler_type", "single", r"solo|alone|by myself"),
+    ("traveler_type", "couple", r"couple|honeymoon|my (?:wife|husband|partner|girlfriend|boyfriend|fianc\w*)"),
+    ("traveler_type", "family", r"family|kids|children|parents"),
+    ("traveler_type", "group", r"friends|group|gang"),
+    ("accommodation", "luxury", r"luxury|5[- ]star|five[- ]star"),
+    ("accommodation", "hostel", r"hostels?"),
+    ("accommodation", "homestay", r"homestays?|airbnb"),
+    ("accommodation", "resort", r"resorts?"),
+    ("accommodation", "hotel", r"hotels?"),
+    ("food_preferences", "non-veg", r"non[- ]?veg\w*"),
+    ("food_preferences", "vegan", r"vegan"),
+    ("food_preferences", "Jain", r"jain"),
+    ("food_preferences", "veg", r"veg|vegetarian"),
+    ("transport_mode", "flight", r"flights?|fly(?:ing)?"),
+    ("transport_mode", "train", r"trains?"),
+    ("transport_mode", "bus", r"bus(?:es)?"),
+    ("transport_mode", "self-drive", r"self[- ]drive|road ?trip|drive|driving"),
+    ("local_transport", "taxi", r"taxis?|cabs?"),
+    ("local_transport", "rental", r"rent(?:al|ed)?|scooty|scooters?|bikes?"),
+    ("local_transport", "metro", r"metro"),
+    ("activity_pace", "relaxed", r"relax\w*|chill|laid[- ]back|leisure\w*|slow"),
+    ("activity_pace", "packed", r"packed|hectic|action[- ]packed|as much as possible"),
+    ("purpose", "honeymoon", r"honeymoon"),
+    ("purpose", "workation", r"workation"),
+    ("purpose", "backpacking", r"backpack\w*"),
+    ("purpose", "family trip", r"family trip"),
+    ("include_travel_costs", "true", r"includ\w* (?:the )?(?:flights?|trains?|travel|transport|tickets)|all[- ]inclusive"),
+]
+_MONTHS = r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?"
+_WHEN = re.compile(
+    r"\b((?:next|this|coming)\s+(?:week|weekend|month|year|summer|winter|monsoon)"
+    r"|(?:in|during|for|this|next)\s+(?:" + _MONTHS + r")\b(?:\s+\d{4})?"
+    r"|(?:in|during)\s+(?:summer|winter|monsoon|spring|autumn)"
+    r"|diwali|christmas|new year(?:'s)?(?: eve)?|holi)\b"
+)
+
+# Mentions of fields the extractor cannot fill (must_include, must_exclude,
+# preferences, traveler counts it cannot read, budgets quoted per person or per
+# day, counted children); any of these needs the LLM
+_LLM_CUES = re.compile(
+    r"\b(?:per (?:person|head|adult|pax|couple|day|night|week)"
+    r"|" + _NUMBER + r"\s+(?:kids?|child(?:ren)?|infants?|bab(?:y|ies)|toddlers?)"
+    r"|visit|see|explore|check out|must[- ]see|sightseeing"
+    r"|avoid\w*|skip\w*|no|not|without|except|don'?t|hate|dislike"
+    r"|allerg\w*|diabet\w*|wheelchair|disab\w*|pregnan\w*|elderly|senior|pets?|dogs?|medical"
+    r"|(?:party|group|family|team|batch) of|with (?:my|our)(?! (?:wife|husband|partner|girlfriend|boyfriend|fianc))|along with|and my|plus)\b"
+)
+# Words that carry no trip detail of their own
+FILLER_WORDS = {
+    "a", "an", "the", "in", "to", "for", "of", "at", "on", "with", "and", "or", "from", "by", "around", "about",
+    "i", "we", "me", "us", "our", "my", "am", "are", "is", "be", "plan", "planning", "trip", "travel", "tour",
+    "holiday", "holidays", "vacation", "itinerary", "journey", "getaway", "days", "day", "nights", "night",
+    "budget", "under", "within", "upto", "up", "below", "max", "spend", "total", "rs", "inr", "rupees",
+    "please", "need", "looking", "like", "would", "want", "going", "go", "visiting", "city", "pace",
+    "style", "tickets", "cost", "costs",
+}
+_WORD = re.compile(r"[a-z]+")
+
+
+def _to_number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBER_WORDS[token]
+
+
+def _location(text: str, found: dict, ambiguous: set):
+    matches = [(m.start(), GAZETTEER[m.group(1)]) for m in _CITY_PATTERN.finditer(text)]
+    cities = {city for _, city in matches}
+    if len(cities) > 1:
+        # "from Mumbai to Goa": drop origins, keep the destination
+        cities = {city for start, city in matches if not re.search(r"\bfrom\s+$", text[:start])}
+    if len(cities) == 1:
+        found["location"] = cities.pop()
+    elif cities:
+        ambiguous.add("location")
+
+
+def _duration(text: str, found: dict, ambiguous: set):
+    days = {_to_number(m.group(1)) for m in _DURATION.finditer(text)}
+    days |= {7 * _to_number(m.group(1)) for m in _WEEKS.finditer(text)}
+    if re.search(r"\bweekend\b", text) and not days:
+        days.add(2)
+    if len(days) == 1:
+        found["duration_days"] = days.pop()
+    elif days:
+        ambiguous.add("duration_days")
+
+
+def _budget(text: str, found: dict, ambiguous: set):
+    amounts = set()
+    for m in _MONEY.finditer(text):
+        cue = _BUDGET_CUE.search(text[max(0, m.start() - 20):m.start()])
+        if not (m.group("cur") or m.group("unit") or m.group("cur2") or cue):
+            continue
+        value = float(m.group("num").replace(",", "")) * _MONEY_UNITS.get(m.group("unit") or "", 1)
+        if value >= 500:  # below this it is a count, not a trip budget
+            amounts.add(int(value))
+    if len(amounts) == 1:
+        found["budget"] = amounts.pop()
+    elif amounts:
+        ambiguous.add("budget")
+
+
+def _travelers(text: str, found: dict, ambiguous: set):
+    counts = {_to_number(m.group(1)) for m in _TRAVELERS.finditer(text)}
+    if len(counts) == 1:
+        found["num_travelers"] = counts.pop()
+    elif counts:
+        ambiguous.add("num_travelers")
+    elif found.get("traveler_type") == "single":
+        found["num_travelers"] = 1
+    elif found.get("traveler_type") == "couple":
+        found["num_travelers"] = 2
+
+
+def extract_trip_fields(text: str):
+    """
+    Deterministic extraction of parser fields with regexes and the city gazetteer.
+    Returns (found, ambiguous): the fields stated unambiguously in the text, and
+    the names of fields with conflicting mentions (e.g. two different budgets).
+    """
+    text = (text or "").lower()
+    found, ambiguous = {}, set()
+
+    for field, value, pattern in KEYWORD_FIELDS:
+        if field not in found and re.search(rf"\b(?:{pattern})\b", text):
+            found[field] = value
+    themes = [theme for theme, pattern in THEME_KEYWORDS.items() if re.search(rf"\b(?:{pattern})\b", text)]
+    if themes:
+        found["themes"] = themes
+    when = _WHEN.search(text)
+    if when:
+        found["when"] = when.group(1)
+
+    _location(text, found, ambiguous)
+    _duration(text, found, ambiguous)
+    _budget(text, found, ambiguous)
+    _travelers(text, found, ambiguous)
+    return found, ambiguous
+
+
+def unparsed_content(text: str):
+    """
+    What extract_trip_fields() leaves unread: the words outside every matched
+    pattern that are not filler, plus the cues for fields it cannot fill.
+    Empty only when the extracted fields say everything the text says.
+    """
+    text = (text or "").lower()
+    cues = [m.group(0) for m in _LLM_CUES.finditer(text)]
+    patterns = [rf"\b(?:{pattern})\b" for _, _, pattern in KEYWORD_FIELDS]
+    patterns += [rf"\b(?:{pattern})\b" for pattern in THEME_KEYWORDS.values()]
+    patterns += [_WHEN.pattern, _CITY_PATTERN.pattern, _DURATION.pattern, _WEEKS.pattern, _TRAVELERS.pattern,
+                 _MONEY.pattern, r"\bweekend\b"]
+    # Spans are found on the original text, so overlapping patterns all match
+    read = bytearray(len(text))
+    for pattern in patterns:
+        for m in re.finditer(pattern, text):
+            read[m.start():m.end()] = b"\x01" * (m.end() - m.start())
+    leftover = [m.group(0) for m in _WORD.finditer(text) if not read[m.start()] and m.group(0) not in FILLER_WORDS]
+    return list(dict.fromkeys(cues + leftover))
@@ -0,0 +1,229 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_client import invoke_llm
+from llm_json import decode_llm_json
+from prompt_builder import PromptBuilder
+from tracing import propagate
+from features.itinerary_generation.itinerary_generator import ITINERARY_DAY_SCHEMA
+
+UPDATE_MAX_WORKERS = int(os.getenv("UPDATE_MAX_WORKERS", "6"))
+# Forecast days at or above this rain chance count as bad weather
+UPDATE_RAIN_CHANCE = int(os.getenv("UPDATE_RAIN_CHANCE", "60"))
+BAD_WEATHER = re.compile(r"rain|shower|storm|thunder|drizzle|snow|sleet|blizzard|cyclone", re.I)
+
+ORDINALS = {
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7,
+    "eighth": 8, "ninth": 9, "tenth": 10, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_DAY_NUMBER = r"(\d+|" + "|".join(ORDINALS) + r")"
+_DAY_RANGE = re.compile(r"\bdays?\s+" + _DAY_NUMBER + r"\s*(?:-|to|through)\s*" + _DAY_NUMBER + r"\b")
+_DAY_LIST = re.compile(r"\bdays?\s+" + _DAY_NUMBER + r"((?:\s*(?:,|and|&)\s*" + _DAY_NUMBER + r")*)\b")
+_ORDINAL_DAY = re.compile(r"\b(" + "|".join(ORDINALS) + r"|last|final)\s+day\b")
+# Feedback about the whole trip: regenerate everything even if a day is also named
+_TRIP_WIDE = re.compile(
+    r"\b(?:every|each|all(?: the)?|other)\s+days?\b|\b(?:whole|entire|full|rest of the|overall)\s+"
+    r"(?:trip|itinerary|plan|holiday|vacation|stay)\b|\bthroughout\b|\beverywhere\b"
+)
+# Budget and pace changes apply to the whole trip unless their clause names a day
+_TRIP_LEVEL_CHANGE = re.compile(
+    r"\b(?:cheap\w*|expensive|cost\w*|budget|afford\w*|spend\w*|splurge|luxur\w*|premium|pricier"
+    r"|relax\w*|slow\w*|chill\w*|laid[- ]back|leisure\w*|pace|packed|hectic|busier|rushed|tiring)\b"
+)
+_CLAUSE = re.compile(r"[,;.!?]|\b(?:and|&)\b(?!\s*(?:days?\b|\d|" + "|".join(ORDINALS) + r"))|\bbut\b|\balso\b")
+# Capitalized words in feedback that are not place names
+NOT_PLACES = {
+    "please", "can", "could", "would", "the", "and", "but", "also", "make", "add", "remove", "replace",
+    "swap", "skip", "instead", "day", "days", "morning", "afternoon", "evening", "night", "more", "less",
+    "change", "move", "want", "don't", "dont", "let", "keep", "visit", "some", "any",
+}
+
+
+def itinerary_days(itinerary):
+    """The list of day objects, for {"itinerary": [...]} or a bare list."""
+    if isinstance(itinerary, dict):
+        days = itinerary.get("itinerary")
+    else:
+        days = itinerary
+    if isinstance(days, list) and all(isinstance(day, dict) for day in days):
+        return days
+    return None
+
+
+def _day_number(day: dict, index: int) -> int:
+    try:
+        return int(day.get("day", index + 1))
+    except (TypeError, ValueError):
+        return index + 1
+
+
+def _to_number(token: str) -> int:
+    return int(token) if token.isdigit() else ORDINALS[token]
+
+
+def days_named_in_feedback(feedback: str, total: int):
+    """Day numbers the feedback refers to ("day 2", "days 3-4", "the last day"), or an empty set."""
+    text = (feedback or "").lower()
+    named = set()
+    for m in _DAY_RANGE.finditer(text):
+        start, end = sorted((_to_number(m.group(1)), _to_number(m.group(2))))
+        named.update(range(start, end + 1))
+    for m in _DAY_LIST.finditer(text):
+        named.add(_to_number(m.group(1)))
+        named.update(_to_number(n) for n in re.findall(_DAY_NUMBER, m.group(2)))
+    for m in _ORDINAL_DAY.finditer(text):
+        named.add(total if m.group(1) in ("last", "final") else _to_number(m.group(1)))
+    return {n for n in named if 1 <= n <= total}
+
+
+def is_trip_wide(feedback: str) -> bool:
+    """Whether the feedback changes the whole trip ("every day", "the whole trip", "make it cheaper")."""
+    text = (feedback or "").lower()
+    if _TRIP_WIDE.search(text):
+        return True
+    return any(
+        _TRIP_LEVEL_CHANGE.search(clause) and not days_named_in_feedback(clause, 10 ** 6)
+        for clause in _CLAUSE.split(text)
+    )
+
+
+def days_mentioning_places(feedback: str, days: list):
+    """Day numbers whose plan mentions a place the feedback names ("swap Baga Beach for ...")."""
+    names = {word.lower() for word in re.findall(r"\b[A-Z][a-zA-Z]{2,}\b", feedback or "")} - NOT_PLACES
+    matched = set()
+    for i, day in enumerate(days):
+        text = " ".join(str(value) for key, value in day.items() if key != "day").lower()
+        if any(re.search(rf"\b{re.escape(name)}\b", text) for name in names):
+            matched.add(_day_number(day, i))
+    return matched
+
+
+def days_with_bad_weather(forecast, previous_forecast=None):
+    """
+    Day numbers whose forecast needs a rethink: with `previous_forecast`, the days
+    whose outlook changed for the worse; otherwise every rainy or stormy day.
+    """
+    def bad(entry):
+        try:
+            rain = float(entry.get("rain_chance") or 0)
+        except (TypeError, ValueError):
+            rain = 0
+        return rain >= UPDATE_RAIN_CHANCE or bool(BAD_WEATHER.search(str(entry.get("condition", ""))))
+
+    before = {entry.get("day"): entry for entry in previous_forecast or [] if isinstance(entry, dict)}
+    days = set()
+    for entry in forecast or []:
+        if not isinstance(entry, dict) or not isinstance(entry.get("day"), int) or not bad(entry):
+            continue
+        old = before.get(entry["day"])
+        if previous_forecast is None or old is None or not bad(old):
+            days.add(entry["day"])
+    return days
+
+
+def affected_days(itinerary, feedback: str = "", forecast=None, previous_forecast=None):
+    """
+    Day numbers an update has to touch, or None when the feedback is about the
+    whole trip ("make it cheaper") and the full itinerary has to be regenerated.
+    """
+    days = itinerary_days(itinerary)
+    if not days:
+        return None
+    affected = set()
+    if feedback and feedback.strip():
+        if is_trip_wide(feedback):
+            return None
+        affected = days_named_in_feedback(feedback, len(days)) or days_mentioning_places(feedback, days)
+        if not affected:
+            return None
+    if forecast:
+        affected |= days_with_bad_weather(forecast, previous_forecast)
+    return affected
+
+
+def _build_day_prompt(day: dict, neighbours: list, feedback: str, weather=None):
+    prompt = PromptBuilder("itinerary_day_updater")
+    prompt.add_text(f"""
+    You are an AI trip planner.
+    Rewrite day {day.get("day")} of an existing itinerary.
+
+    Day to rewrite (JSON):""")
+    prompt.add_json(day)
+    if feedback:
+        prompt.add_text(f'User Feedback: "{feedback}"')
+    if weather:
+        prompt.add_text("Weather forecast for this day:")
+        prompt.add_json(weather)
+    # The rest of the trip only guards against repeating activities; drop it first
+    prompt.add_text("Other days of the trip, for context only (do not change or repeat them):", priority=1)
+    prompt.add_json(neighbours)
+    prompt.add_text("""
+    Rules:
+    - Change only what the feedback or the weather requires; keep the rest of the day.
+    - Move outdoor activities indoors if rain or bad weather is forecast.
+    - Keep the same day number and the same keys.
+    - Return only this one day as a valid JSON object.
+    """)
+    return prompt.build()
+
+
+def _regenerate_day(day: dict, neighbours: list, feedback: str, weather=None):
+    prompt = _build_day_prompt(day, neighbours, feedback, weather)
+    if set(day) <= set(ITINERARY_DAY_SCHEMA["properties"]):
+        response = invoke_llm(prompt, call_site="itinerary_day_updater", response_schema=ITINERARY_DAY_SCHEMA)
+    else:
+        # Days carrying extra keys (notes, reasons) would lose them to the schema
+        response = invoke_llm(prompt, call_site="itinerary_day_updater", json_mode=True)
+    updated = decode_llm_json(getattr(response, "text", None), "itinerary_day_updater", default=day, expect=dict)
+    # A day the model renumbered or stripped would break the splice; keep the original
+    if updated is not day and (updated.get("day") != day.get("day") or not set(day) <= set(updated)):
+        return day
+    return updated
+
+
+def update_days(itinerary, day_numbers, feedback: str = "", forecast=None):
+    """
+    Regenerate only `day_numbers` of the itinerary, concurrently, and splice them
+    back in. Untouched days are the same objects as before, so they serialize
+    byte-identically; total_estimated_cost moves by the change in day costs.
+    """
+    days = itinerary_days(itinerary)
+    if not days or not day_numbers:
+        return itinerary
+    weather_by_day = {entry.get("day"): entry for entry in forecast or [] if isinstance(entry, dict)}
+    targets = [(i, day) for i, day in enumerate(days) if _day_number(day, i) in day_numbers]
+    if not targets:
+        return itinerary
+
+    def regenerate(target):
+        i, day = target
+        neighbours = [
+            {k: v for k, v in other.items() if k != "estimated_cost"}
+            for j, other in enumerate(days) if j != i
+        ]
+        try:
+            return _regenerate_day(day, neighbours, feedback, weather_by_day.get(_day_number(day, i)))
+        except Exception as e:
+            print(f"Day {_day_number(day, i)} update failed, keeping it as is: {e}")
+            return day
+
+    with ThreadPoolExecutor(max_workers=max(1, min(UPDATE_MAX_WORKERS, len(targets)))) as pool:
+        regenerated = list(pool.map(propagate(regenerate), targets))
+
+    new_days = list(days)
+    cost_delta = 0
+    for (i, old), new in zip(targets, regenerated):
+        new_days[i] = new
+        if isinstance(old.get("estimated_cost"), (int, float)) and isinstance(new.get("estimated_cost"), (int, float)):
+            cost_delta += new["estimated_cost"] - old["estimated_cost"]
+
+    print(f"Incremental update: regenerated days {sorted(_day_number(d, i) for i, d in targets)} of {len(days)}")
+    if not isinstance(itinerary, dict):
+        return new_days
+    updated = dict(itinerary)
+    updated["itinerary"] = new_days
+    if cost_delta and isinstance(itinerary.get("total_estimated_cost"), (int, float)):
+        updated["total_estimated_cost"] = itinerary["total_estimated_cost"] + cost_delta
+    return updated
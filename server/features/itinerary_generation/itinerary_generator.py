@@ -1,28 +1,60 @@
-from llm_client import invoke_llm
-import json
-import re
+from llm_client import invoke_llm, invoke_llm_async, stream_llm_async
+from llm_json import decode_llm_json
+from features.itinerary_generation.itinerary_stream import IncrementalArrayParser
+from prompt_builder import INTERNAL_KEYS, PromptBuilder
 
-def generate_itinerary(parsed_input: dict, summary: str):
+# Structured-output schema for the itinerary format described in the prompt.
+# "itinerary" comes first so streamed days can be emitted before the total.
+ITINERARY_DAY_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "day": {"type": "INTEGER"},
+        "morning": {"type": "STRING"},
+        "afternoon": {"type": "STRING"},
+        "evening": {"type": "STRING"},
+        "estimated_cost": {"type": "INTEGER"}
+    },
+    "required": ["day", "morning", "afternoon", "evening", "estimated_cost"],
+    "property_ordering": ["day", "morning", "afternoon", "evening", "estimated_cost"]
+}
+
+ITINERARY_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "itinerary": {"type": "ARRAY", "items": ITINERARY_DAY_SCHEMA},
+        "total_estimated_cost": {"type": "INTEGER"}
+    },
+    "required": ["itinerary", "total_estimated_cost"],
+    "property_ordering": ["itinerary", "total_estimated_cost"]
+}
+
+def _build_itinerary_prompt(parsed_input: dict, summary: str, weather=None):
     duration = parsed_input["duration_days"]
-    budget = parsed_input["budget"]
     themes = ", ".join(parsed_input["themes"])
+    weather_rule = "- Plan outdoor activities on dry days and indoor ones when rain is likely" if weather else ""
 
-    prompt = f"""
+    prompt = PromptBuilder("itinerary_generator")
+    prompt.add_text("""
     You are a experienced travel planner with experience of 10 years. 
     Based on the structured trip request below, create a summarized day-by-day itinerary. 
     Include activities, food suggestions, and estimated costs where relevant.
     Ensure the plan matches preferences (themes, pace, accommodation, etc.).
 
-    Trip Request JSON:
-    {json.dumps(parsed_input, indent=2)}
-    Here is a summary of reviews by people on reddit: {summary}
-  
+    Trip Request JSON:""")
+    prompt.add_json(parsed_input, omit=INTERNAL_KEYS)
+    # Reddit context is the first thing to go when the prompt is over budget
+    prompt.add_text(f"Here is a summary of reviews by people on reddit: {summary}", priority=1)
+    if weather:
+        prompt.add_text("Weather forecast for the trip:")
+        prompt.add_json(weather)
+    prompt.add_text(f"""
     Rules:
     - Split plan into {duration} days
     - Each day must include morning, afternoon, evening activities
     - Suggest accommodation and transport
     - Keep cost estimates within total budget
     - Focus on themes: {themes}
+    {weather_rule}
 
     Return ONLY valid JSON in this format:
     {{
@@ -38,14 +70,48 @@ def generate_itinerary(parsed_input: dict, summary: str):
       ],
       "total_estimated_cost": <int>
     }}
-    """
+    """)
+    return prompt.build()
+
+
+def is_fallback_itinerary(itinerary: dict) -> bool:
+    """True for the empty plan _parse_itinerary returns when the LLM's answer could not be read."""
+    return not itinerary.get("itinerary")
+
+
+def _parse_itinerary(raw_text: str, parsed_input: dict):
+    fallback = {"itinerary": [], "total_estimated_cost": parsed_input["budget"]}
+    return decode_llm_json(raw_text, "itinerary_generator", default=fallback, expect=dict)
 
-    response = invoke_llm(prompt)
-    raw_text = response.text.strip()
-    cleaned = re.sub(r"```(json)?", "", raw_text).strip("` \n")
 
-    try:
-        return json.loads(cleaned)
-    except Exception as e:
-        print(f"Error parsing itinerary: {e}\nRaw: {raw_text}")
-        return {"itinerary": [], "total_estimated_cost": budget}
+def generate_itinerary(parsed_input: dict, summary: str, weather=None):
+    """`weather` is an optional forecast list (see get_weather_forecast) to plan around."""
+    response = invoke_llm(
+        _build_itinerary_prompt(parsed_input, summary, weather),
+        call_site="itinerary_generator",
+        response_schema=ITINERARY_SCHEMA
+    )
+    return _parse_itinerary(getattr(response, "text", None), parsed_input)
+
+
+async def generate_itinerary_async(parsed_input: dict, summary: str, weather=None):
+    response = await invoke_llm_async(
+        _build_itinerary_prompt(parsed_input, summary, weather),
+        call_site="itinerary_generator",
+        response_schema=ITINERARY_SCHEMA
+    )
+    return _parse_itinerary(getattr(response, "text", None), parsed_input)
+
+
+async def stream_itinerary_async(parsed_input: dict, summary: str, weather=None):
+    """
+    Streaming version of generate_itinerary.
+    Yields ("day", day) as soon as each itinerary[i] object is complete,
+    then ("itinerary", full_itinerary) once the response has finished.
+    """
+    parser = IncrementalArrayParser("itinerary")
+    prompt = _build_itinerary_prompt(parsed_input, summary, weather)
+    async for chunk in stream_llm_async(prompt, call_site="itinerary_generator", response_schema=ITINERARY_SCHEMA):
+        for day in parser.feed(chunk):
+            yield "day", day
+    yield "itinerary", _parse_itinerary(parser.text, parsed_input)
@@ -0,0 +1,73 @@
+import json
+
+
+class IncrementalArrayParser:
+    """
+    Incremental JSON scanner that pulls complete objects out of one top-level
+    array (e.g. "itinerary") while the LLM response is still streaming.
+
+    Feed it text chunks; each call returns the array items that were completed
+    by that chunk. Code fences or text around the JSON document are ignored.
+    """
+
+    def __init__(self, key="itinerary"):
+        self.key = key
+        self.text = ""
+        self.done = False  # True once the target array has been closed
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._awaiting_array = False
+        self._array_depth = None
+        self._item_start = None
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        items = []
+        while self._pos < len(self.text):
+            i = self._pos
+            ch = self.text[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._array_depth is None:
+                        self._last_key = self.text[self._string_start + 1:i]
+                continue
+
+            if self._awaiting_array and not ch.isspace() and ch != "[":
+                # "itinerary" was not followed by an array
+                self._awaiting_array = False
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":" and self._depth == 1 and self._array_depth is None and self._last_key == self.key:
+                self._awaiting_array = True
+            elif ch in "{[":
+                self._depth += 1
+                if ch == "[" and self._awaiting_array:
+                    self._awaiting_array = False
+                    self._array_depth = self._depth
+                elif ch == "{" and not self.done and self._array_depth is not None \
+                        and self._depth == self._array_depth + 1:
+                    self._item_start = i
+            elif ch in "}]":
+                if ch == "}" and self._item_start is not None and self._depth == self._array_depth + 1:
+                    try:
+                        items.append(json.loads(self.text[self._item_start:i + 1]))
+                    except ValueError as e:
+                        print(f"Skipping malformed streamed item: {e}")
+                    self._item_start = None
+                elif ch == "]" and self._array_depth is not None and self._depth == self._array_depth:
+                    self.done = True
+                self._depth -= 1
+        return items
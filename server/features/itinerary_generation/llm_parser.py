@@ -1,6 +1,16 @@
-import json
+import os
 import re
-from llm_client import invoke_llm
+from llm_client import invoke_llm, invoke_llm_async
+from llm_json import decode_llm_json
+from metrics import PARSER_FAST_PATH
+from prompt_builder import INTERNAL_KEYS, PromptBuilder
+from features.itinerary_generation.fast_parser import extract_trip_fields, unparsed_content
+
+FAST_PARSE_ENABLED = os.getenv("FAST_PARSE_ENABLED", "true").lower() == "true"
+# The rule-based extractor only answers alone when it found all of these unambiguously
+FAST_PARSE_REQUIRED = [
+    field.strip() for field in os.getenv("FAST_PARSE_REQUIRED", "location,duration_days,budget").split(",") if field.strip()
+]
 
 # Default values if LLM output is incomplete
 DEFAULT_SCHEMA = {
@@ -23,6 +33,66 @@ DEFAULT_SCHEMA = {
     "purpose": "unspecified"
 }
 
+# What the parser prompts ask for, per field
+FIELD_DESCRIPTIONS = {
+    "location": 'string (city/region in India, or "Unknown")',
+    "duration_days": "integer (default = 3)",
+    "budget": 'integer (in INR, default = 20000; convert words like "20k" or "twenty thousand" into numbers)',
+    "themes": 'list of strings (choose from ["heritage", "nightlife", "adventure", "food", "nature", "general"]; default ["general"])',
+    "when": 'string (time period, else "unspecified")',
+    "preferences": 'string (special requirements, else "none")',
+    "include_travel_costs": "string (true if user mentions including transport costs, else unspecified)",
+    "num_travelers": "integer (default = 1)",
+    "traveler_type": 'string (single, couple, family, group; infer if possible, else "unspecified")',
+    "accommodation": 'string (hotel, hostel, luxury, budget, homestay, etc.; default "unspecified")',
+    "food_preferences": 'string (veg, non-veg, vegan, Jain, etc.; default "unspecified")',
+    "transport_mode": 'string (flight, train, bus, self-drive, etc.; default "unspecified")',
+    "local_transport": 'string (taxi, rental, metro, walk-friendly; default "unspecified")',
+    "activity_pace": 'string (relaxed, balanced, packed; default "balanced")',
+    "must_include": "list of strings (must-see attractions if specified, else [])",
+    "must_exclude": "list of strings (things to avoid if specified, else [])",
+    "purpose": 'string (honeymoon, vacation, family trip, backpacking, workation, etc.; default "unspecified")',
+}
+
+# Fields whose presence in the user's text is tracked in "_extracted_from_user"
+EXTRACTION_FLAGS = [
+    "location", "duration_days", "budget", "when", "num_travelers", "traveler_type",
+    "accommodation", "food_preferences", "transport_mode", "include_travel_costs", "preferences"
+]
+
+# Structured-output schema mirroring the parser prompt's output format
+PARSED_REQUEST_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "location": {"type": "STRING"},
+        "duration_days": {"type": "INTEGER"},
+        "budget": {"type": "INTEGER"},
+        "themes": {
+            "type": "ARRAY",
+            "items": {"type": "STRING", "enum": ["heritage", "nightlife", "adventure", "food", "nature", "general"]}
+        },
+        "when": {"type": "STRING"},
+        "preferences": {"type": "STRING"},
+        "include_travel_costs": {"type": "STRING"},
+        "num_travelers": {"type": "INTEGER"},
+        "traveler_type": {"type": "STRING"},
+        "accommodation": {"type": "STRING"},
+        "food_preferences": {"type": "STRING"},
+        "transport_mode": {"type": "STRING"},
+        "local_transport": {"type": "STRING"},
+        "activity_pace": {"type": "STRING", "enum": ["relaxed", "balanced", "packed"]},
+        "must_include": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "must_exclude": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "purpose": {"type": "STRING"},
+        "_extracted_from_user": {
+            "type": "OBJECT",
+            "properties": {field: {"type": "BOOLEAN"} for field in EXTRACTION_FLAGS},
+            "required": EXTRACTION_FLAGS
+        }
+    },
+    "required": list(DEFAULT_SCHEMA.keys()) + ["_extracted_from_user"]
+}
+
 # Clarifying questions for missing or defaulted fields
 CLARIFY_QUESTIONS = {
     "location": "Which city or region in India are you planning to visit?",
@@ -38,41 +108,28 @@ CLARIFY_QUESTIONS = {
     "preferences": "Do you have any personal preferences for this trip?"
 }
 
-def llm_parse_user_input(text: str):
-    """
-    Send user text to LLM to extract trip details into structured JSON.
-    """
-    prompt = f"""
+def _field_list(fields):
+    return "\n".join(f"- {field}: {FIELD_DESCRIPTIONS[field]}" for field in fields)
+
+
+def _build_parse_prompt(text: str):
+    prompt = PromptBuilder("parser")
+    prompt.add_text("""
     You are a travel request parser.  
     Your task is to extract structured trip details from a user's natural language request.  
     Always return a single valid JSON object (no text, no markdown).  
     If information is missing or unclear, use sensible defaults.  
 
-    ### Fields to extract:
-    - location: string (city/region in India, or "Unknown")  
-    - duration_days: integer (default = 3)  
-    - budget: integer (in INR, default = 20000; convert words like "20k" or "twenty thousand" into numbers)  
-    - themes: list of strings (choose from ["heritage", "nightlife", "adventure", "food", "nature", "general"]; default ["general"])  
-    - when: string (time period, else "unspecified")  
-    - preferences: string (special requirements, else "none")  
-    - include_travel_costs: string (true if user mentions including transport costs, else unspecified)  
-    - num_travelers: integer (default = 1)  
-    - traveler_type: string (single, couple, family, group; infer if possible, else "unspecified")  
-    - accommodation: string (hotel, hostel, luxury, budget, homestay, etc.; default "unspecified")  
-    - food_preferences: string (veg, non-veg, vegan, Jain, etc.; default "unspecified")  
-    - transport_mode: string (flight, train, bus, self-drive, etc.; default "unspecified")  
-    - local_transport: string (taxi, rental, metro, walk-friendly; default "unspecified")  
-    - activity_pace: string (relaxed, balanced, packed; default "balanced")  
-    - must_include: list of strings (must-see attractions if specified, else [])  
-    - must_exclude: list of strings (things to avoid if specified, else [])  
-    - purpose: string (honeymoon, vacation, family trip, backpacking, workation, etc.; default "unspecified")  
+    ### Fields to extract:""")
+    prompt.add_text(_field_list(FIELD_DESCRIPTIONS))
+    prompt.add_text("""
     - _extracted_from_user: object (track what was actually provided by user vs defaulted)
 
-    ### Input:
-    "{text}"
-
+    ### Input:""")
+    prompt.add_text(f'"{text}"')
+    prompt.add_text("""
     ### Output (valid JSON only):
-    {{
+    {
       "location": "...",
       "duration_days": ...,
       "budget": ...,
@@ -90,7 +147,7 @@ def llm_parse_user_input(text: str):
       "must_include": [...],
       "must_exclude": [...],
       "purpose": "...",
-      "_extracted_from_user": {{
+      "_extracted_from_user": {
         "location": true/false,
         "duration_days": true/false,
         "budget": true/false,
@@ -102,26 +159,26 @@ def llm_parse_user_input(text: str):
         "transport_mode": true/false,
         "include_travel_costs": true/false,
         "preferences": true/false
-      }}
-    }}
-    """
-    response = invoke_llm(prompt)
-    raw_text = response.text.strip()
+      }
+    }
+    """)
+    return prompt.build()
 
-    # remove ```json ... ``` wrappers if present
-    cleaned = re.sub(r"```(json)?", "", raw_text).strip("` \n")
 
-    try:
-        parsed = json.loads(cleaned)
-    except Exception as e:
-        print(f"Error while parsing LLM output: {e}\nRaw output: {raw_text}")
-        return DEFAULT_SCHEMA.copy()
+def _parse_llm_response(response):
+    parsed = decode_llm_json(getattr(response, "text", None), "parser", expect=dict)
+    if parsed is None:
+        # "_degraded" keeps the defaults out of the session's stage cache
+        return {**DEFAULT_SCHEMA, "_degraded": True}
 
     # Merge with defaults
     final = DEFAULT_SCHEMA.copy()
     for key, value in parsed.items():
         final[key] = value
+    return _normalize_budget(final)
 
+
+def _normalize_budget(final: dict):
     # Normalize budget (handle "20k", "20,000", "twenty thousand")
     if isinstance(final["budget"], str):
         match = re.match(r"(\d+)(k|K)", final["budget"])
@@ -136,6 +193,139 @@ def llm_parse_user_input(text: str):
     return final
 
 
+def fast_parse_user_input(text: str):
+    """
+    Rule-based parse for requests like "3 days in Goa under 20k for 2 people".
+    Returns the parsed request, or None when a FAST_PARSE_REQUIRED field is
+    missing or ambiguous, or the text says more than the extractor can read
+    (attractions, things to avoid, special needs), and the LLM has to read it.
+    """
+    if not FAST_PARSE_ENABLED:
+        return None
+    try:
+        found, ambiguous = extract_trip_fields(text)
+        unparsed = unparsed_content(text)
+    except Exception as e:
+        print(f"Fast parse failed, falling back to the LLM: {e}")
+        found, ambiguous, unparsed = {}, {"error"}, []
+    if ambiguous or unparsed or any(field not in found for field in FAST_PARSE_REQUIRED):
+        PARSER_FAST_PATH.inc(result="fallback")
+        return None
+    PARSER_FAST_PATH.inc(result="hit")
+
+    final = DEFAULT_SCHEMA.copy()
+    # Not stated: left for find_missing_fields() to ask about
+    final["include_travel_costs"] = "unspecified"
+    final.update(found)
+    final["_extracted_from_user"] = {field: field in found for field in EXTRACTION_FLAGS}
+    return _normalize_budget(final)
+
+
+def llm_parse_user_input(text: str):
+    """
+    Send user text to LLM to extract trip details into structured JSON.
+    Requests the rule-based extractor can fully parse skip the LLM.
+    """
+    fast = fast_parse_user_input(text)
+    if fast is not None:
+        return fast
+    response = invoke_llm(_build_parse_prompt(text), call_site="parser", response_schema=PARSED_REQUEST_SCHEMA)
+    return _parse_llm_response(response)
+
+
+async def llm_parse_user_input_async(text: str):
+    """
+    Async version of llm_parse_user_input.
+    """
+    fast = fast_parse_user_input(text)
+    if fast is not None:
+        return fast
+    response = await invoke_llm_async(_build_parse_prompt(text), call_site="parser", response_schema=PARSED_REQUEST_SCHEMA)
+    return _parse_llm_response(response)
+
+
+def _build_answers_prompt(answers: str, parsed: dict, missing: list):
+    prompt = PromptBuilder("parser_delta")
+    prompt.add_text("""
+    You are a travel request parser.
+    The user already described their trip and has now answered follow-up questions.
+    Extract ONLY the fields below from their answers and return a single valid JSON object.
+    In "_extracted_from_user", mark a field true only if the answers actually state it.
+
+    ### Fields to extract:""")
+    prompt.add_text(_field_list(missing))
+    prompt.add_text("### Trip details already known:")
+    prompt.add_json({k: v for k, v in parsed.items() if k not in missing}, omit=INTERNAL_KEYS)
+    prompt.add_text("### Answers:")
+    prompt.add_text(f'"{answers}"')
+    return prompt.build()
+
+
+def _answers_schema(missing: list):
+    """PARSED_REQUEST_SCHEMA cut down to the missing fields."""
+    properties = PARSED_REQUEST_SCHEMA["properties"]
+    flags = [field for field in missing if field in EXTRACTION_FLAGS]
+    return {
+        "type": "OBJECT",
+        "properties": {
+            **{field: properties[field] for field in missing},
+            "_extracted_from_user": {
+                "type": "OBJECT",
+                "properties": {field: {"type": "BOOLEAN"} for field in flags},
+                "required": flags
+            }
+        },
+        "required": missing + ["_extracted_from_user"]
+    }
+
+
+def _merge_answers(parsed: dict, response, missing: list):
+    delta = decode_llm_json(getattr(response, "text", None), "parser_delta", expect=dict)
+    if delta is None:
+        # The answers were not read; keep the request but do not cache it
+        return {**parsed, "_degraded": True}
+    final = dict(parsed)
+    final.pop("_degraded", None)
+    for field in missing:
+        if field in delta:
+            final[field] = delta[field]
+    flags = delta.get("_extracted_from_user")
+    if isinstance(flags, dict):
+        final["_extracted_from_user"] = {**parsed.get("_extracted_from_user", {}), **flags}
+    return _normalize_budget(final)
+
+
+def llm_parse_answers(answers: str, parsed: dict):
+    """
+    Delta parse for the clarification round trip: extract only the fields
+    find_missing_fields reports from the answer text, with a small targeted
+    prompt, and merge them into the already-parsed request.
+    """
+    missing = find_missing_fields(parsed)
+    if not missing:
+        return parsed
+    response = invoke_llm(
+        _build_answers_prompt(answers, parsed, missing), call_site="parser_delta", response_schema=_answers_schema(missing))
+    return _merge_answers(parsed, response, missing)
+
+
+async def llm_parse_answers_async(answers: str, parsed: dict):
+    """
+    Async version of llm_parse_answers.
+    """
+    missing = find_missing_fields(parsed)
+    if not missing:
+        return parsed
+    response = await invoke_llm_async(
+        _build_answers_prompt(answers, parsed, missing), call_site="parser_delta", response_schema=_answers_schema(missing))
+    return _merge_answers(parsed, response, missing)
+
+
+def is_degraded(parsed: dict) -> bool:
+    """True for the fallback returned when the LLM's answer could not be read."""
+    return bool(parsed.get("_degraded"))
+
+
 def find_missing_fields(parsed: dict):
     """
     Identify fields that are still defaults or unspecified.
@@ -1,6 +1,7 @@
-import json
-import re
 from llm_client import invoke_llm
+from llm_json import decode_llm_json
+from prompt_builder import PromptBuilder
+from features.itinerary_generation.incremental_update import affected_days, update_days
 
 def update_itinerary(itinerary: dict, feedback: str) -> dict:
     """
@@ -12,34 +13,30 @@ def update_itinerary(itinerary: dict, feedback: str) -> dict:
 
     Returns:
         dict: Updated itinerary with feedback incorporated.
+
+    Feedback about specific days (by number or by a place in their plan) only
+    regenerates those days; anything else rewrites the whole itinerary.
     """
+    days = affected_days(itinerary, feedback)
+    if days is not None:
+        return update_days(itinerary, days, feedback)
 
-    prompt = f"""
+    prompt = PromptBuilder("itinerary_updater")
+    prompt.add_text("""
     You are an AI trip planner.
     
-    Current Itinerary (JSON):
-    {json.dumps(itinerary, indent=2)}
-
-    User Feedback: "{feedback}"
-
+    Current Itinerary (JSON):""")
+    prompt.add_json(itinerary)
+    prompt.add_text(f'User Feedback: "{feedback}"')
+    prompt.add_text("""
     Rules:
     - Keep unchanged days/activities unless directly impacted by feedback.
     - Apply modifications strictly based on feedback.
     - Maintain consistency in structure (same day numbering, keys, etc.).
     - Always return the full updated itinerary as valid JSON only.
-    """
-
-    print("Prompt sent to LLM:")
-    print(prompt)
-
-    response = invoke_llm(prompt)
-    raw_text = response.text.strip()
-
-    # Clean possible markdown wrappers from LLM response
-    cleaned = re.sub(r"^```(json)?|```$", "", raw_text, flags=re.MULTILINE).strip()
+    """)
+    prompt = prompt.build()
 
-    try:
-        return json.loads(cleaned)
-    except Exception as e:
-        print(f"Error parsing updated itinerary: {e}")
-        return itinerary
+    # JSON mode without a schema: the itinerary may carry extra keys (notes, reasons)
+    response = invoke_llm(prompt, call_site="itinerary_updater", json_mode=True)
+    return decode_llm_json(getattr(response, "text", None), "itinerary_updater", default=itinerary, expect=dict)
@@ -1,7 +1,19 @@
 from serpapi.google_search import GoogleSearch
+import asyncio
 import os
+from cache_backend import NamespacedCache
+from tracing import traced
+
+IMAGE_CACHE_TTL = int(os.getenv("IMAGE_CACHE_TTL", str(30 * 24 * 3600)))
+
+image_cache = NamespacedCache("place_images", IMAGE_CACHE_TTL, local_items=2048)
 
 def fetch_place_image(place):
+    # A place's top image result is stable; SerpAPI searches are metered
+    return image_cache.get_or_compute(place.strip().lower(), lambda: _search_place_image(place))
+
+@traced("serpapi image_search", "client")
+def _search_place_image(place):
     params = {
         "engine": "google",
         "q": place,
@@ -16,7 +28,12 @@ def fetch_place_image(place):
         return results["images_results"][0]["original"]
     return None
 
+async def fetch_place_image_async(place):
+    # SerpAPI's client is blocking, so run it off the event loop
+    return await asyncio.to_thread(fetch_place_image, place)
+
 # Example usage
-place = "Eiffel Tower"
-image_url = fetch_place_image(place)
-print(image_url)
+if __name__ == "__main__":
+    place = "Eiffel Tower"
+    image_url = fetch_place_image(place)
+    print(image_url)
@@ -2,6 +2,7 @@ from serpapi import GoogleSearch
 import os
 import json
 from dotenv import load_dotenv
+from tracing import traced
 
 # Load environment variables from .env file
 from dotenv import load_dotenv, find_dotenv
@@ -9,6 +10,7 @@ dotenv_path = find_dotenv()
 print(f"DEBUG: Found .env at: {dotenv_path}")
 load_dotenv(dotenv_path)
 
+@traced("serpapi google_maps_reviews", "client")
 def fetch_google_reviews(place, limit=10):
     """
     Fetch Google Maps reviews for a given place using SerpAPI.
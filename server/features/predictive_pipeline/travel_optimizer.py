@@ -2,6 +2,7 @@ import googlemaps
 import os
 from dotenv import load_dotenv
 import datetime
+from tracing import span
 
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_MAP_KEY")
@@ -15,12 +16,13 @@ def fetch_travel_time_matrix(locations, departure_time=None):
         for j in range(n):
             if i == j:
                 continue
-            resp = gmaps.distance_matrix(
-                origins=[locations[i]],
-                destinations=[locations[j]],
-                mode="driving",
-                departure_time=departure_time
-            )
+            with span("google_maps distance_matrix", "client", origin=locations[i], destination=locations[j]):
+                resp = gmaps.distance_matrix(
+                    origins=[locations[i]],
+                    destinations=[locations[j]],
+                    mode="driving",
+                    departure_time=departure_time
+                )
             element = resp["rows"][0]["elements"][0]
             duration_sec = element.get("duration", {}).get("value", 0)
             matrix[i][j] = duration_sec // 60
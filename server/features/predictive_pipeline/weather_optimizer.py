@@ -1,9 +1,9 @@
 from llm_client import invoke_llm
+from llm_json import decode_llm_json
 from features.weather.weather_service import get_weather_forecast
 from features.predictive_pipeline.travel_optimizer import optimize_itinerary_sequence
-from features.itinerary_generation.itinerary_generator import generate_itinerary
-import json
-import re
+from features.itinerary_generation.itinerary_generator import generate_itinerary, ITINERARY_SCHEMA
+from prompt_builder import INTERNAL_KEYS, PromptBuilder
 
 
 def optimize_itinerary(itinerary_json: dict, parsed_input: dict, start_day: int = 2, city: str = "Goa"):
@@ -40,35 +40,29 @@ def optimize_itinerary(itinerary_json: dict, parsed_input: dict, start_day: int
 
     weather_text = "\n".join(weather_summary)
 
-    weather_prompt = f"""
+    weather_prompt = PromptBuilder("weather_optimizer")
+    weather_prompt.add_text(f"""
     You are an experienced travel planner. 
     Regenerate the itinerary only from day {start_day} onward for this trip.
 
-    Weather Forecast:
-    {weather_text}
-
-    Trip Request JSON:
-    {json.dumps(parsed_input, indent=2)}
-
+    Weather Forecast:""")
+    weather_prompt.add_text(weather_text)
+    weather_prompt.add_text("""
+    Trip Request JSON:""")
+    weather_prompt.add_json(parsed_input, omit=INTERNAL_KEYS)
+    weather_prompt.add_text("""
     Rules:
     - Adjust activities based on weather (rain = indoor, sunny = outdoor)
     - Return ONLY JSON with itinerary + total cost
-    """
-
-    weather_response = invoke_llm(weather_prompt)
-    raw_weather = weather_response.text.strip()
-    cleaned_weather = re.sub(r"```(json)?", "", raw_weather).strip("` \n")
-
-    try:
-        print(f"Weather LLM Response: {cleaned_weather}")
-        weather_json = json.loads(cleaned_weather)
-        weather_itinerary_dict = weather_json.get("itinerary", {})
-        weather_opt = [weather_itinerary_dict[key] for key in sorted(weather_itinerary_dict.keys())]
-
-        # weather_opt = json.loads(cleaned_weather).get("itinerary", [])
-    except Exception as e:
-        print(f"Error parsing weather itinerary: {e}")
-        weather_opt = itinerary[start_idx:]  # fallback
+    """)
+
+    weather_response = invoke_llm(weather_prompt.build(), call_site="weather_optimizer", response_schema=ITINERARY_SCHEMA)
+    weather_json = decode_llm_json(getattr(weather_response, "text", None), "weather_optimizer", default={}, expect=dict)
+    weather_itinerary = weather_json.get("itinerary")
+    if isinstance(weather_itinerary, dict):
+        # Older free-form responses keyed the days ("day_2": {...}) instead of a list
+        weather_itinerary = [weather_itinerary[key] for key in sorted(weather_itinerary.keys())]
+    weather_opt = weather_itinerary or itinerary[start_idx:]  # fallback
 
     # -------------------------
     # 2️⃣ Travel Optimization
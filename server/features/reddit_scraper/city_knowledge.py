@@ -0,0 +1,242 @@
+"""
+Precomputed Reddit summaries for the cities we serve most.
+
+Build (or refresh) the store, e.g. nightly from cron:
+    python -m features.reddit_scraper.city_knowledge build --workers 4
+Or keep a process running that rebuilds every night at 02:30:
+    python -m features.reddit_scraper.city_knowledge schedule --at 02:30
+List what is stored:
+    python -m features.reddit_scraper.city_knowledge list
+"""
+import argparse
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+
+from data import INDIAN_AIRPORTS
+from metrics import CITY_KNOWLEDGE_LOOKUPS
+
+CITY_KNOWLEDGE_ENABLED = os.getenv("CITY_KNOWLEDGE_ENABLED", "true").lower() == "true"
+CITY_KNOWLEDGE_PATH = os.getenv(
+    "CITY_KNOWLEDGE_PATH",
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".cache", "city_knowledge.sqlite3"))
+)
+# Summaries older than this are ignored and the request crawls live instead
+CITY_KNOWLEDGE_MAX_AGE_DAYS = float(os.getenv("CITY_KNOWLEDGE_MAX_AGE_DAYS", "14"))
+CITY_KNOWLEDGE_KEEP_VERSIONS = int(os.getenv("CITY_KNOWLEDGE_KEEP_VERSIONS", "3"))
+CITY_KNOWLEDGE_POSTS = int(os.getenv("CITY_KNOWLEDGE_POSTS", "25"))
+
+KNOWN_CITIES = sorted({airport["city"] for airport in INDIAN_AIRPORTS})
+
+
+def _normalize(city: str) -> str:
+    return re.sub(r"[^a-z ]", "", (city or "").lower()).strip()
+
+
+class CityKnowledgeStore:
+    """
+    Versioned city summaries in SQLite. Every build adds a new version per city
+    and prunes all but the last CITY_KNOWLEDGE_KEEP_VERSIONS.
+
+    Lookups are served from an in-memory map of the latest versions, which is
+    reloaded when the database file changes (e.g. after a nightly build run by
+    another process), so the request path does a dict lookup, not a query.
+    """
+
+    def __init__(self, path=CITY_KNOWLEDGE_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._loaded_mtime = None
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS city_summaries ("
+                "city TEXT, version INTEGER, summary TEXT, posts INTEGER, created_at REAL, "
+                "PRIMARY KEY (city, version))"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def put(self, city: str, summary: str, posts: int) -> int:
+        """Store a new version of a city's summary and return its version number."""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT MAX(version) FROM city_summaries WHERE city = ?", (city,)).fetchone()
+            version = (row[0] or 0) + 1
+            conn.execute(
+                "INSERT INTO city_summaries (city, version, summary, posts, created_at) VALUES (?, ?, ?, ?, ?)",
+                (city, version, summary, posts, time.time())
+            )
+            conn.execute(
+                "DELETE FROM city_summaries WHERE city = ? AND version <= ?",
+                (city, version - CITY_KNOWLEDGE_KEEP_VERSIONS)
+            )
+        return version
+
+    def _mtime(self):
+        # WAL-mode writes land in the -wal file first
+        stamps = []
+        for suffix in ("", "-wal"):
+            try:
+                stamps.append(os.stat(self.path + suffix).st_mtime)
+            except OSError:
+                pass
+        return max(stamps) if stamps else None
+
+    def _reload_if_changed(self):
+        mtime = self._mtime()
+        if mtime == self._loaded_mtime:
+            return
+        with closing(self._connect()) as conn, conn:
+            rows = conn.execute(
+                "SELECT city, version, summary, created_at FROM city_summaries s "
+                "WHERE version = (SELECT MAX(version) FROM city_summaries WHERE city = s.city)"
+            ).fetchall()
+        self._latest = {_normalize(city): (city, version, summary, created_at) for city, version, summary, created_at in rows}
+        self._loaded_mtime = mtime
+
+    def _resolve(self, place: str):
+        key = _normalize(place)
+        if key in self._latest:
+            return self._latest[key]
+        # "North Goa" -> Goa, "Delhi" -> New Delhi
+        for name, entry in self._latest.items():
+            if re.search(rf"\b{re.escape(name)}\b", key) or re.search(rf"\b{re.escape(key)}\b", name):
+                return entry
+        return None
+
+    def latest(self, place: str):
+        """Latest fresh summary for a place, or None if it has to be crawled live."""
+        with self._lock:
+            try:
+                self._reload_if_changed()
+            except sqlite3.Error as e:
+                print(f"City knowledge store unavailable: {e}")
+                return None
+            entry = self._resolve(place) if _normalize(place) else None
+        if entry is None or time.time() - entry[3] > CITY_KNOWLEDGE_MAX_AGE_DAYS * 86400:
+            CITY_KNOWLEDGE_LOOKUPS.inc(result="miss")
+            return None
+        CITY_KNOWLEDGE_LOOKUPS.inc(result="hit")
+        return entry[2]
+
+    def versions(self):
+        with closing(self._connect()) as conn, conn:
+            return conn.execute(
+                "SELECT city, version, posts, LENGTH(summary), created_at FROM city_summaries ORDER BY city, version"
+            ).fetchall()
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_city_knowledge():
+    """Process-wide store, or None when disabled or unavailable."""
+    global _STORE
+    if not CITY_KNOWLEDGE_ENABLED:
+        return None
+    with _STORE_LOCK:
+        if _STORE is None:
+            try:
+                _STORE = CityKnowledgeStore()
+            except (sqlite3.Error, OSError) as e:
+                print(f"City knowledge store unavailable: {e}")
+                return None
+    return _STORE
+
+
+def summarize_city(city: str, limit=CITY_KNOWLEDGE_POSTS):
+    """fetch -> preprocess -> summarize for one city; returns (summary, post_count)."""
+    # Imported here so the request path does not need PRAW just to read the store
+    from features.reddit_scraper.scraper import fetch_reddit_comments
+    from features.reddit_scraper.preprocess import preprocess_reddit_data
+    from features.reddit_scraper.summarizer import summarize_places
+
+    # Offline, so wait for every comment tree rather than cut the crawl short
+    posts = fetch_reddit_comments(city, limit=limit, budget=None)
+    if not posts:
+        return "", 0
+    return summarize_places(preprocess_reddit_data(posts, city), city), len(posts)
+
+
+def build_city_knowledge(cities=None, workers=4, store=None):
+    """Summarize every city (default: all INDIAN_AIRPORTS cities) on a worker pool."""
+    store = store or CityKnowledgeStore()
+    cities = cities or KNOWN_CITIES
+    built, failed = 0, 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(summarize_city, city): city for city in cities}
+        for future in as_completed(futures):
+            city = futures[future]
+            try:
+                summary, posts = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[city-knowledge] {city}: failed: {e}")
+                continue
+            if not summary:
+                failed += 1
+                print(f"[city-knowledge] {city}: no summary, keeping the previous version")
+                continue
+            version = store.put(city, summary, posts)
+            built += 1
+            print(f"[city-knowledge] {city}: v{version} from {posts} posts")
+    print(f"[city-knowledge] built {built}/{len(cities)} cities in {time.perf_counter() - start:.1f}s ({failed} failed)")
+    return built, failed
+
+
+def _seconds_until(at: str) -> float:
+    hour, minute = (int(part) for part in at.split(":"))
+    now = datetime.datetime.now()
+    next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += datetime.timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def run_schedule(at="02:30", workers=4):
+    """Rebuild every day at `at` (local time, HH:MM). Runs until interrupted."""
+    while True:
+        wait = _seconds_until(at)
+        print(f"[city-knowledge] next build in {wait / 3600:.1f}h")
+        time.sleep(wait)
+        try:
+            build_city_knowledge(workers=workers)
+        except Exception as e:
+            print(f"[city-knowledge] scheduled build failed: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute Reddit summaries for INDIAN_AIRPORTS cities")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="summarize cities now")
+    build.add_argument("--cities", nargs="*", help="subset of cities (default: all)")
+    build.add_argument("--workers", type=int, default=4)
+    schedule = sub.add_parser("schedule", help="rebuild every night")
+    schedule.add_argument("--at", default="02:30", help="local time HH:MM")
+    schedule.add_argument("--workers", type=int, default=4)
+    sub.add_parser("list", help="show stored versions")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_city_knowledge(args.cities, args.workers)
+    elif args.command == "schedule":
+        run_schedule(args.at, args.workers)
+    else:
+        for city, version, posts, chars, created_at in CityKnowledgeStore().versions():
+            stamp = datetime.datetime.fromtimestamp(created_at).strftime("%Y-%m-%d %H:%M")
+            print(f"{city:20} v{version:<3} {posts:>3} posts {chars:>6} chars  {stamp}")
+
+
+if __name__ == "__main__":
+    main()
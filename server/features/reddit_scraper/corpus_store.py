@@ -0,0 +1,189 @@
+"""
+Local corpus of the Reddit posts crawled per place.
+
+Submissions and comments are kept by their Reddit ids with fetch timestamps,
+and each place remembers the newest submission it has seen (the watermark),
+so a refresh only has to pull what was posted after the last crawl.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+REDDIT_CORPUS_ENABLED = os.getenv("REDDIT_CORPUS_ENABLED", "true").lower() == "true"
+REDDIT_CORPUS_PATH = os.getenv(
+    "REDDIT_CORPUS_PATH",
+    os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".cache", "reddit_corpus.sqlite3"))
+)
+
+
+def place_key(place: str) -> str:
+    return re.sub(r"\s+", " ", (place or "").lower()).strip()
+
+
+class CorpusStore:
+    """
+    Submissions, comments and per-place crawl state in SQLite (WAL, so every
+    worker process reads while one writes).
+
+    `add()` takes submissions as dicts with id, title, score, created_utc and
+    comments, a list of (comment id, body, score) or None when the comment tree
+    was not fetched yet (with comments_failed set when fetching it failed).
+    """
+
+    def __init__(self, path=REDDIT_CORPUS_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS submissions ("
+                "id TEXT PRIMARY KEY, title TEXT, score INTEGER, created_utc REAL, "
+                "fetched_at REAL, comments_fetched_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS comments ("
+                "id TEXT PRIMARY KEY, submission_id TEXT, position INTEGER, body TEXT, fetched_at REAL, "
+                "score INTEGER)"
+            )
+            # Corpora created before comment scores and failed fetches were kept
+            if "score" not in {row[1] for row in conn.execute("PRAGMA table_info(comments)")}:
+                conn.execute("ALTER TABLE comments ADD COLUMN score INTEGER")
+            if "comments_attempted_at" not in {row[1] for row in conn.execute("PRAGMA table_info(submissions)")}:
+                conn.execute("ALTER TABLE submissions ADD COLUMN comments_attempted_at REAL")
+            conn.execute("CREATE INDEX IF NOT EXISTS comments_by_submission ON comments (submission_id, position)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS place_submissions ("
+                "place TEXT, submission_id TEXT, PRIMARY KEY (place, submission_id))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS crawls ("
+                "place TEXT PRIMARY KEY, watermark REAL, crawl_limit INTEGER, crawled_at REAL)"
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def crawl(self, place: str):
+        """Crawl state of a place ({watermark, crawl_limit, crawled_at}), or None if never crawled."""
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT watermark, crawl_limit, crawled_at FROM crawls WHERE place = ?", (place,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"watermark": row[0], "crawl_limit": row[1], "crawled_at": row[2]}
+
+    def add(self, place: str, submissions, crawl_limit=0):
+        """Store a crawl's submissions for a place and advance its watermark."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            for submission in submissions:
+                conn.execute(
+                    "INSERT INTO submissions (id, title, score, created_utc, fetched_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET title = excluded.title, score = excluded.score, "
+                    "fetched_at = excluded.fetched_at",
+                    (submission["id"], submission["title"], submission["score"], submission["created_utc"], now)
+                )
+                conn.execute(
+                    "INSERT OR IGNORE INTO place_submissions (place, submission_id) VALUES (?, ?)",
+                    (place, submission["id"])
+                )
+                if submission["comments"] is not None:
+                    self._put_comments(conn, submission["id"], submission["comments"], now)
+                elif submission.get("comments_failed"):
+                    self._mark_attempted(conn, [submission["id"]], now)
+            watermark = max((s["created_utc"] for s in submissions), default=0.0)
+            conn.execute(
+                "INSERT INTO crawls (place, watermark, crawl_limit, crawled_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(place) DO UPDATE SET watermark = MAX(watermark, excluded.watermark), "
+                "crawl_limit = MAX(crawl_limit, excluded.crawl_limit), crawled_at = excluded.crawled_at",
+                (place, watermark, crawl_limit, now)
+            )
+
+    def set_comments(self, comments_by_id: dict):
+        """Store comment trees fetched for submissions already in the corpus."""
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            for submission_id, comments in comments_by_id.items():
+                self._put_comments(conn, submission_id, comments, now)
+
+    def mark_attempted(self, submission_ids):
+        """Record failed comment fetches, so unhydrated() holds them back until the retry interval passes."""
+        with closing(self._connect()) as conn, conn:
+            self._mark_attempted(conn, submission_ids, time.time())
+
+    @staticmethod
+    def _mark_attempted(conn, submission_ids, now):
+        conn.executemany(
+            "UPDATE submissions SET comments_attempted_at = ? WHERE id = ?",
+            [(now, submission_id) for submission_id in submission_ids]
+        )
+
+    @staticmethod
+    def _put_comments(conn, submission_id, comments, now):
+        conn.execute("DELETE FROM comments WHERE submission_id = ?", (submission_id,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO comments (id, submission_id, position, body, score, fetched_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(comment_id, submission_id, i, body, score, now) for i, (comment_id, body, score) in enumerate(comments)]
+        )
+        conn.execute("UPDATE submissions SET comments_fetched_at = ? WHERE id = ?", (now, submission_id))
+
+    def _top(self, conn, place, limit):
+        return conn.execute(
+            "SELECT s.id, s.title, s.score, s.comments_fetched_at, s.comments_attempted_at FROM place_submissions p "
+            "JOIN submissions s ON s.id = p.submission_id WHERE p.place = ? "
+            "ORDER BY s.score DESC, s.created_utc DESC LIMIT ?",
+            (place, limit)
+        ).fetchall()
+
+    def posts(self, place: str, limit: int):
+        """Top `limit` posts for a place by score, as {title, score, comments, comment_scores} like a live crawl."""
+        with closing(self._connect()) as conn, conn:
+            posts = []
+            for submission_id, title, score, _, _ in self._top(conn, place, limit):
+                comments = conn.execute(
+                    "SELECT body, score FROM comments WHERE submission_id = ? ORDER BY position", (submission_id,)
+                ).fetchall()
+                posts.append({
+                    "title": title,
+                    "score": score or 0,
+                    "comments": [body for body, _ in comments],
+                    "comment_scores": [comment_score or 0 for _, comment_score in comments],
+                })
+        return posts
+
+    def unhydrated(self, place: str, limit: int, retry_after=0.0):
+        """
+        Ids among the top `limit` posts whose comments were never fetched, leaving
+        out those whose last fetch failed less than `retry_after` seconds ago.
+        """
+        cutoff = time.time() - retry_after
+        with closing(self._connect()) as conn, conn:
+            return [
+                submission_id for submission_id, _, _, fetched, attempted in self._top(conn, place, limit)
+                if fetched is None and (attempted is None or attempted <= cutoff)
+            ]
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_corpus_store():
+    """Process-wide store, or None when disabled or unavailable."""
+    global _STORE
+    if not REDDIT_CORPUS_ENABLED:
+        return None
+    with _STORE_LOCK:
+        if _STORE is None:
+            try:
+                _STORE = CorpusStore()
+            except (sqlite3.Error, OSError) as e:
+                print(f"Reddit corpus store unavailable: {e}")
+                return None
+    return _STORE
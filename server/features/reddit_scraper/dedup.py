@@ -0,0 +1,131 @@
+"""
+Near-duplicate comment removal ahead of the summarizer.
+
+Threads repeat the same tip many times ("+1, go to Baga beach"). Each comment
+gets a MinHash signature over its word bigrams; signatures are cut into bands
+and only comments sharing a band bucket are compared, so the pass is roughly
+linear in the number of comments instead of comparing every pair. Of each
+group of near-duplicates the highest-voted comment is kept.
+"""
+import os
+from itertools import chain
+
+import numpy as np
+
+from data import INDIAN_AIRPORTS
+from metrics import REDDIT_DEDUP_TOKENS_SAVED
+from prompt_builder import CHARS_PER_TOKEN
+from features.reddit_scraper.corpus_store import place_key
+from features.reddit_scraper.selection import tokenize
+
+REDDIT_DEDUP_ENABLED = os.getenv("REDDIT_DEDUP_ENABLED", "true").lower() == "true"
+# Estimated Jaccard similarity (of word bigrams) above which comments count as duplicates
+REDDIT_DEDUP_THRESHOLD = float(os.getenv("REDDIT_DEDUP_THRESHOLD", "0.7"))
+
+# 16 bands of 4 rows: pairs at Jaccard 0.7 share a bucket ~99% of the time, at 0.3 ~12%
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Shingles hashed per numpy batch (batch x NUM_PERM uint64 values in memory)
+_BATCH_SHINGLES = 50_000
+_EMPTY = np.iinfo(np.uint64).max
+
+# Multiply-shift hash family: (a * x + b) mod 2^64, top 32 bits; uint64 arithmetic wraps, so no modulo
+_rng = np.random.default_rng(1)
+_A = _rng.integers(1, 1 << 63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+_BAND_MIX = _rng.integers(1, 1 << 63, ROWS, dtype=np.uint64)
+
+KNOWN_CITIES = {place_key(airport["city"]) for airport in INDIAN_AIRPORTS}
+
+
+def shingles(text: str):
+    """Hashed word bigrams (single words for one-word comments); one-letter tokens like the 1 of "+1" are dropped."""
+    words = [word for word in tokenize(text) if len(word) > 1]
+    grams = zip(words, words[1:]) if len(words) > 1 else words
+    return {hash(gram) & 0x7FFFFFFF for gram in grams}
+
+
+def minhash_signatures(docs_shingles):
+    """(documents x NUM_PERM) MinHash signatures; rows of documents without shingles are left at the maximum."""
+    n = len(docs_shingles)
+    counts = np.fromiter((len(s) for s in docs_shingles), dtype=np.int64, count=n)
+    ends = np.cumsum(counts)
+    starts = ends - counts
+    flat = np.fromiter(chain.from_iterable(docs_shingles), dtype=np.uint64, count=int(ends[-1]) if n else 0)
+    signatures = np.full((n, NUM_PERM), _EMPTY, dtype=np.uint64)
+
+    lo = 0
+    while lo < n:
+        # Whole documents per batch, about _BATCH_SHINGLES shingles at a time
+        hi = max(lo + 1, int(np.searchsorted(ends, starts[lo] + _BATCH_SHINGLES, side="right")))
+        docs = np.arange(lo, hi)[counts[lo:hi] > 0]
+        if len(docs):
+            first, last = starts[lo], ends[hi - 1]
+            hashed = (flat[first:last, None] * _A + _B) >> _SHIFT
+            signatures[docs] = np.minimum.reduceat(hashed, starts[docs] - first, axis=0)
+        lo = hi
+    return signatures
+
+
+def near_duplicates(texts, priority=None, threshold=REDDIT_DEDUP_THRESHOLD):
+    """
+    Indexes of the texts that near-duplicate a text kept before them. Texts are
+    visited by descending `priority` (e.g. votes), so the best of a group stays.
+    """
+    docs_shingles = [shingles(text) for text in texts]
+    signatures = minhash_signatures(docs_shingles)
+    # One 64-bit key per band; a colliding key only costs a signature comparison
+    band_keys = np.bitwise_xor.reduce(signatures.reshape(len(texts), BANDS, ROWS) * _BAND_MIX, axis=2)
+
+    order = range(len(texts)) if priority is None else np.argsort(-np.asarray(priority), kind="stable")
+    buckets, duplicates = {}, set()
+    for i in order:
+        i = int(i)
+        if not docs_shingles[i]:
+            continue
+        keys = list(enumerate(band_keys[i].tolist()))
+        candidates = list({j for key in keys for j in buckets.get(key, ())})
+        if candidates:
+            agreement = np.count_nonzero(signatures[candidates] == signatures[i], axis=1)
+            if agreement.max() >= threshold * NUM_PERM:
+                duplicates.add(i)
+                continue
+        for key in keys:
+            buckets.setdefault(key, []).append(i)
+    return duplicates
+
+
+def dedup_posts(posts, place=""):
+    """
+    Posts without near-duplicate comments (across all posts), with the tokens
+    removed reported per city in reddit_dedup_tokens_saved_total.
+    """
+    if not REDDIT_DEDUP_ENABLED:
+        return posts
+    comments, votes = [], []
+    for post in posts:
+        scores = post.get("comment_scores") or [0] * len(post.get("comments") or [])
+        for comment, score in zip(post.get("comments") or [], scores):
+            comments.append(comment)
+            votes.append(score or 0)
+    if len(comments) < 2:
+        return posts
+
+    duplicates = near_duplicates(comments, votes)
+    deduped, i = [], 0
+    for post in posts:
+        kept = []
+        scores = post.get("comment_scores") or [0] * len(post.get("comments") or [])
+        for comment, score in zip(post.get("comments") or [], scores):
+            if i not in duplicates:
+                kept.append((comment, score))
+            i += 1
+        deduped.append({**post, "comments": [c for c, _ in kept], "comment_scores": [s for _, s in kept]})
+
+    saved = sum((len(comments[i]) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN for i in duplicates)
+    key = place_key(place)
+    REDDIT_DEDUP_TOKENS_SAVED.inc(saved, city=key if key in KNOWN_CITIES else "other")
+    print(f"Dropped {len(duplicates)}/{len(comments)} near-duplicate Reddit comments for {place or 'the summary'}, ~{saved} tokens")
+    return deduped
@@ -1,6 +1,10 @@
-def preprocess_reddit_data(posts):
-    text_corpus = []
-    for post in posts:
-        text_corpus.append(post["title"])
-        text_corpus.extend(post["comments"])
-    return " ".join(text_corpus[:2000])  # truncate for MVP
+from features.reddit_scraper.dedup import dedup_posts
+from features.reddit_scraper.selection import REDDIT_SELECTION_TOKENS, select_corpus
+
+
+def preprocess_reddit_data(posts, place="", themes=(), budget=REDDIT_SELECTION_TOKENS):
+    """
+    Text block for the summarizer: near-duplicate comments dropped, then the
+    most relevant titles and comments within `budget` tokens.
+    """
+    return select_corpus(dedup_posts(posts, place), place, themes, budget)
@@ -1,32 +1,356 @@
+import asyncio
+import math
 import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+
 import praw
 from dotenv import load_dotenv
+from cache_backend import NamespacedCache
+from deadline import remaining
+from metrics import REDDIT_CORPUS_LOOKUPS, REDDIT_CRAWL_CALLS, REDDIT_CRAWL_RELEVANT, REDDIT_HYDRATIONS
+from features.reddit_scraper.corpus_store import get_corpus_store, place_key
+from features.reddit_scraper.suggest_subreddits import FALLBACK_SUBREDDITS, suggest_subreddits
+from tracing import propagate, span, traced
 
 load_dotenv()
 
 CLIENT_ID = os.getenv('REDDIT_CLIENT_ID')
 CLIENT_SECRET = os.getenv('REDDIT_CLIENT_SECRET')
 USER_AGENT = os.getenv('REDDIT_USER_AGENT')
+# A place crawled longer ago than this is refreshed in the background on its next request
+REDDIT_REFRESH_SECONDS = int(os.getenv('REDDIT_REFRESH_SECONDS', str(24 * 3600)))
+# Newest submissions a refresh looks through before reaching the watermark
+REDDIT_REFRESH_MAX_POSTS = int(os.getenv('REDDIT_REFRESH_MAX_POSTS', '100'))
+# Comment trees fetched in parallel, shared by all crawls in the process
+REDDIT_HYDRATE_WORKERS = int(os.getenv('REDDIT_HYDRATE_WORKERS', '8'))
+# Reddit allows 100 OAuth requests a minute per client id
+REDDIT_REQUESTS_PER_MINUTE = float(os.getenv('REDDIT_REQUESTS_PER_MINUTE', '100'))
+# Upper bound on one crawl's comment fetching; a request deadline can shorten it
+REDDIT_HYDRATE_BUDGET_SECONDS = float(os.getenv('REDDIT_HYDRATE_BUDGET_SECONDS', '20'))
+# Stop this long before the caller's reserve so partial results make it back in time
+REDDIT_RETURN_MARGIN_SECONDS = 0.5
+COMMENTS_PER_POST = 20
+# targeted: search the subreddits suggested for the place in parallel; all: one r/all search
+REDDIT_CRAWL_MODE = os.getenv('REDDIT_CRAWL_MODE', 'targeted').lower()
+REDDIT_MAX_SUBREDDITS = int(os.getenv('REDDIT_MAX_SUBREDDITS', '5'))
+REDDIT_SUBREDDITS_TTL = int(os.getenv('REDDIT_SUBREDDITS_TTL', str(30 * 24 * 3600)))
+# Each subreddit is asked for this many times its share of the posts, so duplicates do not leave the crawl short
+REDDIT_OVERFETCH = float(os.getenv('REDDIT_OVERFETCH', '1.5'))
+
+subreddit_cache = NamespacedCache("reddit_subreddits", REDDIT_SUBREDDITS_TTL)
+_SUBREDDIT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_]{1,20}$")
+
+
+class RateLimiter:
+    """Token bucket shared by the hydration threads, so parallel fetches stay under Reddit's limit."""
+
+    def __init__(self, per_minute, burst):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop_at):
+        """Wait for a request slot; False if none frees up before `stop_at` (monotonic)."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > stop_at:
+                return False
+            time.sleep(wait)
+
+
+rate_limiter = RateLimiter(REDDIT_REQUESTS_PER_MINUTE, burst=REDDIT_HYDRATE_WORKERS)
+# _fetch_comments() result for a post whose comments could not be fetched
+_FETCH_FAILED = object()
+# Searches and comment-tree fetches of every crawl share these threads
+_request_pool = ThreadPoolExecutor(max_workers=REDDIT_HYDRATE_WORKERS, thread_name_prefix="reddit")
+_local = threading.local()
+
+
+def _reddit():
+    # PRAW instances are not thread-safe; each thread keeps its own (and its OAuth token)
+    client = getattr(_local, "reddit", None)
+    if client is None:
+        client = _local.reddit = praw.Reddit(
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            user_agent=USER_AGENT
+        )
+    return client
+
+
+def fetch_reddit_comments(place: str, limit=50, reserve=0.0, budget=REDDIT_HYDRATE_BUDGET_SECONDS):
+    """
+    Top `limit` posts about `place` with up to COMMENTS_PER_POST comments each.
 
-reddit = praw.Reddit(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET,
-    user_agent=USER_AGENT
-)
-
-def fetch_reddit_comments(place: str, limit=50):
-    results = []
-    query = f"{place} travel OR trip OR recommendations"
-
-    for submission in reddit.subreddit("all").search(query, limit=limit):
-        # Collect post title + comments
-        post_data = {
-            "title": submission.title,
-            "comments": []
+    Served from the local corpus: a place seen before never waits on Reddit, and
+    when its last crawl is older than REDDIT_REFRESH_SECONDS (or some comment
+    trees are still missing) only newer submissions are pulled, in the background.
+    Only a place's first crawl runs on the request path, fetching comment trees
+    in parallel until `budget` seconds (or the request deadline minus `reserve`
+    seconds) run out; posts not reached by then come back with their title only.
+    `budget=None` waits for every post and refreshes inline (offline jobs).
+    """
+    store = get_corpus_store()
+    if store is None:
+        return _as_posts(_crawl_reddit(place, limit, reserve, budget))
+
+    key = place_key(place)
+    crawled = None
+    try:
+        crawl = store.crawl(key)
+        if crawl is None or crawl["crawl_limit"] < limit:
+            REDDIT_CORPUS_LOOKUPS.inc(result="cold")
+            crawled = _crawl_reddit(place, limit, reserve, budget)
+            if not crawled:
+                # Nothing found (or Reddit unreachable): do not record an empty crawl as fresh
+                return []
+            store.add(key, crawled, crawl_limit=limit)
+        elif (time.time() - crawl["crawled_at"] > REDDIT_REFRESH_SECONDS
+              or store.unhydrated(key, limit, retry_after=REDDIT_REFRESH_SECONDS)):
+            REDDIT_CORPUS_LOOKUPS.inc(result="stale")
+            if budget is None:
+                _refresh_reddit(place, key, crawl["watermark"], limit, budget)
+            else:
+                _refresh_in_background(place, key, crawl["watermark"], limit)
+        else:
+            REDDIT_CORPUS_LOOKUPS.inc(result="hit")
+        return store.posts(key, limit)
+    except sqlite3.Error as e:
+        print(f"Reddit corpus store unavailable: {e}")
+        return _as_posts(crawled if crawled is not None else _crawl_reddit(place, limit, reserve, budget))
+
+
+def _query(place: str) -> str:
+    return f"{place} travel OR trip OR recommendations"
+
+
+def _as_posts(submissions):
+    return [
+        {
+            "title": s["title"],
+            "score": s["score"],
+            "comments": [body for _, body, _ in s["comments"] or []],
+            "comment_scores": [score for _, _, score in s["comments"] or []],
         }
-        submission.comments.replace_more(limit=0)  # Flatten nested comments
-        for comment in submission.comments.list()[:20]:  # limit per post
-            post_data["comments"].append(comment.body)
-        results.append(post_data)
+        for s in submissions
+    ]
+
+
+def _stop_at(reserve, budget):
+    """Monotonic time to stop hydrating at, or None for no limit."""
+    left = remaining()
+    if left is not None:
+        left -= reserve + REDDIT_RETURN_MARGIN_SECONDS
+        budget = left if budget is None else min(budget, left)
+    return None if budget is None else time.monotonic() + max(0.0, budget)
+
+
+@traced("reddit search", "client")
+def _crawl_reddit(place: str, limit: int, reserve=0.0, budget=REDDIT_HYDRATE_BUDGET_SECONDS):
+    """Top `limit` submissions by relevance, with the comment trees fetched in time."""
+    stop_at = _stop_at(reserve, budget)
+    submissions, mode, searches = _search(place, limit, stop_at)
+    comments, failed = _hydrate([submission.id for submission in submissions], stop_at)
+    if len(comments) < len(submissions):
+        print(f"Reddit crawl for {place}: comments for {len(comments)}/{len(submissions)} posts within budget")
+    _record_relevance(place, mode, submissions, searches + len(comments))
+    return [_submission(submission, comments.get(submission.id), submission.id in failed) for submission in submissions]
+
+
+@traced("reddit refresh", "client")
+def _refresh_reddit(place: str, key: str, watermark: float, limit: int, budget=REDDIT_HYDRATE_BUDGET_SECONDS):
+    """Add submissions posted after `watermark`, and fill in comment trees still missing."""
+    store = get_corpus_store()
+    stop_at = _stop_at(0.0, budget)
+    fresh, mode, searches = _search(place, REDDIT_REFRESH_MAX_POSTS, stop_at, watermark)
+    if not searches:
+        print(f"Reddit refresh for {place}: no search succeeded, retrying on the next request")
+        return
+    missing = store.unhydrated(key, limit, retry_after=REDDIT_REFRESH_SECONDS)
+    comments, failed = _hydrate([submission.id for submission in fresh] + missing, stop_at)
+    store.add(key, [_submission(submission, comments.get(submission.id), submission.id in failed) for submission in fresh])
+    store.set_comments({submission_id: comments[submission_id] for submission_id in missing if submission_id in comments})
+    # Posts whose comments cannot be fetched (deleted, private) wait REDDIT_REFRESH_SECONDS before the next try
+    store.mark_attempted([submission_id for submission_id in missing if submission_id in failed])
+    _record_relevance(place, mode, fresh, searches + len(comments))
+    print(f"Reddit refresh for {place}: {len(fresh)} new posts, {len(comments)} comment trees fetched")
+
+
+def _subreddits(place: str):
+    """Subreddits to search for a place, resolved once per place and cached."""
+    def resolve():
+        # The list comes from the LLM, so it can hold numbers or nulls
+        names = [name.strip().removeprefix("r/") for name in suggest_subreddits(place, REDDIT_MAX_SUBREDDITS)
+                 if isinstance(name, str)]
+        return [name for name in dict.fromkeys(names) if _SUBREDDIT_NAME.match(name)]
+
+    # The fallback list means the suggestion failed; try again next crawl instead of keeping it
+    return subreddit_cache.get_or_compute(
+        place_key(place), resolve, cacheable=lambda names: bool(names) and names != FALLBACK_SUBREDDITS)
+
+
+def _search(place: str, limit: int, stop_at, watermark=None):
+    """
+    Submissions about a place: in targeted mode its subreddits are searched in
+    parallel and the listings merged round-robin without duplicates (crossposts
+    share a title); otherwise one r/all search. With a `watermark`, listings are
+    read newest first and stop at it. Returns (submissions, mode, search calls).
+    """
+    sort = "relevance" if watermark is None else "new"
+    subreddits = _subreddits(place) if REDDIT_CRAWL_MODE == "targeted" else []
+    if not subreddits:
+        listing = _listing("all", place, limit, sort, watermark, stop_at)
+        return listing or [], "all", 1 if listing is not None else 0
+
+    per_subreddit = min(100, math.ceil(limit * REDDIT_OVERFETCH / len(subreddits)))
+    listings = _parallel(lambda name: _listing(name, place, per_subreddit, sort, watermark, stop_at), subreddits, stop_at)
+    merged, seen = [], set()
+    ordered = [listings[name] for name in subreddits if name in listings]
+    for rank in range(per_subreddit):
+        for listing in ordered:
+            if rank >= len(listing):
+                continue
+            submission = listing[rank]
+            title = re.sub(r"\W+", " ", submission.title.lower()).strip()
+            if submission.id in seen or title in seen:
+                continue
+            seen.update((submission.id, title))
+            merged.append(submission)
+    return merged[:limit], "targeted", len(listings)
+
+
+def _listing(subreddit: str, place: str, limit: int, sort: str, watermark, stop_at):
+    """One subreddit's search results, or None if it could not be searched in time."""
+    if not rate_limiter.acquire(float("inf") if stop_at is None else stop_at):
+        return None
+    submissions = []
+    try:
+        for submission in _reddit().subreddit(subreddit).search(_query(place), sort=sort, limit=limit):
+            # "new" listings are newest first, so nothing after this is new either
+            if watermark is not None and submission.created_utc <= watermark:
+                break
+            submissions.append(submission)
+    except Exception as e:
+        # e.g. a suggested subreddit that does not exist or is private
+        print(f"Reddit search in r/{subreddit} failed: {e}")
+        return None
+    return submissions
+
+
+def _record_relevance(place: str, mode: str, submissions, calls: int):
+    """Count API calls and posts that actually mention the place, to compare crawl modes."""
+    key = place_key(place)
+    relevant = sum(
+        1 for submission in submissions
+        if key in f"{submission.title} {getattr(submission, 'selftext', '')} {submission.subreddit}".lower()
+    )
+    REDDIT_CRAWL_CALLS.inc(calls, mode=mode)
+    REDDIT_CRAWL_RELEVANT.inc(relevant, mode=mode)
+    if calls:
+        print(f"Reddit {mode} crawl for {place}: {relevant}/{len(submissions)} relevant posts, "
+              f"{relevant / calls:.2f} per API call")
+
+
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="reddit-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _refresh_in_background(place, key, watermark, limit):
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            _refresh_reddit(place, key, watermark, limit)
+        except Exception as e:
+            print(f"Reddit refresh for {place} failed: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_pool.submit(run)
+
+
+def _submission(submission, comments, comments_failed=False):
+    return {
+        "id": submission.id,
+        "title": submission.title,
+        "score": submission.score,
+        "created_utc": submission.created_utc,
+        "comments": comments,
+        "comments_failed": comments_failed,
+    }
+
+
+def _hydrate(submission_ids, stop_at):
+    """
+    Fetch comment trees in parallel until `stop_at`. Returns ({submission id:
+    [(comment id, body, score)]}, ids whose fetch failed); posts skipped for
+    lack of time are in neither.
+    """
+    results = _parallel(lambda submission_id: _fetch_comments(submission_id, stop_at), submission_ids, stop_at,
+                        on_cancel=lambda: REDDIT_HYDRATIONS.inc(result="skipped"))
+    failed = {submission_id for submission_id, comments in results.items() if comments is _FETCH_FAILED}
+    return {submission_id: comments for submission_id, comments in results.items() if submission_id not in failed}, failed
+
+
+def _parallel(func, items, stop_at, on_cancel=None):
+    """{item: func(item)} for the calls that returned something before `stop_at`."""
+    futures = {_request_pool.submit(propagate(func), item): item for item in items}
+    results = {}
+    try:
+        timeout = None if stop_at is None else max(0.0, stop_at - time.monotonic())
+        for future in as_completed(futures, timeout=timeout):
+            result = future.result()
+            if result is not None:
+                results[futures[future]] = result
+    except FuturesTimeout:
+        pass
+    finally:
+        for future in futures:
+            if future.cancel() and on_cancel:
+                on_cancel()
+    return results
+
+
+def _fetch_comments(post_id: str, stop_at):
+    """(id, body, score) of one post's comments, None if there was no time to fetch them, _FETCH_FAILED on error."""
+    if stop_at is None:
+        stop_at = float("inf")
+    if time.monotonic() >= stop_at or not rate_limiter.acquire(stop_at):
+        REDDIT_HYDRATIONS.inc(result="skipped")
+        return None
+    try:
+        with span("reddit comments", "client", **{"reddit.post_id": post_id}):
+            submission = _reddit().submission(id=post_id)
+            submission.comments.replace_more(limit=0)  # Drop "load more" stubs without fetching them
+            comments = [
+                (comment.id, comment.body, comment.score) for comment in submission.comments.list()[:COMMENTS_PER_POST]
+            ]
+    except Exception as e:
+        REDDIT_HYDRATIONS.inc(result="error")
+        print(f"Reddit comments for {post_id} failed: {e}")
+        return _FETCH_FAILED
+    REDDIT_HYDRATIONS.inc(result="ok")
+    return comments
+
 
-    return results
\ No newline at end of file
+async def fetch_reddit_comments_async(place: str, limit=50, reserve=0.0):
+    # PRAW is blocking, so the crawl runs on the default thread pool
+    return await asyncio.to_thread(fetch_reddit_comments, place, limit, reserve)
@@ -0,0 +1,143 @@
+"""
+Picks the Reddit text worth sending to the summarizer.
+
+Every title and comment is scored with BM25 against the place and the trip's
+themes, blended with its Reddit score and a length prior, and the best items
+are kept until the token budget is used up. Scoring runs on numpy arrays, so
+tens of thousands of comments cost one tokenizing pass and a few array ops.
+"""
+import os
+import re
+from itertools import chain
+
+import numpy as np
+
+from metrics import LLM_PROMPT_TOKENS_SAVED
+from prompt_builder import CHARS_PER_TOKEN
+
+# Reddit text per summary; leaves room for the instructions in the summarizer's prompt budget
+REDDIT_SELECTION_TOKENS = int(os.getenv("REDDIT_SELECTION_TOKENS", "6000"))
+# Longer comments are cut to this many tokens, so one rant cannot take the budget
+REDDIT_SELECTION_MAX_ITEM_TOKENS = int(os.getenv("REDDIT_SELECTION_MAX_ITEM_TOKENS", "300"))
+
+# Blend of normalized BM25 relevance, Reddit votes and length prior
+RELEVANCE_WEIGHT, VOTES_WEIGHT, LENGTH_WEIGHT = 0.6, 0.25, 0.15
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Comments shorter than this are mostly reactions ("this!", "+1")
+USEFUL_WORDS = 12
+# Place and theme words count double against the generic travel vocabulary
+TRAVEL_TERMS = (
+    "visit", "try", "food", "eat", "stay", "beach", "temple", "fort", "market", "cafe", "restaurant",
+    "hotel", "trek", "sunset", "avoid", "recommend", "must", "best", "hidden", "local", "season",
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    return _WORD.findall(text.lower())
+
+
+def bm25_scores(docs_tokens, query_terms, query_weights=None):
+    """BM25 of every tokenized document against `query_terms`, as one array."""
+    n, q = len(docs_tokens), len(query_terms)
+    lengths = np.fromiter((len(tokens) for tokens in docs_tokens), dtype=np.int64, count=n)
+    if n == 0 or q == 0:
+        return np.zeros(n)
+
+    # Term frequencies of the query terms only: map every token to its query
+    # term (or -1), then count (document, term) pairs in one bincount
+    index = {term: i for i, term in enumerate(query_terms)}
+    flat = chain.from_iterable(docs_tokens)
+    term_ids = np.fromiter((index.get(token, -1) for token in flat), dtype=np.int64, count=int(lengths.sum()))
+    doc_ids = np.repeat(np.arange(n), lengths)
+    hits = term_ids >= 0
+    tf = np.bincount(doc_ids[hits] * q + term_ids[hits], minlength=n * q).reshape(n, q).astype(np.float64)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    if query_weights is not None:
+        idf = idf * np.asarray(query_weights, dtype=np.float64)
+    avgdl = max(lengths.mean(), 1.0)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avgdl)
+    return (tf * (BM25_K1 + 1) / (tf + norm[:, None])) @ idf
+
+
+def _normalized(values):
+    top = values.max() if len(values) else 0
+    return values / top if top > 0 else np.zeros_like(values)
+
+
+def select_corpus(posts, place="", themes=(), budget=REDDIT_SELECTION_TOKENS):
+    """
+    The best titles and comments of `posts` within `budget` tokens, grouped by
+    post in crawl order, as the text block for the summarizer.
+    """
+    items, owners, votes, is_title = [], [], [], []
+    for p, post in enumerate(posts):
+        comments = post.get("comments") or []
+        scores = post.get("comment_scores") or [0] * len(comments)
+        entries = chain(
+            [(post.get("title") or "", post.get("score"), True)],
+            ((comment, score, False) for comment, score in zip(comments, scores))
+        )
+        for text, score, title in entries:
+            if text and text.strip():
+                items.append(text.strip())
+                owners.append(p)
+                votes.append(score or 0)
+                is_title.append(title)
+    if not items:
+        return ""
+
+    max_chars = REDDIT_SELECTION_MAX_ITEM_TOKENS * CHARS_PER_TOKEN
+    items = [text if len(text) <= max_chars else text[:max_chars].rsplit(" ", 1)[0] + "..." for text in items]
+    docs_tokens = [tokenize(text) for text in items]
+
+    focus = list(dict.fromkeys(word for word in tokenize(" ".join([place or "", *(themes or ())])) if len(word) > 2))
+    query = focus + [term for term in TRAVEL_TERMS if term not in focus]
+    weights = [2.0] * len(focus) + [1.0] * (len(query) - len(focus))
+
+    relevance = _normalized(bm25_scores(docs_tokens, query, weights))
+    popularity = _normalized(np.log1p(np.clip(np.asarray(votes, dtype=np.float64), 0, None)))
+    words = np.fromiter((len(tokens) for tokens in docs_tokens), dtype=np.float64, count=len(items))
+    length_prior = np.clip(words / USEFUL_WORDS, 0, 1)
+    score = RELEVANCE_WEIGHT * relevance + VOTES_WEIGHT * popularity + LENGTH_WEIGHT * length_prior
+
+    # +1 for the line break and bullet each item is rendered with
+    costs = [(len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + 1 for text in items]
+    title_costs = [(len((post.get("title") or "").strip()) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN + 1 for post in posts]
+
+    # Best first; an item that no longer fits is skipped so shorter ones can
+    # still fill the budget. A post's title is paid for once, by whichever of
+    # its items is chosen first
+    chosen, titled, used = [], set(), 0
+    for i in np.argsort(-score, kind="stable"):
+        owner = owners[i]
+        cost = (0 if is_title[i] else costs[i]) + (0 if owner in titled else title_costs[owner])
+        if used + cost > budget:
+            continue
+        used += cost
+        titled.add(owner)
+        chosen.append(i)
+    chosen.sort()
+
+    lines, post = [], None
+    for i in chosen:
+        if owners[i] != post:
+            post = owners[i]
+            if lines:
+                lines.append("")
+            # Chosen comments bring their post's title along as context
+            lines.append((posts[post].get("title") or "").strip())
+        if not is_title[i]:
+            lines.append(f"- {items[i]}")
+
+    selected = "\n".join(lines)
+    tokens = (len(selected) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    saved = sum(costs) - tokens
+    if saved > 0:
+        LLM_PROMPT_TOKENS_SAVED.inc(saved, call_site="summarizer", reason="selection")
+    print(f"Selected {len(chosen)}/{len(items)} Reddit items for {place or 'the summary'}, ~{tokens} tokens")
+    return selected
@@ -1,6 +1,8 @@
-import re
-import json
 from llm_client import invoke_llm
+from llm_json import decode_llm_json
+
+SUBREDDITS_SCHEMA = {"type": "ARRAY", "items": {"type": "STRING"}}
+FALLBACK_SUBREDDITS = ["travel", "solotravel", "IndiaTravel"]
 
 def suggest_subreddits(place: str, max_subs=5):
     prompt = f"""
@@ -18,15 +20,6 @@ def suggest_subreddits(place: str, max_subs=5):
     Now suggest subreddits:
     """
 
-    response = invoke_llm(prompt)
-    raw_text = response.text.strip()
-
-    # Clean ```json wrapper if present
-    cleaned = re.sub(r"```(json)?", "", raw_text).strip("` \n")
-
-    try:
-        subreddits = json.loads(cleaned)
-        return subreddits[:max_subs]
-    except Exception as e:
-        print(f"Error parsing subreddits: {e}")
-        return ["travel", "solotravel", "IndiaTravel"]  # Fallback
+    response = invoke_llm(prompt, call_site="subreddit_suggester", response_schema=SUBREDDITS_SCHEMA)
+    subreddits = decode_llm_json(getattr(response, "text", None), "subreddit_suggester", default=FALLBACK_SUBREDDITS, expect=list)
+    return subreddits[:max_subs]
@@ -1,8 +1,10 @@
 import re
-from llm_client import invoke_llm
+from llm_client import invoke_llm, invoke_llm_async
+from prompt_builder import PromptBuilder
 
-def summarize_places(raw_text, place: str):
-    prompt = f"""
+def _build_summary_prompt(raw_text, place: str):
+    prompt = PromptBuilder("summarizer")
+    prompt.add_text(f"""
     You are a travel expert analyzing Reddit user experiences.
 
     Summarize the key places, activities, and tips people recommend 
@@ -11,11 +13,23 @@ def summarize_places(raw_text, place: str):
     - Avoid personal chatter, only extract useful travel insights.
     - Return a bullet list of recommendations.
     
-    Reddit data:
-    {raw_text}
-    """
+    Reddit data:""")
+    # The crawl is the only part that can grow without bound
+    prompt.add_text(raw_text, priority=1)
+    return prompt.build()
 
-    response = invoke_llm(prompt)
+def _clean_summary(response):
+    if response is None:
+        # Call failed; plan without Reddit insights
+        return ""
     raw_text = response.text.strip()
     cleaned = re.sub(r"```(json|markdown)?", "", raw_text).strip("` \n")
     return cleaned
+
+def summarize_places(raw_text, place: str):
+    response = invoke_llm(_build_summary_prompt(raw_text, place), call_site="summarizer")
+    return _clean_summary(response)
+
+async def summarize_places_async(raw_text, place: str):
+    response = await invoke_llm_async(_build_summary_prompt(raw_text, place), call_site="summarizer")
+    return _clean_summary(response)
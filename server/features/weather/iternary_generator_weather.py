@@ -1,32 +1,37 @@
 # itinerary_generator.py
 from llm_client import invoke_llm
-import json
-import re
+from llm_json import decode_llm_json
+from prompt_builder import PromptBuilder
 from features.weather.weather_service import get_weather_forecast
+from features.itinerary_generation.itinerary_generator import ITINERARY_SCHEMA
 
 
 
 
-def generate_itinerary(parsed_input: dict, summary: str):
+def generate_itinerary(parsed_input: dict, summary: str, weather_summary=None):
+    """`weather_summary` skips the forecast lookup when the caller already fetched it."""
     location = parsed_input["location"]
     duration = parsed_input["duration_days"]
     budget = parsed_input["budget"]
     themes = ", ".join(parsed_input["themes"])
 
     # ✅ Get weather forecast
-    try:
-        weather_summary = get_weather_forecast(location, duration)
-    except Exception as e:
-        weather_summary = [{"day": "unknown", "condition": "N/A", "note": str(e)}]
-
-    prompt = f"""
+    if weather_summary is None:
+        try:
+            weather_summary = get_weather_forecast(location, duration)
+        except Exception as e:
+            weather_summary = [{"day": "unknown", "condition": "N/A", "note": str(e)}]
+
+    prompt = PromptBuilder("weather_itinerary_generator")
+    prompt.add_text(f"""
     You are an AI trip planner.
     Generate a {duration}-day itinerary for {location}, India.
     Traveler budget: {budget} INR.
-    Interests: {themes}.
-    Here is a summary of reviews: {summary}
-    Weather forecast for the trip: {json.dumps(weather_summary, indent=2)}
-
+    Interests: {themes}.""")
+    prompt.add_text(f"Here is a summary of reviews: {summary}", priority=1)
+    prompt.add_text("Weather forecast for the trip:")
+    prompt.add_json(weather_summary)
+    prompt.add_text(f"""
     Rules:
     - Adapt outdoor activities if rain probability is high.
     - Suggest indoor activities on rainy days.
@@ -35,17 +40,11 @@ def generate_itinerary(parsed_input: dict, summary: str):
     - Suggest accommodation and transport.
     - Keep total cost under budget.
     - Return valid JSON only.
-    """
-
-    response = invoke_llm(prompt)
-    raw_text = response.text.strip()
-    cleaned = re.sub(r"```(json)?", "", raw_text).strip("` \n")
+    """)
 
-    try:
-        return json.loads(cleaned)
-    except Exception as e:
-        print(f"Error parsing itinerary: {e}\nRaw: {raw_text}")
-        return {"itinerary": [], "total_estimated_cost": budget}
+    response = invoke_llm(prompt.build(), call_site="weather_itinerary_generator", response_schema=ITINERARY_SCHEMA)
+    fallback = {"itinerary": [], "total_estimated_cost": budget}
+    return decode_llm_json(getattr(response, "text", None), "weather_itinerary_generator", default=fallback, expect=dict)
     
 # Example usage
 # parsed_input = {"location": "Goa", "duration_days": 5, "budget": 30000, "themes": ["beach", "nightlife", "food"]}
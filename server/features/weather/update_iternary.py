@@ -1,38 +1,43 @@
-import json
-import re
 from llm_client import invoke_llm
+from llm_json import decode_llm_json
+from prompt_builder import PromptBuilder
+from features.itinerary_generation.incremental_update import affected_days, update_days
 from features.weather.weather_service import get_weather_forecast
 
 
-def update_itinerary(itinerary: dict, feedback: str, location: str, duration: int) -> dict:
+def update_itinerary(itinerary: dict, feedback: str, location: str, duration: int, previous_forecast=None) -> dict:
+    """
+    Rework the days the feedback names and the days with bad weather (or, with
+    `previous_forecast`, the days whose forecast got worse); the rest are kept
+    as they are. Feedback about the whole trip rewrites the whole itinerary.
+    """
     try:
         weather_summary = get_weather_forecast(location, duration)
     except Exception as e:
         weather_summary = [{"day": "unknown", "condition": "N/A", "note": str(e)}]
 
-    prompt = f"""
-    You are an AI trip planner.
+    days = affected_days(itinerary, feedback, weather_summary, previous_forecast)
+    if days is not None:
+        return update_days(itinerary, days, feedback, weather_summary)
 
-    Current Itinerary (JSON):
-    {json.dumps(itinerary, indent=2)}
-
-    User Feedback: "{feedback}"
-    Latest Weather Forecast: {json.dumps(weather_summary, indent=2)}
+    prompt = PromptBuilder("itinerary_updater")
+    prompt.add_text("""
+    You are an AI trip planner.
 
+    Current Itinerary (JSON):""")
+    prompt.add_json(itinerary)
+    prompt.add_text(f'User Feedback: "{feedback}"')
+    prompt.add_text("Latest Weather Forecast:")
+    prompt.add_json(weather_summary)
+    prompt.add_text("""
     Rules:
     - Keep unchanged days unless feedback or weather requires changes.
     - Modify days realistically if rain or bad weather is forecasted.
     - Maintain valid JSON structure.
-    """
-
-    response = invoke_llm(prompt)
-    raw_text = response.text.strip()
-    cleaned = re.sub(r"^```(json)?|```$", "", raw_text, flags=re.MULTILINE).strip()
+    """)
+    prompt = prompt.build()
 
-    try:
-        return json.loads(cleaned)
-    except Exception as e:
-        print(f"Error parsing updated itinerary: {e}")
-        return itinerary
+    response = invoke_llm(prompt, call_site="itinerary_updater", json_mode=True)
+    return decode_llm_json(getattr(response, "text", None), "itinerary_updater", default=itinerary, expect=dict)
 
 
@@ -1,21 +1,35 @@
+import httpx
 import requests
 import os
 from dotenv import load_dotenv
+from cache_backend import NamespacedCache
+from tracing import span
 load_dotenv()
 
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")  # load from .env
 
-def get_weather_forecast(city: str, days: int = 5):
-    """Fetch weather forecast for a city."""
-    url = "http://api.weatherapi.com/v1/forecast.json"
-    params = {
+WEATHER_URL = "http://api.weatherapi.com/v1/forecast.json"
+WEATHER_TIMEOUT_SECONDS = 10
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", str(3 * 3600)))
+
+weather_cache = NamespacedCache("weather", WEATHER_CACHE_TTL)
+
+
+def _cache_key(city: str, days: int):
+    return [city.strip().lower(), days]
+
+
+def _forecast_params(city: str, days: int):
+    return {
         "key": WEATHER_API_KEY,
         "q": city,
         "days": days,
         "aqi": "no",
         "alerts": "no"
     }
-    response = requests.get(url, params=params)
+
+
+def _parse_forecast(response):
     if response.status_code == 200:
         data = response.json()
         forecast = [
@@ -31,10 +45,32 @@ def get_weather_forecast(city: str, days: int = 5):
         return forecast
     else:
         raise Exception(f"Weather API error: {response.text}")
+
+
+def get_weather_forecast(city: str, days: int = 5):
+    """Fetch weather forecast for a city."""
+    def fetch():
+        with span("weatherapi forecast", "client", city=city, days=days):
+            response = requests.get(WEATHER_URL, params=_forecast_params(city, days), timeout=WEATHER_TIMEOUT_SECONDS)
+        return _parse_forecast(response)
+    return weather_cache.get_or_compute(_cache_key(city, days), fetch)
+
+
+async def get_weather_forecast_async(city: str, days: int = 5):
+    """Async version of get_weather_forecast."""
+    async def fetch():
+        with span("weatherapi forecast", "client", city=city, days=days):
+            async with httpx.AsyncClient(timeout=WEATHER_TIMEOUT_SECONDS) as client:
+                response = await client.get(WEATHER_URL, params=_forecast_params(city, days))
+        return _parse_forecast(response)
+    return await weather_cache.get_or_compute_async(_cache_key(city, days), fetch)
+
+
 # Example usage
-city = "Goa"
-forecast = get_weather_forecast(city)
-print(f"5-Day Weather Forecast for {city}:")
-for day in forecast:
-    print(f"Day {day['day']}: {day['condition']}, Max: {day['max_temp']}°C, Min: {day['min_temp']}°C, Rain Chance: {day['rain_chance']}%")
+if __name__ == "__main__":
+    city = "Goa"
+    forecast = get_weather_forecast(city)
+    print(f"5-Day Weather Forecast for {city}:")
+    for day in forecast:
+        print(f"Day {day['day']}: {day['condition']}, Max: {day['max_temp']}°C, Min: {day['min_temp']}°C, Rain Chance: {day['rain_chance']}%")
     
\ No newline at end of file
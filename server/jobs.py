@@ -0,0 +1,325 @@
+import asyncio
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from urllib.parse import urlsplit
+
+import httpx
+
+from metrics import JOBS
+from tracing import span
+
+JOB_STORE_PATH = os.getenv(
+    "JOB_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.sqlite3")
+)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# A job that was running when its worker died is retried this many times in total
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+# A running job not updated for this long is assumed to have lost its worker
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))
+# Finished jobs are kept this long for polling
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+# Workers also poll, so jobs queued by another process get picked up
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+JOB_WEBHOOK_TIMEOUT = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10"))
+JOB_WEBHOOK_ATTEMPTS = int(os.getenv("JOB_WEBHOOK_ATTEMPTS", "3"))
+# Comma-separated hosts webhooks may be sent to; empty allows any host with a public address
+JOB_WEBHOOK_ALLOWED_HOSTS = {
+    host.strip().lower() for host in os.getenv("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+}
+
+
+class JobQueue:
+    """
+    Persistent job queue in SQLite. Jobs move queued -> running -> done/failed;
+    progress and results are stored with the job so any worker can answer a poll.
+    Jobs left running by a worker that died (no update for JOB_LEASE_SECONDS)
+    go back to the queue.
+    """
+
+    def __init__(self, path=JOB_STORE_PATH):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT, payload TEXT, status TEXT, progress TEXT, "
+                "result TEXT, error TEXT, webhook_url TEXT, attempts INTEGER DEFAULT 0, "
+                "created_at REAL, updated_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def submit(self, kind: str, payload: dict, webhook_url=None) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, status, progress, webhook_url, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', '[]', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), webhook_url, now, now)
+            )
+        JOBS.inc(kind=kind, status="queued")
+        return job_id
+
+    def claim(self):
+        """Mark the oldest queued job as running and return it, or None."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT id, kind, payload, webhook_url FROM jobs WHERE status = 'queued' "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                        (time.time(), row[0])
+                    )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        if row is None:
+            return None
+        return {"id": row[0], "kind": row[1], "payload": json.loads(row[2]), "webhook_url": row[3]}
+
+    def add_progress(self, job_id: str, event: dict):
+        event = {**event, "at": round(time.time(), 3)}
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET progress = json_insert(progress, '$[#]', json(?)), updated_at = ? WHERE id = ?",
+                (json.dumps(event), time.time(), job_id)
+            )
+
+    def finish(self, job_id: str, result):
+        self._close(job_id, "done", result=json.dumps(result, default=str))
+
+    def fail(self, job_id: str, error: str):
+        self._close(job_id, "failed", error=error)
+
+    def _close(self, job_id, status, result=None, error=None):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+
+    def get(self, job_id: str):
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, progress, result, error, attempts, created_at, updated_at "
+                "FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "progress": json.loads(row[3] or "[]"),
+            "result": json.loads(row[4]) if row[4] is not None else None,
+            "error": row[5],
+            "attempts": row[6],
+            "created_at": row[7],
+            "updated_at": row[8],
+        }
+
+    def recover(self):
+        """Requeue jobs a dead worker left running, fail those out of attempts, prune old ones."""
+        now = time.time()
+        stale = now - JOB_LEASE_SECONDS
+        with closing(self._connect()) as conn:
+            failed = conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'worker lost too many times', updated_at = ? "
+                "WHERE status = 'running' AND updated_at < ? AND attempts >= ?", (now, stale, JOB_MAX_ATTEMPTS)
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running' AND updated_at < ?",
+                (now, stale)
+            ).rowcount
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated_at < ?", (now - JOB_TTL_SECONDS,)
+            )
+        if failed or requeued:
+            print(f"[jobs] recovered {requeued} interrupted job(s), {failed} out of attempts")
+
+
+class JobWorkers:
+    """
+    Bounded pool of asyncio workers draining a JobQueue.
+    `handlers` maps job kind -> `async handler(payload, report)`; `report(event)`
+    appends a progress event, the handler's return value is the job result.
+    """
+
+    def __init__(self, queue, handlers, workers=JOB_WORKERS):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self._webhooks = set()
+        self._last_recover = 0.0
+        # Progress events are written in order, off the event loop
+        self._progress_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-progress")
+
+    def start(self):
+        self._recover()
+        self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._webhooks:
+            await asyncio.wait(self._webhooks, timeout=JOB_WEBHOOK_TIMEOUT)
+        self._progress_writer.shutdown(wait=True)
+
+    async def submit(self, kind: str, payload: dict, webhook_url=None) -> str:
+        """Queue a job; raises ValueError for a webhook_url that may not be called."""
+        if webhook_url:
+            await asyncio.to_thread(check_webhook_url, webhook_url)
+        job_id = await asyncio.to_thread(self.queue.submit, kind, payload, webhook_url)
+        self._wakeup.set()
+        return job_id
+
+    def _recover(self):
+        self._last_recover = time.monotonic()
+        try:
+            self.queue.recover()
+        except sqlite3.Error as e:
+            print(f"[jobs] recovery failed: {e}")
+
+    async def _work(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.queue.claim)
+            except sqlite3.Error as e:
+                print(f"[jobs] claim failed: {e}")
+                job = None
+            if job is None:
+                if time.monotonic() - self._last_recover > JOB_LEASE_SECONDS / 4:
+                    self._recover()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    def _add_progress(self, job_id, event):
+        try:
+            self.queue.add_progress(job_id, event)
+        except sqlite3.Error as e:
+            print(f"[jobs] progress update for {job_id} failed: {e}")
+
+    async def _run(self, job):
+        job_id, kind = job["id"], job["kind"]
+        loop = asyncio.get_running_loop()
+        writes = []
+
+        def report(event):
+            writes.append(loop.run_in_executor(self._progress_writer, self._add_progress, job_id, event))
+
+        start = time.perf_counter()
+        try:
+            # Jobs outlive the request that queued them, so each one is its own trace
+            with span(f"job {kind}", **{"job.id": job_id, "job.kind": kind}):
+                result = await self.handlers[kind](job["payload"], report)
+            await asyncio.gather(*writes)
+            await asyncio.to_thread(self.queue.finish, job_id, result)
+            status, body = "done", {"job_id": job_id, "status": "done", "result": result}
+        except asyncio.CancelledError:
+            # Shutdown: leave it running so recover() requeues it once the lease runs out
+            raise
+        except Exception as e:
+            print(f"[jobs] {kind} job {job_id} failed: {e}")
+            await asyncio.gather(*writes, return_exceptions=True)
+            await asyncio.to_thread(self.queue.fail, job_id, str(e))
+            status, body = "failed", {"job_id": job_id, "status": "failed", "error": str(e)}
+        JOBS.inc(kind=kind, status=status)
+        print(f"[jobs] {kind} job {job_id} {status} in {time.perf_counter() - start:.1f}s")
+        if job["webhook_url"]:
+            # Retries back off for seconds; the worker moves on to the next job meanwhile
+            task = asyncio.ensure_future(notify_webhook(job["webhook_url"], body))
+            self._webhooks.add(task)
+            task.add_done_callback(self._webhooks.discard)
+
+
+def check_webhook_url(url: str):
+    """
+    Raise ValueError unless `url` is http(s) and its host is allowed: on
+    JOB_WEBHOOK_ALLOWED_HOSTS when set, and resolving only to public addresses
+    (no private, loopback, link-local or cloud metadata endpoints). Resolves DNS,
+    so call it off the event loop.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("webhook_url must be an http(s) URL")
+    host = parts.hostname.lower()
+    if JOB_WEBHOOK_ALLOWED_HOSTS and host not in JOB_WEBHOOK_ALLOWED_HOSTS:
+        raise ValueError(f"webhook host {host} is not allowed")
+    try:
+        infos = socket.getaddrinfo(host, parts.port or (443 if parts.scheme == "https" else 80), type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"webhook host {host} does not resolve: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"webhook host {host} resolves to a non-public address")
+
+
+async def notify_webhook(url: str, body: dict):
+    """POST the finished job to the client's callback URL, with a few retries."""
+    for attempt in range(1, JOB_WEBHOOK_ATTEMPTS + 1):
+        try:
+            # Checked again per attempt: the name may resolve elsewhere than at submit
+            await asyncio.to_thread(check_webhook_url, url)
+        except ValueError as e:
+            print(f"[jobs] webhook {url} refused: {e}")
+            return False
+        try:
+            async with httpx.AsyncClient(timeout=JOB_WEBHOOK_TIMEOUT) as client:
+                response = await client.post(url, content=json.dumps(body, default=str),
+                                             headers={"Content-Type": "application/json"})
+            if response.status_code < 500:
+                return True
+            print(f"[jobs] webhook {url} returned {response.status_code}")
+        except httpx.HTTPError as e:
+            print(f"[jobs] webhook {url} failed: {e}")
+        if attempt < JOB_WEBHOOK_ATTEMPTS:
+            await asyncio.sleep(2 ** attempt)
+    return False
+
+
+_QUEUE = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide job queue."""
+    global _QUEUE
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = JobQueue()
+    return _QUEUE
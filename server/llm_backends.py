@@ -0,0 +1,299 @@
+import abc
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from data import INDIAN_AIRPORTS
+
+# live | record | replay | synthetic
+LLM_BACKEND = os.getenv("LLM_BACKEND", "live").lower()
+LLM_CASSETTE_PATH = os.getenv(
+    "LLM_CASSETTE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_cassettes.jsonl")
+)
+# Artificial latency for offline backends, to make load tests realistic
+LLM_FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "0"))
+# Replay misses: "error" (strict) or "synthetic"
+LLM_REPLAY_FALLBACK = os.getenv("LLM_REPLAY_FALLBACK", "error").lower()
+
+STREAM_CHUNK_CHARS = 200
+
+
+class TextResponse:
+    """Response stand-in returned by the offline backends."""
+
+    def __init__(self, text, prompt=""):
+        self.text = text
+        # Rough 4-chars-per-token usage so metrics and cost stay meaningful in benchmarks
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=len(prompt) // 4,
+            candidates_token_count=len(text) // 4
+        )
+
+
+class LiveBackend:
+    """Calls Gemini through the pooled clients."""
+
+    needs_client = True
+    uses_cache = True
+
+    def __init__(self, client_factory, model):
+        self._client_factory = client_factory
+        self.model = model
+
+    def generate(self, key, prompt, config, call_site):
+        return self._client_factory().models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=config
+        )
+
+    async def generate_async(self, key, prompt, config, call_site):
+        return await self._client_factory().aio.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=config
+        )
+
+    async def stream_async(self, key, prompt, config, call_site):
+        async for chunk in await self._client_factory().aio.models.generate_content_stream(
+            model=self.model,
+            contents=prompt,
+            config=config
+        ):
+            yield chunk
+
+
+class RecordingBackend:
+    """Live backend that also appends every prompt -> response pair to a cassette file."""
+
+    needs_client = True
+    # A cache hit would never reach _record() and leave the cassette incomplete
+    uses_cache = False
+
+    def __init__(self, inner, path=LLM_CASSETTE_PATH):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def _record(self, key, prompt, call_site, text):
+        entry = {"key": key, "call_site": call_site, "prompt": prompt, "text": text}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def generate(self, key, prompt, config, call_site):
+        response = self.inner.generate(key, prompt, config, call_site)
+        self._record(key, prompt, call_site, response.text)
+        return response
+
+    async def generate_async(self, key, prompt, config, call_site):
+        response = await self.inner.generate_async(key, prompt, config, call_site)
+        self._record(key, prompt, call_site, response.text)
+        return response
+
+    async def stream_async(self, key, prompt, config, call_site):
+        chunks = []
+        async for chunk in self.inner.stream_async(key, prompt, config, call_site):
+            if chunk.text:
+                chunks.append(chunk.text)
+            yield chunk
+        self._record(key, prompt, call_site, "".join(chunks))
+
+
+class _OfflineBackend(abc.ABC):
+    """Shared latency and chunking behaviour for replay and synthetic modes."""
+
+    needs_client = False
+    # Answers are already local; caching them would serve canned text to live calls later
+    uses_cache = False
+
+    def __init__(self, latency_ms=LLM_FAKE_LATENCY_MS):
+        self.latency = latency_ms / 1000
+
+    @abc.abstractmethod
+    def respond(self, key, prompt, call_site):
+        """Return a TextResponse for the request."""
+
+    def generate(self, key, prompt, config, call_site):
+        if self.latency:
+            time.sleep(self.latency)
+        return self.respond(key, prompt, call_site)
+
+    async def generate_async(self, key, prompt, config, call_site):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.respond(key, prompt, call_site)
+
+    async def stream_async(self, key, prompt, config, call_site):
+        response = self.respond(key, prompt, call_site)
+        text = response.text
+        pieces = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        # Spread the latency across chunks: first-token delay plus even gaps
+        delay = self.latency / len(pieces) if self.latency else 0
+        for i, piece in enumerate(pieces):
+            if delay:
+                await asyncio.sleep(delay)
+            chunk = TextResponse(piece)
+            if i == len(pieces) - 1:
+                # Like Gemini, the last chunk carries usage for the whole response
+                chunk.usage_metadata = response.usage_metadata
+            yield chunk
+
+
+class ReplayBackend(_OfflineBackend):
+    """Serves recorded cassettes deterministically, keyed by the request content address."""
+
+    def __init__(self, path=LLM_CASSETTE_PATH, latency_ms=LLM_FAKE_LATENCY_MS, fallback=LLM_REPLAY_FALLBACK):
+        super().__init__(latency_ms)
+        self.responses = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.responses[entry["key"]] = entry["text"]
+        print(f"Replay backend loaded {len(self.responses)} cassette(s) from {path}")
+        self.fallback = SyntheticBackend(latency_ms=0) if fallback == "synthetic" else None
+
+    def respond(self, key, prompt, call_site):
+        text = self.responses.get(key)
+        if text is not None:
+            return TextResponse(text, prompt)
+        if self.fallback is not None:
+            return self.fallback.respond(key, prompt, call_site)
+        raise KeyError(f"No recorded LLM response for {call_site} prompt {key[:12]}")
+
+
+class SyntheticBackend(_OfflineBackend):
+    """Returns schema-valid canned JSON for each call site, shaped by the prompt."""
+
+    CITIES = sorted({a["city"] for a in INDIAN_AIRPORTS}, key=len, reverse=True)
+
+    def respond(self, key, prompt, call_site):
+        builder = {
+            "parser": self._parsed_request,
+            "parser_delta": self._parsed_request,
+            "summarizer": self._summary,
+            "itinerary_generator": self._itinerary,
+            "weather_itinerary_generator": self._itinerary,
+            "weather_optimizer": self._itinerary,
+            "itinerary_updater": self._itinerary,
+            "itinerary_day_updater": self._itinerary_day,
+            "visualizer": self._storytelling,
+            "subreddit_suggester": self._subreddits,
+        }.get(call_site)
+        text = builder(prompt) if builder else "{}"
+        return TextResponse(text, prompt)
+
+    def _city(self, prompt):
+        for city in self.CITIES:
+            if city.lower() in prompt.lower():
+                return city
+        return "Goa"
+
+    @staticmethod
+    def _days(prompt):
+        match = re.search(r"into (\d+) days", prompt) or re.search(r"(\d+)[- ]day", prompt)
+        if match:
+            return max(1, min(int(match.group(1)), 14))
+        return 3
+
+    def _parsed_request(self, prompt):
+        # Only look at the user's text, not the field list in the parser prompt
+        match = re.search(r'### Input:\s*"(.*?)"\s*### Output', prompt, re.S)
+        user_text = match.group(1) if match else prompt
+        fields = ["location", "duration_days", "budget", "when", "num_travelers", "traveler_type",
+                  "accommodation", "food_preferences", "transport_mode", "include_travel_costs", "preferences"]
+        return json.dumps({
+            "location": self._city(user_text),
+            "duration_days": self._days(user_text),
+            "budget": 20000,
+            "themes": ["general"],
+            "when": "next month",
+            "preferences": "none",
+            "include_travel_costs": False,
+            "num_travelers": 2,
+            "traveler_type": "couple",
+            "accommodation": "hotel",
+            "food_preferences": "veg",
+            "transport_mode": "flight",
+            "local_transport": "taxi",
+            "activity_pace": "balanced",
+            "must_include": [],
+            "must_exclude": [],
+            "purpose": "vacation",
+            "_extracted_from_user": {field: True for field in fields}
+        })
+
+    def _summary(self, prompt):
+        city = self._city(prompt)
+        return "\n".join(f"- Recommendation {i} for {city}" for i in range(1, 6))
+
+    def _itinerary(self, prompt):
+        city = self._city(prompt)
+        days = [
+            {
+                "day": day,
+                "morning": f"Visit a landmark in {city}",
+                "afternoon": f"Local lunch and market walk in {city}",
+                "evening": f"Sunset spot in {city}",
+                "estimated_cost": 3000
+            }
+            for day in range(1, self._days(prompt) + 1)
+        ]
+        return json.dumps({"itinerary": days, "total_estimated_cost": 3000 * len(days)})
+
+    def _itinerary_day(self, prompt):
+        city = self._city(prompt)
+        match = re.search(r"Rewrite day (\d+)", prompt)
+        return json.dumps({
+            "day": int(match.group(1)) if match else 1,
+            "morning": f"Museum visit in {city}",
+            "afternoon": f"Indoor food tour in {city}",
+            "evening": f"Dinner in {city}",
+            "estimated_cost": 3000
+        })
+
+    def _storytelling(self, prompt):
+        city = self._city(prompt)
+        days = [
+            {
+                "day": day,
+                "title": f"Day {day} in {city}",
+                "summary": f"Exploring {city}",
+                "places": [{
+                    "id": f"place-{day}",
+                    "name": f"{city} landmark {day}",
+                    "description": "A popular stop",
+                    "latitude": 15.49,
+                    "longitude": 73.82,
+                    "imageUrl": "",
+                    "category": "sightseeing",
+                    "rating": 4.5,
+                    "address": city,
+                    "tags": ["synthetic"]
+                }]
+            }
+            for day in range(1, max(1, prompt.count('"day"')) + 1)
+        ]
+        return json.dumps({"story": f"A trip through {city}", "days": days})
+
+    def _subreddits(self, prompt):
+        return json.dumps(["travel", "solotravel", "IndiaTravel"])
+
+
+def create_backend(client_factory, model, mode=LLM_BACKEND):
+    """Build the backend selected by LLM_BACKEND."""
+    if mode == "record":
+        return RecordingBackend(LiveBackend(client_factory, model))
+    if mode == "replay":
+        return ReplayBackend()
+    if mode == "synthetic":
+        return SyntheticBackend()
+    return LiveBackend(client_factory, model)
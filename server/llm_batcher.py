@@ -0,0 +1,204 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from metrics import LLM_BATCHES, LLM_BATCH_REQUESTS, LLM_BATCH_SENT
+
+# Off by default: every call waits up to LLM_BATCH_MAX_WAIT_MS for company
+LLM_BATCHING_ENABLED = os.getenv("LLM_BATCHING_ENABLED", "false").lower() == "true"
+LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "16"))
+LLM_BATCH_MAX_WAIT_MS = float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "10"))
+LLM_BATCH_CONCURRENCY = int(os.getenv("LLM_BATCH_CONCURRENCY", "32"))
+
+
+def _group_batch(batch):
+    """
+    Collapse identical requests in a batch.
+    Returns {key: (args, [futures])} so each distinct request is sent once;
+    requests whose caller already gave up (cancelled future) are dropped.
+    """
+    groups = {}
+    for key, args, future in batch:
+        if future.cancelled():
+            continue
+        if key in groups:
+            groups[key][1].append(future)
+        else:
+            groups[key] = (args, [future])
+    return groups
+
+
+class _BatchStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "sent": 0, "coalesced": 0}
+
+    def record(self, batch_size, sent):
+        with self._lock:
+            self._stats["requests"] += batch_size
+            self._stats["batches"] += 1
+            self._stats["sent"] += sent
+            self._stats["coalesced"] += batch_size - sent
+        LLM_BATCH_REQUESTS.inc(batch_size)
+        LLM_BATCH_SENT.inc(sent)
+        LLM_BATCHES.inc()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class LLMBatcher:
+    """
+    Micro-batching scheduler for blocking callers.
+    Requests arriving within `max_wait_ms` of each other (up to `max_batch_size`)
+    are dispatched together: duplicates are sent once and the distinct prompts
+    go out concurrently on a bounded pool. Results fan back out to every waiter.
+    """
+
+    def __init__(self, send, max_batch_size=LLM_BATCH_MAX_SIZE, max_wait_ms=LLM_BATCH_MAX_WAIT_MS,
+                 max_concurrency=LLM_BATCH_CONCURRENCY, stats=None):
+        self._send = send  # send(*args) -> response
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = stats or _BatchStats()
+        self._queue = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-batch")
+        self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, key, *args) -> Future:
+        future = Future()
+        self._queue.put((key, args, future))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            window_end = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        groups = _group_batch(batch)
+        self.stats.record(len(batch), len(groups))
+        for args, futures in groups.values():
+            self._executor.submit(self._send_group, args, futures)
+
+    def _send_group(self, args, futures):
+        # Callers that timed out while the request was queued cancelled their futures
+        futures = [future for future in futures if future.set_running_or_notify_cancel()]
+        if not futures:
+            return
+        try:
+            response = self._send(*args)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future in futures:
+            future.set_result(response)
+
+
+class AsyncLLMBatcher:
+    """
+    Event-loop counterpart of LLMBatcher for coroutine callers.
+    One instance lives per event loop; distinct prompts in a batch are sent
+    with the native async client concurrently.
+    """
+
+    def __init__(self, send_async, max_batch_size=LLM_BATCH_MAX_SIZE, max_wait_ms=LLM_BATCH_MAX_WAIT_MS,
+                 stats=None):
+        self._send_async = send_async  # async send_async(*args) -> response
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = stats or _BatchStats()
+        self._queue = asyncio.Queue()
+        self._task = None
+        self._pending = set()
+
+    async def submit(self, key, *args):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((key, args, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            window_end = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        groups = _group_batch(batch)
+        self.stats.record(len(batch), len(groups))
+        for args, futures in groups.values():
+            task = asyncio.create_task(self._send_group(args, futures))
+            # Keep a reference so the task is not garbage collected mid-flight
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _send_group(self, args, futures):
+        # A waiter cancelled while queued cancels its future; send only if someone still waits
+        if all(future.done() for future in futures):
+            return
+        try:
+            response = await self._send_async(*args)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future in futures:
+            if not future.done():
+                future.set_result(response)
+
+
+_STATS = _BatchStats()
+_SYNC_BATCHER = None
+_ASYNC_BATCHERS = weakref.WeakKeyDictionary()
+_LOCK = threading.Lock()
+
+
+def get_batcher(send):
+    """Process-wide batcher for blocking callers."""
+    global _SYNC_BATCHER
+    with _LOCK:
+        if _SYNC_BATCHER is None:
+            _SYNC_BATCHER = LLMBatcher(send, stats=_STATS)
+    return _SYNC_BATCHER
+
+
+def get_async_batcher(send_async):
+    """Batcher bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    batcher = _ASYNC_BATCHERS.get(loop)
+    if batcher is None:
+        batcher = AsyncLLMBatcher(send_async, stats=_STATS)
+        _ASYNC_BATCHERS[loop] = batcher
+    return batcher
+
+
+def batch_stats():
+    """Requests seen, batches dispatched, calls actually sent, duplicates coalesced."""
+    return _STATS.snapshot()
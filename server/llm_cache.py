@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import threading
+
+from cache_backend import CACHE_BACKEND, CACHE_ERRORS, LRUBackend, SQLiteBackend, get_shared_backend
+from metrics import LLM_CACHE_LOOKUPS
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ITEMS = int(os.getenv("LLM_CACHE_MAX_ITEMS", "1024"))
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "llm_cache.sqlite3")
+)
+
+# Time-to-live per call site, in seconds
+CACHE_TTLS = {
+    "parser": 6 * 3600,
+    "parser_delta": 6 * 3600,
+    "summarizer": 7 * 24 * 3600,
+    "itinerary_generator": 24 * 3600,
+    "weather_itinerary_generator": 3 * 3600,
+    "itinerary_updater": 3600,
+    "itinerary_day_updater": 3600,
+    "visualizer": 24 * 3600,
+    "weather_optimizer": 3 * 3600,
+    "subreddit_suggester": 30 * 24 * 3600,
+    "default": 3600,
+}
+
+
+class CachedResponse:
+    """Minimal stand-in for a Gemini response, served from the cache."""
+
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+        self.cached = True
+
+
+def make_cache_key(model: str, config: dict, prompt: str) -> str:
+    """Content address of a request: sha256 over model, config and prompt."""
+    payload = json.dumps(
+        {"model": model, "config": config, "prompt": prompt},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryTier(LRUBackend):
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_items=LLM_CACHE_MAX_ITEMS):
+        super().__init__(max_items)
+
+
+class DiskTier(SQLiteBackend):
+    """
+    SQLite-backed tier shared by every worker on the host (the default shared tier).
+    WAL mode lets several uvicorn workers read while one writes.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH):
+        super().__init__(path, table="llm_cache")
+
+
+class LLMCache:
+    """
+    Two-tier (memory LRU -> shared tier) response cache. The shared tier is the
+    host-local SQLite file, or the Redis-protocol store with CACHE_BACKEND=redis.
+    Hits and misses are counted per call site in llm_cache_lookups_total.
+    """
+
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory or MemoryTier()
+        self.disk = disk
+
+    @staticmethod
+    def _count(call_site, result):
+        LLM_CACHE_LOOKUPS.inc(call_site=call_site, result=result)
+
+    def get(self, key, call_site="default"):
+        text = self.memory.get(key)
+        if text is not None:
+            self._count(call_site, "memory_hit")
+            return CachedResponse(text)
+
+        if self.disk is not None:
+            try:
+                text = self.disk.get(key)
+            except CACHE_ERRORS as e:
+                print(f"LLM disk cache read failed: {e}")
+                text = None
+            if text is not None:
+                # Promote to memory for the rest of its lifetime on this worker
+                self.memory.set(key, text, self.ttl_for(call_site))
+                self._count(call_site, "disk_hit")
+                return CachedResponse(text)
+
+        self._count(call_site, "miss")
+        return None
+
+    def set(self, key, text, call_site="default", ttl=None):
+        if not text:
+            return
+        ttl = ttl if ttl is not None else self.ttl_for(call_site)
+        self.memory.set(key, text, ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, text, ttl, call_site)
+            except CACHE_ERRORS as e:
+                print(f"LLM disk cache write failed: {e}")
+
+    @staticmethod
+    def ttl_for(call_site):
+        return CACHE_TTLS.get(call_site, CACHE_TTLS["default"])
+
+
+def shared_tier(sqlite_tier):
+    """
+    Shared tier for a two-tier store: its own SQLite file (`sqlite_tier()`) by
+    default, the configured shared backend otherwise, None for memory-only.
+    """
+    if CACHE_BACKEND == "sqlite":
+        try:
+            return sqlite_tier()
+        except CACHE_ERRORS as e:
+            print(f"Shared cache tier unavailable, using memory only: {e}")
+            return None
+    return get_shared_backend()
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide cache, or None when caching is disabled."""
+    global _CACHE
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = LLMCache(disk=shared_tier(DiskTier))
+    return _CACHE
@@ -1,27 +1,355 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+import httpx
 from google import genai
 from google.genai import types
 
+from llm_backends import create_backend
+from llm_batcher import LLM_BATCHING_ENABLED, get_async_batcher, get_batcher
+from llm_cache import get_llm_cache, make_cache_key
+from llm_json import is_decodable
+from deadline import DeadlineExceeded, clamp_timeout
+from metrics import LLM_HEDGES, LLM_LATENCY, record_llm_call
+from tracing import record, span
+
+MODEL = "gemini-2.5-flash"
+
+# Pool tuning (override through .env)
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "120"))
+# Per-client connection cap; async endpoints can have hundreds of calls in flight
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+# Ask Gemini for schema-constrained JSON where a call site provides a schema
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "true").lower() == "true"
+# Hedged requests: resend a slow async call after the call site's p95 latency
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+
+
+class LLMClientPool:
+    """
+    Long-lived, thread-safe set of Gemini clients.
+    Each client keeps its own keep-alive HTTP connection pool, so the TLS
+    handshake is paid once per client instead of once per prompt.
+    """
+
+    def __init__(self, size=LLM_POOL_SIZE, timeout=LLM_TIMEOUT_SECONDS):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._next = 0
+        self._clients = [self._create_client() for _ in range(self.size)]
+        print(f"LLM client pool created with {self.size} client(s)")
+
+    def _create_client(self):
+        limits = httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_CONNECTIONS // 2,
+            keepalive_expiry=LLM_KEEPALIVE_SECONDS
+        )
+        http_options = types.HttpOptions(
+            timeout=int(self.timeout * 1000),  # milliseconds
+            client_args={"limits": limits},
+            async_client_args={"limits": limits}
+        )
+        return genai.Client(http_options=http_options)
+
+    def acquire(self):
+        """Return the next client in round-robin order."""
+        with self._lock:
+            client = self._clients[self._next]
+            self._next = (self._next + 1) % self.size
+        return client
+
+    def warm_up(self):
+        """
+        Probe every client once so connections are open before the first request.
+        Uses a model lookup, which costs no tokens.
+        """
+        warmed = 0
+        for client in self._clients:
+            try:
+                client.models.get(model=MODEL)
+                warmed += 1
+            except Exception as e:
+                print(f"LLM warm-up probe failed: {e}")
+        print(f"LLM warm-up done: {warmed}/{self.size} client(s) ready")
+        return warmed
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def init_llm_pool(warm_up=True):
+    """Create the process-wide pool (called once at app startup)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = LLMClientPool()
+            if warm_up:
+                _POOL.warm_up()
+    return _POOL
+
+
 def get_llm():
     try:
-        client = genai.Client()
-        print("Client Created successfully")
-        return client
+        # Scripts and notebooks that skip app startup get a lazily created pool
+        pool = _POOL or init_llm_pool(warm_up=False)
+        return pool.acquire()
     except Exception as e:
         print(f"Error while creating client: {e}")
-        
-def invoke_llm(prompt):
+
+
+# Live Gemini by default; LLM_BACKEND=record|replay|synthetic for offline load tests
+_BACKEND = create_backend(get_llm, MODEL)
+
+
+def init_llm_backend(warm_up=True):
+    """Startup hook: only the live and record backends need the client pool."""
+    if _BACKEND.needs_client:
+        init_llm_pool(warm_up)
+    else:
+        print(f"LLM backend {type(_BACKEND).__name__} is offline, skipping client pool")
+
+
+def _build_config(timeout=None, response_schema=None, json_mode=False):
+    structured = LLM_STRUCTURED_OUTPUT and (json_mode or response_schema is not None)
+    return types.GenerateContentConfig(
+        thinking_config=types.ThinkingConfig(thinking_budget=0),  # Disables thinking
+        http_options=types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None,
+        response_mime_type="application/json" if structured else None,
+        response_schema=response_schema if structured else None
+    )
+
+
+def _config_fingerprint(config):
+    """Config fields that change the answer (transport options are excluded)."""
+    return config.model_dump(mode="json", exclude_none=True, exclude={"http_options"})
+
+
+def _cache_lookup(prompt, config, call_site):
+    """
+    Return (cache, key, cached_response); cache is None when caching is off.
+    The key is the request's content address and is also used to coalesce batches.
+    Only the live backend uses the cache: offline answers must not be served to
+    live calls, and in record mode every call has to reach the cassette.
+    """
+    cache_key = make_cache_key(MODEL, _config_fingerprint(config), prompt)
+    cache = get_llm_cache() if _BACKEND.uses_cache else None
+    if cache is None:
+        return None, cache_key, None
+    cached = cache.get(cache_key, call_site)
+    if cached is not None:
+        print(f"LLM cache hit for {call_site}")
+    return cache, cache_key, cached
+
+
+def _expected_json(response_schema, json_mode):
+    """The type a JSON answer must decode to, True for any JSON, None for free text."""
+    if response_schema is not None:
+        return {"OBJECT": dict, "ARRAY": list}.get(str(response_schema.get("type", "")).upper(), True)
+    return True if json_mode else None
+
+
+def _cache_response(cache, cache_key, text, call_site, ttl, expect):
+    """Cache an answer only if its caller will be able to decode it."""
+    if cache is None:
+        return
+    if expect is not None and not is_decodable(text, None if expect is True else expect):
+        print(f"Not caching undecodable {call_site} response")
+        return
+    cache.set(cache_key, text, call_site, ttl=ttl)
+
+
+def _send(request_key, prompt, config, call_site):
+    start = time.perf_counter()
     try:
-        CLIENT = get_llm()
-        MODEL = "gemini-2.5-flash"
-        CONFIG=types.GenerateContentConfig(
-            thinking_config=types.ThinkingConfig(thinking_budget=0) # Disables thinking
-        )
-        response = CLIENT.models.generate_content(
-            model=MODEL,
-            contents=prompt,
-            config=CONFIG
-        )
-        print(response.text)
-        return response
+        response = _BACKEND.generate(request_key, prompt, config, call_site)
+    except Exception:
+        record_llm_call(call_site, time.perf_counter() - start, error=True)
+        raise
+    record_llm_call(call_site, time.perf_counter() - start, response)
+    return response
+
+
+async def _send_async(request_key, prompt, config, call_site):
+    start = time.perf_counter()
+    try:
+        response = await _BACKEND.generate_async(request_key, prompt, config, call_site)
+    except Exception:
+        record_llm_call(call_site, time.perf_counter() - start, error=True)
+        raise
+    record_llm_call(call_site, time.perf_counter() - start, response)
+    return response
+
+
+def _generate(request_key, prompt, config, call_site, timeout=None):
+    if LLM_BATCHING_ENABLED:
+        future = get_batcher(_send).submit(request_key, request_key, prompt, config, call_site)
+        try:
+            return future.result(timeout=timeout)
+        except FuturesTimeout:
+            # Still queued: drop it instead of sending a call nobody waits for
+            future.cancel()
+            raise
+    return _send(request_key, prompt, config, call_site)
+
+
+async def _generate_async(request_key, prompt, config, call_site):
+    if LLM_BATCHING_ENABLED:
+        return await get_async_batcher(_send_async).submit(request_key, request_key, prompt, config, call_site)
+    return await _send_async(request_key, prompt, config, call_site)
+
+
+def _hedge_delay(call_site, timeout=None):
+    """
+    Seconds to wait before hedging a call, or None to not hedge.
+    Uses the call site's observed latency quantile once enough samples exist.
+    """
+    if not LLM_HEDGING_ENABLED or LLM_LATENCY.count(call_site=call_site) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    delay = LLM_LATENCY.quantile(LLM_HEDGE_QUANTILE, call_site=call_site)
+    if delay is None or (timeout is not None and delay >= timeout):
+        return None
+    return delay
+
+
+async def _generate_hedged_async(request_key, prompt, config, call_site, timeout=None):
+    """
+    Send the request and, if it is still outstanding after the hedge delay, send a
+    duplicate straight to the backend. The first successful answer wins and the
+    other call is cancelled.
+    """
+    primary = asyncio.ensure_future(_generate_async(request_key, prompt, config, call_site))
+    delay = _hedge_delay(call_site, timeout)
+    if delay is None:
+        return await primary
+
+    tasks = [primary]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done:
+            return primary.result()
+        # Bypass the batcher so the duplicate is not coalesced with the primary
+        tasks.append(asyncio.ensure_future(_send_async(request_key, prompt, config, call_site)))
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    LLM_HEDGES.inc(call_site=call_site, winner="primary" if task is primary else "hedge")
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def invoke_llm(prompt, call_site="default", timeout=None, cache_ttl=None, response_schema=None, json_mode=False):
+    """
+    Send a prompt to Gemini using a pooled client.
+    Identical (model, config, prompt) requests are served from the response cache;
+    misses go through the micro-batching scheduler when it is enabled.
+    `call_site` picks the cache TTL and `timeout` (seconds) overrides the pool default.
+    Inside a deadline_scope the timeout is clamped to the remaining request budget,
+    and DeadlineExceeded is raised when too little budget is left to start the call.
+    Other failures are logged and return None.
+    `response_schema` constrains the output to that JSON schema; `json_mode` only
+    asks for JSON (for free-form documents such as edited itineraries).
+    """
+    try:
+        with span(f"llm {call_site}", "client", **{"llm.call_site": call_site}) as current:
+            timeout = clamp_timeout(timeout, call_site)
+            CONFIG = _build_config(timeout, response_schema, json_mode)
+            cache, cache_key, cached = _cache_lookup(prompt, CONFIG, call_site)
+            current.set("llm.cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+            response = _generate(cache_key, prompt, CONFIG, call_site, timeout)
+            _cache_response(cache, cache_key, response.text, call_site, cache_ttl,
+                            _expected_json(response_schema, json_mode))
+            return response
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"Error while creating response: {e}")
+
+
+async def invoke_llm_async(prompt, call_site="default", timeout=None, cache_ttl=None,
+                           response_schema=None, json_mode=False):
+    """
+    Async counterpart of invoke_llm.
+    Uses the pooled client's native asyncio transport, so no thread is held while waiting;
+    the response cache is read and written from a worker thread.
+    Slow calls are hedged when LLM_HEDGING_ENABLED is set.
+    """
+    try:
+        with span(f"llm {call_site}", "client", **{"llm.call_site": call_site}) as current:
+            timeout = clamp_timeout(timeout, call_site)
+            CONFIG = _build_config(timeout, response_schema, json_mode)
+            cache, cache_key, cached = await asyncio.to_thread(_cache_lookup, prompt, CONFIG, call_site)
+            current.set("llm.cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+            call = _generate_hedged_async(cache_key, prompt, CONFIG, call_site, timeout)
+            response = await (asyncio.wait_for(call, timeout) if timeout else call)
+            await asyncio.to_thread(_cache_response, cache, cache_key, response.text, call_site, cache_ttl,
+                                    _expected_json(response_schema, json_mode))
+            return response
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"Error while creating response: {e}")
+
+
+async def stream_llm_async(prompt, call_site="default", timeout=None, cache_ttl=None,
+                           response_schema=None, json_mode=False):
+    """
+    Stream response text chunks from Gemini as they are generated.
+    A cache hit yields the whole cached text as a single chunk; errors propagate
+    to the caller so the stream can report them.
+    The span is recorded once the stream ends, since a generator can be closed
+    from a different context than the one it started in.
+    """
+    timeout = clamp_timeout(timeout, call_site)
+    CONFIG = _build_config(timeout, response_schema, json_mode)
+    cache, cache_key, cached = await asyncio.to_thread(_cache_lookup, prompt, CONFIG, call_site)
+    if cached is not None:
+        record(f"llm {call_site}", time.time_ns(), "client", **{"llm.call_site": call_site, "llm.cache_hit": True})
+        yield cached.text
+        return
+
+    chunks = []
+    last_chunk = None
+    start = time.perf_counter()
+    start_ns = time.time_ns()
+    try:
+        async for chunk in _BACKEND.stream_async(cache_key, prompt, CONFIG, call_site):
+            last_chunk = chunk
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield chunk.text
+    except Exception as e:
+        record_llm_call(call_site, time.perf_counter() - start, error=True)
+        record(f"llm {call_site}", start_ns, "client", error=f"{type(e).__name__}: {e}",
+               **{"llm.call_site": call_site, "llm.cache_hit": False, "llm.streamed": True})
+        raise
+    # The final chunk carries the usage totals for the whole response
+    record_llm_call(call_site, time.perf_counter() - start, last_chunk)
+    record(f"llm {call_site}", start_ns, "client",
+           **{"llm.call_site": call_site, "llm.cache_hit": False, "llm.streamed": True})
+
+    await asyncio.to_thread(_cache_response, cache, cache_key, "".join(chunks), call_site, cache_ttl,
+                            _expected_json(response_schema, json_mode))
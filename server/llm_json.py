@@ -0,0 +1,132 @@
+import json
+import re
+
+from metrics import LLM_JSON_DECODES, record_parse_failure
+
+_FENCE = re.compile(r"```(?:json|JSON)?")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_PY_LITERAL = re.compile(r"\b(True|False|None)\b")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"'})
+
+
+def _strip_fences(text: str) -> str:
+    return _FENCE.sub("", text).strip("` \n\t\r")
+
+
+def _extract_span(text: str) -> str:
+    """Cut the text down to the first JSON object/array, dropping any prose around it."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if not starts:
+        return text
+    start = min(starts)
+    end = max(text.rfind("}"), text.rfind("]"))
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def _close_truncated(text: str) -> str:
+    """
+    Close a document that was cut off mid-way (e.g. by the output token limit):
+    terminate an open string, drop a dangling key/comma and append missing closers.
+    """
+    stack = []
+    in_string = False
+    escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    if not stack:
+        return text
+    text = text.rstrip()
+    if stack[-1] == "}":
+        # A trailing `"key":` or `"key"` has no value yet; drop it
+        text = re.sub(r'([{,])\s*"[^"\\]*"\s*:?\s*$', r"\1", text)
+    text = text.rstrip().rstrip(",")
+    return text + "".join(reversed(stack))
+
+
+def _outside_strings(text: str, fix) -> str:
+    """Apply `fix` to the text between JSON string tokens, leaving string contents as they are."""
+    parts = []
+    start = 0  # beginning of the current non-string run
+    i = 0
+    while i < len(text):
+        if text[i] != '"':
+            i += 1
+            continue
+        parts.append(fix(text[start:i]))
+        # Scan to the closing quote, skipping escaped characters
+        end = i + 1
+        while end < len(text) and text[end] != '"':
+            end += 2 if text[end] == "\\" else 1
+        parts.append(text[i:end + 1])
+        i = start = end + 1
+    parts.append(fix(text[start:]))
+    return "".join(parts)
+
+
+def _repair(text: str) -> str:
+    # Smart quotes first: once they are straight, the string tokens they delimit are seen as strings
+    text = _outside_strings(_extract_span(text), lambda run: run.translate(_SMART_QUOTES))
+    text = _outside_strings(text, lambda run: _TRAILING_COMMA.sub(
+        r"\1", _PY_LITERAL.sub(lambda m: _PY_LITERALS[m.group(1)], run)))
+    return _close_truncated(text)
+
+
+def _decode(raw_text, expect=None):
+    """(outcome, value) of the first parse that works: "clean", "repaired", or ("failed", None)."""
+    text = _strip_fences(raw_text)
+    for outcome, candidate in (("clean", lambda: text), ("repaired", lambda: _repair(text))):
+        try:
+            value = json.loads(candidate())
+        except (ValueError, TypeError):
+            continue
+        if expect is not None and not isinstance(value, expect):
+            continue
+        return outcome, value
+    return "failed", None
+
+
+def is_decodable(raw_text, expect=None) -> bool:
+    """Whether decode_llm_json would return a value for `raw_text`; records no metrics."""
+    return raw_text is not None and _decode(raw_text, expect)[0] != "failed"
+
+
+def decode_llm_json(raw_text, call_site="default", default=None, expect=None):
+    """
+    Shared decoder for every LLM stage that returns JSON.
+
+    Tries a plain parse after stripping code fences, then a tolerant repair
+    (prose around the document, trailing commas, Python literals, smart quotes,
+    truncated output). Returns `default` only when both fail, and records the
+    outcome per call site. `expect` (dict or list) rejects results of the wrong type.
+    A None `raw_text` means the call itself failed or was skipped (already counted
+    in llm_requests_total), so the default is returned without a parse failure.
+    """
+    if raw_text is None:
+        return default
+    outcome, value = _decode(raw_text, expect)
+    if outcome != "failed":
+        LLM_JSON_DECODES.inc(call_site=call_site, outcome=outcome)
+        if outcome == "repaired":
+            print(f"Repaired malformed JSON from {call_site}")
+        return value
+
+    LLM_JSON_DECODES.inc(call_site=call_site, outcome="failed")
+    record_parse_failure(call_site)
+    print(f"Error parsing JSON from {call_site}\nRaw: {raw_text}")
+    return default
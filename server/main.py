@@ -1,20 +1,46 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import HTTPException
 
 # Import your existing features
-from features.itinerary_generation.llm_parser import llm_parse_user_input, generate_clarifying_questions
-from features.itinerary_generation.itinerary_generator import generate_itinerary
+from features.itinerary_generation.llm_parser import (
+    llm_parse_user_input_async,
+    llm_parse_answers_async,
+    generate_clarifying_questions,
+    is_degraded
+)
+from features.itinerary_generation.itinerary_generator import (
+    generate_itinerary_async,
+    stream_itinerary_async,
+    is_fallback_itinerary
+)
 from features.itinerary_generation.basic_tag_personalization import apply_personalization
-from features.reddit_scraper.scraper import fetch_reddit_comments
+from features.reddit_scraper.scraper import fetch_reddit_comments_async
 from features.reddit_scraper.preprocess import preprocess_reddit_data
-from features.reddit_scraper.summarizer import summarize_places
+from features.reddit_scraper.summarizer import summarize_places_async
+from features.reddit_scraper.city_knowledge import get_city_knowledge
 from features.emt_plus_payment.emt_service import EMTService
 from features.emt_plus_payment.emt_booking import EMTBooking
-from features.itinerary_generation.basic_visualization_generation import visualization_generation, add_images_to_itinerary
+from features.itinerary_generation.basic_visualization_generation import visualization_generation_async, add_images_to_itinerary_async
 from features.predictive_pipeline.weather_optimizer import optimize_itinerary
+from features.weather.weather_service import get_weather_forecast_async
 from data import INDIAN_AIRPORTS
+from llm_client import init_llm_backend
+from deadline import deadline_scope, within_budget
+from pipeline import Pipeline, Stage, server_timing
+from session_store import get_session_store, new_session_id
+from single_flight import SingleFlight, normalize_text
+from jobs import JobWorkers, get_job_queue
+from metrics import REGISTRY
+from tracing import TRACE_HEADER, TracingMiddleware
 # Import models from base_models
 from base_models import (
     UserRequest,
@@ -38,7 +64,38 @@ from base_models import (
 
 
 
-app = FastAPI(title='trip-planner-server')
+# Max itinerary pipelines in flight per worker (each one mostly waits on Gemini/Reddit)
+MAX_CONCURRENT_PLANS = int(os.getenv("MAX_CONCURRENT_PLANS", "200"))
+# Threads for the outbound clients that are still blocking (PRAW, SerpAPI, Google Maps)
+OUTBOUND_THREADS = int(os.getenv("OUTBOUND_THREADS", "64"))
+
+# Request budget kept back for the stages after Reddit and after the summary;
+# when a stage eats into it, it is cut short and the plan degrades instead of timing out
+SUMMARY_RESERVE_SECONDS = float(os.getenv("SUMMARY_RESERVE_SECONDS", "25"))
+ITINERARY_RESERVE_SECONDS = float(os.getenv("ITINERARY_RESERVE_SECONDS", "15"))
+# Per-stage durations in a Server-Timing response header (debugging aid)
+STAGE_TIMING_HEADER = os.getenv("STAGE_TIMING_HEADER", "true").lower() == "true"
+# Background jobs are not held to a load balancer's idle timeout, so they get a longer budget
+JOB_BUDGET_SECONDS = float(os.getenv("JOB_BUDGET_SECONDS", "120"))
+
+plan_semaphore = asyncio.Semaphore(MAX_CONCURRENT_PLANS)
+# Identical concurrent requests share one run (pipeline stages coalesce on their memo keys)
+storytelling_flight = SingleFlight("storytelling")
+flight_search_flight = SingleFlight("search_flights")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=OUTBOUND_THREADS))
+    # Create the pooled Gemini clients once per worker and open their connections
+    await asyncio.to_thread(init_llm_backend, True)
+    app.state.jobs = JobWorkers(get_job_queue(), JOB_HANDLERS)
+    app.state.jobs.start()
+    yield
+    await app.state.jobs.stop()
+
+
+app = FastAPI(title='trip-planner-server', lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,46 +103,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Session-Id", "Server-Timing", TRACE_HEADER],
 )
+# Added last so it wraps CORS too: every response carries its X-Trace-Id
+app.add_middleware(TracingMiddleware)
 
 # Your existing routes remain the same...
 @app.post('/generate-iternary')
-def generate_iternary(user_req: UserRequest):
+async def generate_iternary(user_req: UserRequest):
     try:
         prompt = user_req.prompt
+        session_id = user_req.session_id or new_session_id()
         print(f'Generating Iternary for prompt: {prompt}')
-        parsed = llm_parse_user_input(prompt)
-        print("Parsed Input:", parsed)
-        que = generate_clarifying_questions(parsed)
-        if len(que):
-            print('Need More clarification from user')
-            que = [' • ' + q for q in que]
-            resp = '\n'.join(que)
-            return JSONResponse(
-                status_code=200, 
-                content={
-                    "message": 'Need clarification',
-                    "resp": resp
-                }
-            )
-        place = parsed["location"]
-        print('Location: ', place)
-        posts = fetch_reddit_comments(place, limit=10)
-        print("Number of Posts: ", len(posts))
-        
-        text_blob = preprocess_reddit_data(posts)
-        summary = summarize_places(text_blob, place)
-
-        itinerary = generate_itinerary(parsed, summary)
-        print("Generated Itinerary:", itinerary)
-
-        personalized = apply_personalization(itinerary, parsed["themes"])
-        print("Personalized Itinerary:", personalized)
-        
-        return JSONResponse(
-            status_code=200,
-            content=personalized
-        )
+        with deadline_scope():
+            async with plan_semaphore:
+                content, timings = await _generate_iternary(prompt, session_id)
+        return JSONResponse(status_code=200, content=content, headers=_response_headers(session_id, timings))
 
     except Exception as e:
         print(f'Error while calling generate-iternary api: {e}')
@@ -97,6 +130,250 @@ def generate_iternary(user_req: UserRequest):
         )
 
 
+async def _generate_iternary(prompt: str, session_id: str, listener=None):
+    """Parse, then either clarifying questions or the full plan; returns (content, timings)."""
+    memo = get_session_store().memo(session_id)
+    results, timings = await PARSE_PIPELINE.run(listener=listener, memo=memo, text=prompt)
+    parsed = results["parsed"]
+    print("Parsed Input:", parsed)
+    que = generate_clarifying_questions(parsed)
+    if len(que):
+        print('Need More clarification from user')
+        _remember_request(memo, parsed)
+        que = [' • ' + q for q in que]
+        resp = '\n'.join(que)
+        content = {
+            "message": 'Need clarification',
+            "resp": resp,
+            "session_id": session_id
+        }
+        return content, timings
+    return await _plan_itinerary(parsed, session_id, timings, listener)
+
+
+async def _fetch_posts(place: str):
+    """Reddit crawl bounded by the request budget; it returns the posts hydrated so far when time runs short."""
+    posts = await within_budget(
+        fetch_reddit_comments_async(place, limit=10, reserve=SUMMARY_RESERVE_SECONDS), [],
+        reserve=SUMMARY_RESERVE_SECONDS, stage="reddit_fetch")
+    print("Number of Posts: ", len(posts))
+    return posts
+
+
+async def _summarize_posts(posts: list, place: str, themes=()):
+    """Summary bounded by the request budget; an empty summary keeps the itinerary call's time."""
+    if not posts:
+        return ""
+    text_blob = preprocess_reddit_data(posts, place, themes)
+    return await within_budget(
+        summarize_places_async(text_blob, place), "", reserve=ITINERARY_RESERVE_SECONDS, stage="summarizer")
+
+
+# Pipeline stages. Names double as result keys and Server-Timing metric names;
+# memo keys name the inputs a stage's result really depends on, so a follow-up
+# request in the same session skips e.g. the Reddit crawl when only the budget changed.
+
+async def _knowledge_stage(parsed):
+    """Nightly precomputed summary for the city (in-memory lookup), or None to crawl live."""
+    store = get_city_knowledge()
+    return store.latest(parsed["location"]) if store else None
+
+
+async def _posts_stage(parsed, knowledge):
+    print('Location: ', parsed["location"])
+    if knowledge:
+        return []
+    return await _fetch_posts(parsed["location"])
+
+
+async def _summary_stage(parsed, posts, knowledge):
+    if knowledge:
+        return knowledge
+    return await _summarize_posts(posts, parsed["location"], parsed.get("themes") or ())
+
+
+async def _weather_stage(parsed):
+    """Forecast for the trip dates; only needs the location, so it overlaps with Reddit + summary."""
+    try:
+        return await within_budget(
+            get_weather_forecast_async(parsed["location"], parsed["duration_days"]),
+            None, reserve=ITINERARY_RESERVE_SECONDS, stage="weather")
+    except Exception as e:
+        print(f"Weather lookup failed, planning without forecast: {e}")
+        return None
+
+
+async def _itinerary_stage(parsed, summary, weather):
+    itinerary = await generate_itinerary_async(parsed, summary, weather)
+    print("Generated Itinerary:", itinerary)
+    return itinerary
+
+
+async def _answers_stage(answers, parsed_before):
+    return await llm_parse_answers_async(answers, parsed_before)
+
+
+async def _personalized_stage(parsed, itinerary):
+    personalized = apply_personalization(itinerary, parsed["themes"])
+    print("Personalized Itinerary:", personalized)
+    return personalized
+
+
+PARSE_PIPELINE = Pipeline(
+    Stage("parsed", llm_parse_user_input_async, inputs=["text"], memo=lambda text: normalize_text(text),
+          cacheable=lambda parsed: not is_degraded(parsed))
+)
+# Clarification answers merged into the first call's parsed request
+ANSWERS_PIPELINE = Pipeline(
+    Stage("parsed", _answers_stage, inputs=["answers", "parsed_before"],
+          memo=lambda answers, parsed_before: [answers, parsed_before],
+          cacheable=lambda parsed: not is_degraded(parsed))
+)
+INSIGHT_STAGES = [
+    Stage("knowledge", _knowledge_stage, inputs=["parsed"]),
+    Stage("posts", _posts_stage, inputs=["parsed", "knowledge"],
+          memo=lambda parsed, knowledge: parsed["location"]),
+    Stage("summary", _summary_stage, inputs=["parsed", "posts", "knowledge"],
+          memo=lambda parsed, posts, knowledge: [parsed["location"], parsed.get("themes"), posts, knowledge]),
+    Stage("weather", _weather_stage, inputs=["parsed"],
+          memo=lambda parsed: [parsed["location"], parsed["duration_days"]]),
+]
+INSIGHTS_PIPELINE = Pipeline(*INSIGHT_STAGES)
+PLAN_PIPELINE = Pipeline(
+    *INSIGHT_STAGES,
+    Stage("itinerary", _itinerary_stage, inputs=["parsed", "summary", "weather"],
+          memo=lambda parsed, summary, weather: [parsed, summary, weather],
+          cacheable=lambda itinerary: not is_fallback_itinerary(itinerary)),
+    Stage("personalized", _personalized_stage, inputs=["parsed", "itinerary"]),
+)
+
+
+def _remember_request(memo, parsed: dict):
+    """Keep the parsed request so the clarification answers can be delta-parsed onto it."""
+    if not is_degraded(parsed):
+        memo.set("parsed_request", "latest", parsed)
+
+
+def _recall_request(memo):
+    hit, parsed = memo.get("parsed_request", "latest")
+    return parsed if hit else None
+
+
+def _response_headers(session_id: str, timings: dict) -> dict:
+    headers = {"X-Session-Id": session_id}
+    if STAGE_TIMING_HEADER:
+        headers["Server-Timing"] = server_timing(timings)
+    return headers
+
+
+async def _plan_itinerary(parsed: dict, session_id: str, timings=None, listener=None):
+    """Reddit crawl + weather -> summary -> itinerary -> personalization; returns (itinerary, timings)."""
+    memo = get_session_store().memo(session_id)
+    results, plan_timings = await PLAN_PIPELINE.run(listener=listener, memo=memo, parsed=parsed)
+    return results["personalized"], {**(timings or {}), **plan_timings}
+
+
+def _sse(event: str, data) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post('/generate-iternary/stream')
+async def generate_iternary_stream(user_req: UserRequest):
+    """
+    Server-sent-events variant of /generate-iternary.
+    Emits `stage` progress events, a `day` event as soon as each itinerary day
+    is generated, then one `itinerary` event with the full personalized plan.
+    """
+    session_id = user_req.session_id or new_session_id()
+    return StreamingResponse(
+        _stream_iternary(user_req.prompt, session_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "X-Session-Id": session_id}
+    )
+
+
+async def _stream_iternary(prompt: str, session_id: str):
+    try:
+        print(f'Streaming Iternary for prompt: {prompt}')
+        with deadline_scope():
+            async with plan_semaphore:
+                async for event in _stream_plan(prompt, session_id):
+                    yield event
+
+    except Exception as e:
+        print(f'Error while streaming generate-iternary api: {e}')
+        yield _sse("error", {"message": 'Failed to Generate Iternary'})
+
+
+async def _stream_plan(prompt: str, session_id: str):
+    memo = get_session_store().memo(session_id)
+    yield _sse("stage", {"stage": "parse", "status": "started"})
+    results, timings = await PARSE_PIPELINE.run(memo=memo, text=prompt)
+    parsed = results["parsed"]
+    yield _sse("stage", {"stage": "parse", "status": "done"})
+
+    que = generate_clarifying_questions(parsed)
+    if len(que):
+        _remember_request(memo, parsed)
+        que = [' • ' + q for q in que]
+        yield _sse("clarification", {"message": 'Need clarification', "resp": '\n'.join(que), "session_id": session_id})
+        return
+
+    async for kind, payload in _stream_pipeline(INSIGHTS_PIPELINE, memo=memo, parsed=parsed):
+        if kind == "event":
+            yield payload
+        else:
+            results, insight_timings = payload
+            timings.update(insight_timings)
+
+    yield _sse("stage", {"stage": "itinerary", "status": "started"})
+    start = time.perf_counter()
+    async for kind, payload in stream_itinerary_async(parsed, results["summary"], results["weather"]):
+        if kind == "day":
+            day = apply_personalization({"itinerary": [payload]}, parsed["themes"])["itinerary"][0]
+            yield _sse("day", day)
+        else:
+            yield _sse("itinerary", apply_personalization(payload, parsed["themes"]))
+    timings["itinerary"] = time.perf_counter() - start
+
+    if STAGE_TIMING_HEADER:
+        # Headers are already sent, so streams report timings as a final event
+        yield _sse("timings", {name: round(seconds * 1000, 1) for name, seconds in timings.items()})
+
+
+async def _stream_pipeline(pipeline: Pipeline, memo=None, **values):
+    """
+    Run a pipeline while relaying its stage progress as SSE `stage` events.
+    Yields ("event", sse_text) items, then ("result", (results, timings)).
+    """
+    events = asyncio.Queue()
+
+    def on_stage(stage, status, result):
+        # "posts" keeps its original event name for existing clients
+        data = {"stage": "reddit_fetch" if stage == "posts" else stage, "status": status}
+        if stage == "posts" and status == "started":
+            data["location"] = values["parsed"]["location"]
+        if stage == "posts" and status == "done":
+            data["posts"] = len(result)
+        events.put_nowait(data)
+
+    async def run():
+        try:
+            return await pipeline.run(listener=on_stage, memo=memo, **values)
+        finally:
+            events.put_nowait(None)
+
+    task = asyncio.ensure_future(run())
+    try:
+        while (data := await events.get()) is not None:
+            yield "event", _sse("stage", data)
+    finally:
+        if not task.done():
+            task.cancel()
+    yield "result", task.result()
+
+
 @app.get("/airports/india")
 def get_indian_airports():
     """
@@ -106,32 +383,17 @@ def get_indian_airports():
 
 
 @app.post('/generate-final-iternary')
-def generate_final_iternary(user_req: ClarrifyingUserReq):
+async def generate_final_iternary(user_req: ClarrifyingUserReq):
     try:
         prompt = user_req.prompt
         clarrifying_ans = user_req.clarrifying_answers
         prompt = prompt + ' Clarrifications: ' + clarrifying_ans
+        session_id = user_req.session_id or new_session_id()
         print(f'Generating final Iternary for prompt: {prompt}')
-        parsed = llm_parse_user_input(prompt)
-        print("Parsed Input:", parsed)
-        place = parsed["location"]
-        print('Location: ', place)
-        posts = fetch_reddit_comments(place, limit=10)
-        print("Number of Posts: ", len(posts))
-        
-        text_blob = preprocess_reddit_data(posts)
-        summary = summarize_places(text_blob, place)
-
-        itinerary = generate_itinerary(parsed, summary)
-        print("Generated Itinerary:", itinerary)
-
-        personalized = apply_personalization(itinerary, parsed["themes"])
-        print("Personalized Itinerary:", personalized)
-        
-        return JSONResponse(
-            status_code=200,
-            content=personalized
-        )
+        with deadline_scope():
+            async with plan_semaphore:
+                content, timings = await _generate_final_iternary(prompt, clarrifying_ans, session_id)
+        return JSONResponse(status_code=200, content=content, headers=_response_headers(session_id, timings))
 
     except Exception as e:
         print(f'Error while calling generate-final-iternary api: {e}')
@@ -142,14 +404,105 @@ def generate_final_iternary(user_req: ClarrifyingUserReq):
             }
         )
 
+async def _generate_final_iternary(prompt: str, clarrifying_ans: str, session_id: str, listener=None):
+    memo = get_session_store().memo(session_id)
+    parsed_before = _recall_request(memo)
+    if parsed_before is not None:
+        # Only the fields that were missing get extracted from the answers
+        results, timings = await ANSWERS_PIPELINE.run(
+            listener=listener, memo=memo, answers=clarrifying_ans, parsed_before=parsed_before)
+    else:
+        results, timings = await PARSE_PIPELINE.run(listener=listener, memo=memo, text=prompt)
+    parsed = results["parsed"]
+    print("Parsed Input:", parsed)
+    return await _plan_itinerary(parsed, session_id, timings, listener)
+
+
+# Background jobs: same pipelines as the routes above, for clients behind
+# proxies that drop long-held connections. POST returns a job id at once;
+# poll GET /jobs/{job_id} or pass webhook_url to be called when it is done.
+
+def _job_listener(report):
+    def on_stage(stage, status, result):
+        report({"stage": stage, "status": status})
+    return on_stage
+
+
+async def _generate_job(payload: dict, report):
+    with deadline_scope(JOB_BUDGET_SECONDS):
+        async with plan_semaphore:
+            content, timings = await _generate_iternary(
+                payload["prompt"], payload["session_id"], _job_listener(report))
+    report({"stage": "timings", "status": "done", "timings": timings})
+    return content
+
+
+async def _generate_final_job(payload: dict, report):
+    with deadline_scope(JOB_BUDGET_SECONDS):
+        async with plan_semaphore:
+            content, timings = await _generate_final_iternary(
+                payload["prompt"] + ' Clarrifications: ' + payload["clarrifying_answers"],
+                payload["clarrifying_answers"], payload["session_id"], _job_listener(report))
+    report({"stage": "timings", "status": "done", "timings": timings})
+    return content
+
+
+JOB_HANDLERS = {
+    "generate-iternary": _generate_job,
+    "generate-final-iternary": _generate_final_job,
+}
+
+
+async def _submit_job(kind: str, payload: dict, webhook_url):
+    try:
+        return await app.state.jobs.submit(kind, payload, webhook_url)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+def _job_submitted(job_id: str, session_id: str):
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": "queued", "session_id": session_id, "poll": f"/jobs/{job_id}"},
+        headers={"X-Session-Id": session_id, "Location": f"/jobs/{job_id}"}
+    )
+
+
+@app.post('/jobs/generate-iternary')
+async def submit_generate_iternary(user_req: UserRequest):
+    session_id = user_req.session_id or new_session_id()
+    job_id = await _submit_job(
+        "generate-iternary", {"prompt": user_req.prompt, "session_id": session_id}, user_req.webhook_url)
+    return _job_submitted(job_id, session_id)
+
+
+@app.post('/jobs/generate-final-iternary')
+async def submit_generate_final_iternary(user_req: ClarrifyingUserReq):
+    session_id = user_req.session_id or new_session_id()
+    payload = {
+        "prompt": user_req.prompt,
+        "clarrifying_answers": user_req.clarrifying_answers,
+        "session_id": session_id
+    }
+    job_id = await _submit_job("generate-final-iternary", payload, user_req.webhook_url)
+    return _job_submitted(job_id, session_id)
+
+
+@app.get('/jobs/{job_id}')
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @app.post("/generate-visual-storytelling")
-def get_story_telling(input_data: StoryTelling):
+async def get_story_telling(input_data: StoryTelling):
     try:
         iternary = input_data.iternary
-        resp = visualization_generation(iternary)
-        
-        # Step 2: Add real images to each place
-        resp_with_images = add_images_to_itinerary(resp)
+        with deadline_scope():
+            async with plan_semaphore:
+                resp_with_images = await storytelling_flight.do(iternary, lambda: _story_with_images(iternary))
         
         return JSONResponse(
             status_code=200,
@@ -165,6 +518,13 @@ def get_story_telling(input_data: StoryTelling):
             }
         )
 
+
+async def _story_with_images(iternary: dict):
+    resp = await visualization_generation_async(iternary)
+
+    # Step 2: Add real images to each place
+    return await add_images_to_itinerary_async(resp)
+
      
 
 # Initialize services
@@ -223,7 +583,7 @@ def search_hotels(
         return {"error": str(e)}
 
 @app.get("/search-flights")
-def search_flights(
+async def search_flights(
     origin: str = Query(..., description="Origin IATA code"),
     destination: str = Query(..., description="Destination IATA code"),
     departure_date: str = Query(..., description="Departure date YYYY-MM-DD"),
@@ -231,13 +591,20 @@ def search_flights(
     adults: int = Query(1, description="Number of adults")
 ):
     """Enhanced flight search API that supports both departure and return dates."""
-    result = service.search_flights_enhanced(
-        origin=origin,
-        destination=destination,
-        departure_date=departure_date,
-        return_date=return_date,
-        adults=adults
-    )
+    query = {
+        "origin": origin.strip().upper(),
+        "destination": destination.strip().upper(),
+        "departure_date": departure_date.strip(),
+        "return_date": return_date.strip() if return_date else None,
+        "adults": adults
+    }
+    try:
+        # Blocking client: runs on the outbound pool, and identical concurrent searches share one call
+        result = await flight_search_flight.do(
+            query, lambda: asyncio.to_thread(service.search_flights_enhanced, **query))
+    except Exception as e:
+        print(f'Error while calling search-flights api: {e}')
+        raise HTTPException(status_code=502, detail=f"Flight search failed: {e}")
     return JSONResponse(content=result)
 
 # Updated booking endpoint to handle search results format
@@ -469,15 +836,18 @@ def book_flights_search_workflow(req: FlightBookingRequest):
 
 
 @app.post("/optimize-itinerary")
-def optimize_itinerary_api(req: OptimizeRequest):
+async def optimize_itinerary_api(req: OptimizeRequest):
     try:
-        resp = optimize_itinerary(
-            itinerary_json=req.itinerary_json,
-            parsed_input=req.parsed_input,
-            start_day=req.start_day,
-            city=req.city
-        
-        )
+        # Weather, Gemini and Google Maps calls are interleaved here, so the
+        # whole optimizer runs on the outbound thread pool
+        async with plan_semaphore:
+            resp = await asyncio.to_thread(
+                optimize_itinerary,
+                itinerary_json=req.itinerary_json,
+                parsed_input=req.parsed_input,
+                start_day=req.start_day,
+                city=req.city
+            )
         print("Optimized Itinerary:", resp)
         return JSONResponse(
             status_code = 200,
@@ -511,6 +881,12 @@ def health_check():
 
 
 
+@app.get('/metrics')
+def metrics():
+    """Prometheus-style metrics for this worker (LLM latency, tokens, cost, cache)"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get('/')
 def default_func():
     try:
@@ -518,13 +894,15 @@ def default_func():
             "message": "Trip Planner Server is running",
             "endpoints": {
                 "generate_itinerary": "/generate-iternary",
+                "generate_itinerary_stream": "/generate-iternary/stream (server-sent events)",
                 "search_flights": "/search-flights",
                 "book_flights": "/book-flights (accepts flights array)",
                 "book_single_flight": "/book-single-flight (accepts single flight_offer)",
                 "search_hotels": "/search-hotels",
                 "book_hotels": "/book-hotels (accepts hotels array)",
                 "book_single_hotel": "/book-single-hotel (accepts single hotel)",
-                "health": "/health"
+                "health": "/health",
+                "metrics": "/metrics"
             },
             "usage": {
                 "book_flights": "Send the exact JSON from search-flights endpoint",
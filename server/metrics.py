@@ -0,0 +1,197 @@
+import os
+import threading
+from collections import defaultdict
+
+# Gemini 2.5 Flash list prices (USD per million tokens); override through .env
+LLM_INPUT_PRICE_PER_MTOK = float(os.getenv("LLM_INPUT_PRICE_PER_MTOK", "0.30"))
+LLM_OUTPUT_PRICE_PER_MTOK = float(os.getenv("LLM_OUTPUT_PRICE_PER_MTOK", "2.50"))
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+
+def _label_key(labels: dict):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{str(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] += amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series["count"] if series else 0
+
+    def quantile(self, q, **labels):
+        """Estimate a quantile by linear interpolation inside the matching bucket."""
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            if not series or not series["count"]:
+                return None
+            target = q * series["count"]
+            seen = 0
+            lower = 0.0
+            for bound, count in zip(self.buckets, series["counts"]):
+                if count and seen + count >= target:
+                    return lower + (bound - lower) * (target - seen) / count
+                seen += count
+                lower = bound
+            return self.buckets[-1]  # observation beyond the last bucket
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', f'{bound:g}')])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+LLM_LATENCY = REGISTRY.histogram(
+    "llm_request_latency_seconds", "Wall-clock latency of Gemini calls by call site", LATENCY_BUCKETS)
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "llm_prompt_tokens", "Prompt tokens per Gemini call by call site", TOKEN_BUCKETS)
+LLM_OUTPUT_TOKENS = REGISTRY.histogram(
+    "llm_output_tokens", "Output tokens per Gemini call by call site", TOKEN_BUCKETS)
+LLM_REQUESTS = REGISTRY.counter(
+    "llm_requests_total", "Gemini calls by call site and outcome")
+LLM_COST = REGISTRY.counter(
+    "llm_cost_usd_total", "Estimated Gemini spend in USD by call site")
+LLM_PARSE_FAILURES = REGISTRY.counter(
+    "llm_parse_failures_total", "LLM responses that could not be parsed, by call site")
+LLM_JSON_DECODES = REGISTRY.counter(
+    "llm_json_decodes_total", "JSON decodes of LLM output by call site and outcome (clean, repaired, failed)")
+LLM_DEADLINE_SKIPS = REGISTRY.counter(
+    "llm_deadline_skips_total", "Calls or stages skipped because the request budget ran out, by call site")
+LLM_HEDGES = REGISTRY.counter(
+    "llm_hedges_total", "Hedged Gemini calls by call site and winner (primary, hedge)")
+LLM_PROMPT_TOKENS_SAVED = REGISTRY.counter(
+    "llm_prompt_tokens_saved_total", "Estimated prompt tokens saved by compact serialization, budget trimming and Reddit selection")
+STAGE_MEMO_LOOKUPS = REGISTRY.counter(
+    "pipeline_stage_memo_lookups_total", "Session stage-cache lookups by stage and result (hit, miss)")
+CITY_KNOWLEDGE_LOOKUPS = REGISTRY.counter(
+    "city_knowledge_lookups_total", "Precomputed city summary lookups by result (hit, miss)")
+PARSER_FAST_PATH = REGISTRY.counter(
+    "parser_fast_path_total", "Requests parsed by the rule-based extractor (hit) vs sent to the LLM (fallback)")
+JOBS = REGISTRY.counter(
+    "jobs_total", "Background jobs by kind and status (queued, done, failed)")
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    "single_flight_calls_total", "Coalesced work by flight and role (leader ran it, follower shared its result)")
+REDDIT_HYDRATIONS = REGISTRY.counter(
+    "reddit_hydrations_total", "Reddit comment-tree fetches by result (ok, error, skipped when the budget ran out)")
+REDDIT_CRAWL_CALLS = REGISTRY.counter(
+    "reddit_crawl_api_calls_total", "Reddit API calls (searches and comment trees) made by crawls, by mode")
+REDDIT_CRAWL_RELEVANT = REGISTRY.counter(
+    "reddit_crawl_relevant_posts_total", "Crawled posts that mention the place, by mode; divide by API calls for relevance per call")
+REDDIT_DEDUP_TOKENS_SAVED = REGISTRY.counter(
+    "reddit_dedup_tokens_saved_total", "Estimated tokens of near-duplicate Reddit comments dropped before summarizing, by city")
+REDDIT_CORPUS_LOOKUPS = REGISTRY.counter(
+    "reddit_corpus_lookups_total", "Reddit corpus lookups by result (hit, stale: served and refreshed, cold: crawled live)")
+CACHE_LOOKUPS = REGISTRY.counter(
+    "cache_lookups_total", "Shared cache lookups by namespace and result (local_hit, shared_hit, miss)")
+LLM_CACHE_LOOKUPS = REGISTRY.counter(
+    "llm_cache_lookups_total", "LLM cache lookups by call site and result (memory_hit, disk_hit, miss)")
+LLM_BATCH_REQUESTS = REGISTRY.counter(
+    "llm_batch_requests_total", "Requests that went through the micro-batching scheduler")
+LLM_BATCH_SENT = REGISTRY.counter(
+    "llm_batch_sent_total", "Gemini calls actually sent by the micro-batching scheduler")
+LLM_BATCHES = REGISTRY.counter(
+    "llm_batches_total", "Batches dispatched by the micro-batching scheduler")
+
+
+def record_llm_call(call_site, latency, response=None, error=False):
+    """Record latency, token usage and estimated cost for one Gemini call."""
+    LLM_REQUESTS.inc(call_site=call_site, outcome="error" if error else "ok")
+    LLM_LATENCY.observe(latency, call_site=call_site)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = usage.prompt_token_count or 0
+    output_tokens = usage.candidates_token_count or 0
+    LLM_PROMPT_TOKENS.observe(prompt_tokens, call_site=call_site)
+    LLM_OUTPUT_TOKENS.observe(output_tokens, call_site=call_site)
+    cost = (prompt_tokens * LLM_INPUT_PRICE_PER_MTOK + output_tokens * LLM_OUTPUT_PRICE_PER_MTOK) / 1_000_000
+    LLM_COST.inc(cost, call_site=call_site)
+
+
+def record_parse_failure(call_site):
+    LLM_PARSE_FAILURES.inc(call_site=call_site)
@@ -0,0 +1,113 @@
+import asyncio
+import inspect
+import time
+
+from deadline import deadline_bucket
+from single_flight import SingleFlight
+from tracing import span
+
+
+class Stage:
+    """
+    One node of a pipeline: `func(**inputs)` runs once every named input is available.
+    `memo(**inputs)` returns the part of the inputs the result actually depends on;
+    stages with a memo key can be served from a session's stage cache, and
+    concurrent runs with the same key (from any request with a similar
+    deadline) share one execution.
+    `cacheable(result)` returning False keeps a degraded result (an LLM
+    fallback) out of the session's stage cache, so the next call retries.
+    """
+
+    def __init__(self, name, func, inputs=(), memo=None, cacheable=None):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.memo = memo
+        self.cacheable = cacheable
+        self.flight = SingleFlight(f"stage:{name}") if memo is not None else None
+
+
+class Pipeline:
+    """
+    Small DAG executor for the request pipelines in main.py.
+
+    Each stage's result is stored under its name and can be an input of later
+    stages. A stage starts as soon as its inputs are ready, so independent
+    stages (e.g. the Reddit crawl and the weather lookup) overlap. Coroutine
+    functions run on the event loop, plain functions on the default thread pool.
+    """
+
+    def __init__(self, *stages):
+        self.stages = list(stages)
+        names = [stage.name for stage in self.stages]
+        if len(names) != len(set(names)):
+            raise ValueError(f"Duplicate pipeline stage names: {names}")
+
+    async def run(self, listener=None, memo=None, **values):
+        """
+        Run every stage and return (results, timings).
+        `values` seeds the inputs; `timings` maps stage name -> seconds.
+        `listener(stage, status, result)` is called as stages start and finish.
+        `memo` (a session_store.StageMemo) reuses earlier results of memoizable stages.
+        The first failing stage cancels the rest and its exception propagates.
+        """
+        results = dict(values)
+        timings = {}
+        pending = list(self.stages)
+        running = {}
+        try:
+            while pending or running:
+                for stage in [s for s in pending if all(i in results for i in s.inputs)]:
+                    pending.remove(stage)
+                    task = asyncio.ensure_future(self._run_stage(stage, results, listener, memo))
+                    running[task] = stage
+                if not running:
+                    raise ValueError(f"Pipeline stages with unmet inputs: {[s.name for s in pending]}")
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    stage = running.pop(task)
+                    results[stage.name], timings[stage.name] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+        return results, timings
+
+    @staticmethod
+    async def _run_stage(stage, results, listener, memo):
+        kwargs = {name: results[name] for name in stage.inputs}
+        if listener:
+            listener(stage.name, "started", None)
+        start = time.perf_counter()
+        with span(f"stage {stage.name}", **{"pipeline.stage": stage.name}) as current:
+            memo_key = stage.memo(**kwargs) if stage.memo is not None else None
+            hit = False
+            if memo is not None and memo_key is not None:
+                hit, value = memo.get(stage.name, memo_key)
+            current.set("pipeline.memo_hit", hit)
+            if not hit:
+                if memo_key is not None:
+                    # The shared call runs under the first caller's deadline
+                    flight_key = (memo_key, deadline_bucket())
+                    value = await stage.flight.do(flight_key, lambda: Pipeline._call(stage, kwargs))
+                else:
+                    value = await Pipeline._call(stage, kwargs)
+                degraded = stage.cacheable is not None and not stage.cacheable(value)
+                current.set("pipeline.degraded", degraded)
+                if memo is not None and memo_key is not None and not degraded:
+                    memo.set(stage.name, memo_key, value)
+        elapsed = time.perf_counter() - start
+        if listener:
+            listener(stage.name, "done", value)
+        return value, elapsed
+
+    @staticmethod
+    async def _call(stage, kwargs):
+        if inspect.iscoroutinefunction(stage.func):
+            return await stage.func(**kwargs)
+        return await asyncio.to_thread(stage.func, **kwargs)
+
+
+def server_timing(timings: dict) -> str:
+    """Format stage timings as a Server-Timing header value (durations in ms)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items())
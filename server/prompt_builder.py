@@ -0,0 +1,112 @@
+import json
+import os
+import textwrap
+
+from metrics import LLM_PROMPT_TOKENS_SAVED
+
+# Input-token budget per call site; scale them all with PROMPT_BUDGET_SCALE
+PROMPT_BUDGETS = {
+    "parser": 2000,
+    "parser_delta": 1000,
+    "summarizer": 8000,
+    "itinerary_generator": 4000,
+    "weather_itinerary_generator": 4000,
+    "itinerary_updater": 6000,
+    "itinerary_day_updater": 2500,
+    "visualizer": 6000,
+    "weather_optimizer": 4000,
+    "default": 4000,
+}
+PROMPT_BUDGET_SCALE = float(os.getenv("PROMPT_BUDGET_SCALE", "1.0"))
+
+# Same rough ratio the offline backends use for usage estimates
+CHARS_PER_TOKEN = 4
+
+# Bookkeeping keys that mean nothing to downstream prompts
+INTERNAL_KEYS = ("_extracted_from_user", "_degraded")
+
+
+def _tokens_for_chars(chars: int) -> int:
+    return (chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_tokens(text: str) -> int:
+    return _tokens_for_chars(len(text))
+
+
+def compact_json(value, omit=()):
+    """Minified JSON (no indentation or spaces after separators), optionally without some top-level keys."""
+    if omit and isinstance(value, dict):
+        value = {k: v for k, v in value.items() if k not in omit}
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut to at most max_chars, preferring a line and then a word boundary."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    for sep in ("\n", " "):
+        idx = cut.rfind(sep)
+        if idx > max_chars // 2:
+            return cut[:idx]
+    return cut
+
+
+class PromptBuilder:
+    """
+    Assembles a prompt from sections and fits it to the call site's token budget.
+
+    Fixed sections (instructions, the request itself, documents the model must
+    edit) are always kept. Sections added with a priority are context and get
+    cut back lowest priority first until the prompt fits. Tokens saved against
+    the old pretty-printed, untrimmed prompt are counted in
+    llm_prompt_tokens_saved_total.
+    """
+
+    def __init__(self, call_site="default", budget=None):
+        self.call_site = call_site
+        if budget is None:
+            budget = int(PROMPT_BUDGETS.get(call_site, PROMPT_BUDGETS["default"]) * PROMPT_BUDGET_SCALE)
+        self.budget = budget
+        self._sections = []  # [text, priority]; priority None = never trimmed
+        self._baseline_chars = 0
+
+    def add_text(self, text: str, priority=None):
+        """Add a block of text; indented triple-quoted templates are dedented."""
+        self._baseline_chars += len(text)
+        self._sections.append([textwrap.dedent(text).strip("\n"), priority])
+        return self
+
+    def add_json(self, value, omit=()):
+        """Add a JSON document compactly. JSON sections are never trimmed, so they stay valid."""
+        self._baseline_chars += len(json.dumps(value, indent=2, default=str))
+        self._sections.append([compact_json(value, omit), None])
+        return self
+
+    def _length(self):
+        return sum(len(text) for text, _ in self._sections) + max(0, len(self._sections) - 1)
+
+    def build(self) -> str:
+        untrimmed_tokens = estimate_tokens("\n".join(text for text, _ in self._sections))
+        over = self._length() - self.budget * CHARS_PER_TOKEN
+        trimmable = sorted((s for s in self._sections if s[1] is not None), key=lambda s: s[1])
+        for section in trimmable:
+            if over <= 0:
+                break
+            before = len(section[0])
+            section[0] = _truncate(section[0], max(0, before - over))
+            over -= before - len(section[0])
+
+        prompt = "\n".join(text for text, _ in self._sections if text)
+        tokens = estimate_tokens(prompt)
+        if over > 0:
+            print(f"Prompt for {self.call_site} is ~{tokens} tokens, over its {self.budget} budget")
+
+        compaction_saved = _tokens_for_chars(self._baseline_chars) - untrimmed_tokens
+        trimming_saved = untrimmed_tokens - tokens
+        if compaction_saved > 0:
+            LLM_PROMPT_TOKENS_SAVED.inc(compaction_saved, call_site=self.call_site, reason="compaction")
+        if trimming_saved > 0:
+            LLM_PROMPT_TOKENS_SAVED.inc(trimming_saved, call_site=self.call_site, reason="trimming")
+        return prompt
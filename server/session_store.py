@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+from cache_backend import CACHE_ERRORS
+from llm_cache import DiskTier, MemoryTier, shared_tier
+from metrics import STAGE_MEMO_LOOKUPS
+
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(2 * 3600)))
+SESSION_MAX_ITEMS = int(os.getenv("SESSION_MAX_ITEMS", "2048"))
+SESSION_STORE_PATH = os.getenv(
+    "SESSION_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sessions.sqlite3")
+)
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def _entry_key(session_id, stage, inputs_key):
+    payload = json.dumps(inputs_key, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    return f"{session_id}:{stage}:{digest}"
+
+
+class SessionStore:
+    """
+    Stage results per conversation, so a follow-up request (e.g. the answers to
+    clarifying questions) only reruns the stages whose inputs changed.
+    Same memory -> SQLite tiering as the LLM cache, so any worker can pick up
+    a session; entries expire after SESSION_TTL_SECONDS.
+    """
+
+    def __init__(self, memory=None, disk=None, ttl=SESSION_TTL_SECONDS):
+        self.memory = memory or MemoryTier(SESSION_MAX_ITEMS)
+        self.disk = disk
+        self.ttl = ttl
+
+    def get(self, session_id, stage, inputs_key):
+        """Return (hit, value)."""
+        key = _entry_key(session_id, stage, inputs_key)
+        text = self.memory.get(key)
+        if text is None and self.disk is not None:
+            try:
+                text = self.disk.get(key)
+            except CACHE_ERRORS as e:
+                print(f"Session store read failed: {e}")
+            if text is not None:
+                self.memory.set(key, text, self.ttl)
+        STAGE_MEMO_LOOKUPS.inc(stage=stage, result="miss" if text is None else "hit")
+        if text is None:
+            return False, None
+        return True, json.loads(text)
+
+    def set(self, session_id, stage, inputs_key, value):
+        key = _entry_key(session_id, stage, inputs_key)
+        text = json.dumps(value, default=str)
+        self.memory.set(key, text, self.ttl)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, text, self.ttl, stage)
+            except CACHE_ERRORS as e:
+                print(f"Session store write failed: {e}")
+
+    def memo(self, session_id):
+        return StageMemo(self, session_id)
+
+
+class StageMemo:
+    """A SessionStore bound to one session; this is what Pipeline.run takes."""
+
+    def __init__(self, store, session_id):
+        self.store = store
+        self.session_id = session_id
+
+    def get(self, stage, inputs_key):
+        return self.store.get(self.session_id, stage, inputs_key)
+
+    def set(self, stage, inputs_key, value):
+        # Empty results are budget/error fallbacks; caching them would pin the degraded plan
+        if value:
+            self.store.set(self.session_id, stage, inputs_key, value)
+
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_session_store():
+    """Process-wide session store."""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            # With CACHE_BACKEND=redis, sessions are visible to every node, not just this host
+            _STORE = SessionStore(disk=shared_tier(lambda: DiskTier(SESSION_STORE_PATH)))
+    return _STORE
@@ -0,0 +1,72 @@
+import asyncio
+import copy
+import hashlib
+import json
+import re
+
+from metrics import SINGLE_FLIGHT_CALLS
+from tracing import current_trace_id, span
+
+
+def normalize_text(text: str) -> str:
+    """Case, whitespace and trailing punctuation do not change what a prompt asks for."""
+    return re.sub(r"\s+", " ", (text or "").lower()).strip(" .!?")
+
+
+def flight_key(value) -> str:
+    payload = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work: the first caller for a key runs
+    `func()`, callers arriving while it is in flight await the same task
+    instead of repeating the Gemini/SerpAPI/Amadeus calls. Nothing is kept
+    once the task finishes (that is the caches' job).
+
+    The shared task is shielded, so a caller that times out or is cancelled
+    does not cancel it for the others; it is cancelled once nobody waits.
+    It runs in the leader's context (deadline, trace); every caller gets its
+    own span, and a follower's names the trace the work was recorded in.
+    When a result was shared, every caller gets its own deep copy, since
+    routes mutate results (e.g. personalization).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+
+    async def do(self, key, func):
+        key = flight_key(key)
+        call = self._calls.get(key)
+        if call is None:
+            role = "leader"
+            call = {"task": None, "trace_id": current_trace_id(), "followers": 0, "waiters": 0}
+        else:
+            role = "follower"
+            call["followers"] += 1
+        SINGLE_FLIGHT_CALLS.inc(flight=self.name, role=role)
+
+        leader_trace_id = call["trace_id"] if role == "follower" else None
+        with span(f"single_flight {self.name}", **{"single_flight.role": role,
+                                                   "single_flight.leader_trace_id": leader_trace_id}):
+            if call["task"] is None:
+                # Started inside the leader's span, so the work's spans nest under it
+                call["task"] = asyncio.ensure_future(func())
+                self._calls[key] = call
+                # Runs before any awaiter resumes, so late arrivals start a fresh call
+                call["task"].add_done_callback(lambda _: self._calls.pop(key, None))
+            call["waiters"] += 1
+            try:
+                result = await asyncio.shield(call["task"])
+            except asyncio.CancelledError:
+                if call["waiters"] == 1 and not call["task"].done():
+                    call["task"].cancel()
+                raise
+            finally:
+                call["waiters"] -= 1
+        return copy.deepcopy(result) if call["followers"] else result
+
+    def in_flight(self) -> int:
+        return len(self._calls)
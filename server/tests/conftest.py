@@ -0,0 +1,4 @@
+import os
+
+# Keep test runs from appending spans to .cache/traces.jsonl
+os.environ.setdefault("TRACING_ENABLED", "false")
@@ -0,0 +1,203 @@
+import asyncio
+import io
+import socket
+import threading
+
+import pytest
+
+import cache_backend
+from cache_backend import CacheBackendError, LRUBackend, NamespacedCache, RedisBackend, ShardedBackend
+
+
+class RespStandIn:
+    """Tiny threaded RESP2 server with GET/SET/DEL/AUTH/SELECT, for testing RedisBackend without Redis."""
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+        self.connections = 0
+        self._clients = []
+        self._server = socket.create_server(("127.0.0.1", 0))
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self._clients.append(client)
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        reader = client.makefile("rb")
+        try:
+            while True:
+                header = reader.readline()
+                if not header:
+                    return
+                args = []
+                for _ in range(int(header[1:-2])):
+                    size = int(reader.readline()[1:-2])
+                    args.append(reader.read(size + 2)[:-2].decode("utf-8"))
+                self.commands.append(args)
+                client.sendall(self._reply(args))
+        except OSError:
+            return
+
+    def _reply(self, args):
+        name = args[0].upper()
+        if name == "GET":
+            value = self.data.get(args[1])
+            if value is None:
+                return b"$-1\r\n"
+            data = value.encode("utf-8")
+            return b"$%d\r\n%s\r\n" % (len(data), data)
+        if name == "SET":
+            self.data[args[1]] = args[2]
+            return b"+OK\r\n"
+        if name == "DEL":
+            return b":%d\r\n" % int(self.data.pop(args[1], None) is not None)
+        if name in ("AUTH", "SELECT"):
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name.encode()
+
+    def drop_clients(self):
+        """Close every open connection, like a server restart or an idle timeout."""
+        for client in self._clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+                client.close()
+            except OSError:
+                pass
+        self._clients = []
+
+    def close(self):
+        self.drop_clients()
+        self._server.close()
+
+
+@pytest.fixture
+def server():
+    stand_in = RespStandIn()
+    yield stand_in
+    stand_in.close()
+
+
+def test_get_set_delete_round_trip(server):
+    backend = RedisBackend(server.url, timeout=2)
+    assert backend.get("missing") is None
+    backend.set("city", "Goa – ₹20k", ttl=60)
+    assert backend.get("city") == "Goa – ₹20k"
+    assert ["SET", "city", "Goa – ₹20k", "EX", "60"] in server.commands
+    backend.delete("city")
+    assert backend.get("city") is None
+
+
+def test_ttl_is_at_least_one_second(server):
+    RedisBackend(server.url, timeout=2).set("k", "v", ttl=0.2)
+    assert server.commands[-1] == ["SET", "k", "v", "EX", "1"]
+
+
+def test_error_reply_raises(server):
+    with pytest.raises(CacheBackendError, match="unknown command"):
+        RedisBackend(server.url, timeout=2).command("NOPE")
+
+
+def test_reconnects_once_after_the_server_drops_the_connection(server):
+    backend = RedisBackend(server.url, timeout=2)
+    backend.set("k", "v", ttl=60)
+    server.drop_clients()
+    assert backend.get("k") == "v"
+    assert server.connections == 2
+
+
+def test_auth_and_select_on_connect(server):
+    backend = RedisBackend(f"redis://:s%40cret@127.0.0.1:{server.port}/3", timeout=2)
+    backend.get("k")
+    assert server.commands[:2] == [["AUTH", "s@cret"], ["SELECT", "3"]]
+
+
+def test_unreachable_server_raises_oserror():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    with pytest.raises(OSError):
+        RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=0.5).get("k")
+
+
+def test_reads_nested_arrays_and_nil():
+    backend = RedisBackend("redis://127.0.0.1:1/0")
+    reader = io.BytesIO(b"*3\r\n$3\r\nfoo\r\n:7\r\n*-1\r\n")
+    assert backend._read(reader) == ["foo", 7, None]
+
+
+def test_truncated_reply_is_a_connection_error():
+    with pytest.raises(ConnectionError):
+        RedisBackend("redis://127.0.0.1:1/0")._read(io.BytesIO(b"+OK"))
+
+
+def _keys(n=3000):
+    return [f"key-{i}" for i in range(n)]
+
+
+def test_sharding_is_stable_and_balanced():
+    shards = [LRUBackend() for _ in range(3)]
+    ring = ShardedBackend(shards)
+    again = ShardedBackend(shards)
+    counts = {id(shard): 0 for shard in shards}
+    for key in _keys():
+        assert ring.shard_for(key) is again.shard_for(key)
+        counts[id(ring.shard_for(key))] += 1
+    assert all(600 < count < 1400 for count in counts.values())
+
+
+def test_adding_a_shard_remaps_about_a_quarter_of_the_keys():
+    shards = [LRUBackend() for _ in range(4)]
+    before = ShardedBackend(shards[:3])
+    after = ShardedBackend(shards)
+    moved = [key for key in _keys() if before.shard_for(key) is not after.shard_for(key)]
+    assert 0.15 < len(moved) / len(_keys()) < 0.35
+    # Keys only move onto the new node, never between the old ones
+    assert all(after.shard_for(key) is shards[3] for key in moved)
+
+
+def test_sharded_get_set_reach_the_owning_shard():
+    shards = [LRUBackend() for _ in range(3)]
+    ring = ShardedBackend(shards)
+    ring.set("trip", "goa", ttl=60)
+    assert ring.shard_for("trip").get("trip") == "goa"
+    assert ring.get("trip") == "goa"
+    ring.delete("trip")
+    assert ring.get("trip") is None
+
+
+def test_get_or_compute_async_caches_off_the_event_loop(monkeypatch):
+    shared = LRUBackend()
+    monkeypatch.setattr(cache_backend, "get_shared_backend", lambda: shared)
+    cache = NamespacedCache("test", ttl=60)
+    threads = []
+    get = shared.get
+
+    def recording_get(key):
+        threads.append(threading.current_thread())
+        return get(key)
+
+    monkeypatch.setattr(shared, "get", recording_get)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"answer": 42}
+
+    assert asyncio.run(cache.get_or_compute_async("k", compute)) == {"answer": 42}
+    cache.local = LRUBackend()  # force the second lookup through the shared backend
+    assert asyncio.run(cache.get_or_compute_async("k", compute)) == {"answer": 42}
+    assert len(calls) == 1
+    assert threads and threading.main_thread() not in threads
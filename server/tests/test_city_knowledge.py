@@ -0,0 +1,77 @@
+import os
+import time
+
+import pytest
+
+from features.reddit_scraper import city_knowledge
+from features.reddit_scraper.city_knowledge import CityKnowledgeStore, build_city_knowledge
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "city_knowledge.sqlite3")
+
+
+def test_latest_resolves_places_to_the_newest_version(path):
+    store = CityKnowledgeStore(path)
+    assert store.latest("Goa") is None
+    store.put("Goa", "v1 tips", 10)
+    store.put("Goa", "v2 tips", 12)
+    store.put("New Delhi", "delhi tips", 8)
+    assert store.latest("Goa") == "v2 tips"
+    assert store.latest("North Goa!") == "v2 tips"
+    assert store.latest("Delhi") == "delhi tips"
+    assert store.latest("") is None
+
+
+def test_only_the_last_versions_are_kept(path, monkeypatch):
+    monkeypatch.setattr(city_knowledge, "CITY_KNOWLEDGE_KEEP_VERSIONS", 2)
+    store = CityKnowledgeStore(path)
+    for i in range(4):
+        store.put("Goa", f"v{i + 1}", i)
+    assert [row[1] for row in store.versions()] == [3, 4]
+
+
+def test_stale_summaries_are_ignored(path, monkeypatch):
+    store = CityKnowledgeStore(path)
+    store.put("Goa", "tips", 10)
+    monkeypatch.setattr(city_knowledge, "CITY_KNOWLEDGE_MAX_AGE_DAYS", 1)
+    monkeypatch.setattr(time, "time", lambda: 10 ** 12)
+    assert store.latest("Goa") is None
+
+
+def test_reloads_when_another_process_writes(path):
+    reader = CityKnowledgeStore(path)
+    # Backdate the file so the write below cannot land in the same mtime tick
+    os.utime(path, (1, 1))
+    assert reader.latest("Goa") is None
+    # A separate instance stands in for the nightly build process
+    CityKnowledgeStore(path).put("Goa", "fresh tips", 5)
+    assert reader.latest("Goa") == "fresh tips"
+    loaded = reader._loaded_mtime
+    assert reader.latest("Goa") == "fresh tips"
+    assert reader._loaded_mtime == loaded
+
+
+def test_build_keeps_the_previous_version_on_failure(path, monkeypatch):
+    store = CityKnowledgeStore(path)
+    store.put("Jaipur", "old tips", 3)
+
+    def summarize(city):
+        if city == "Kochi":
+            raise RuntimeError("reddit down")
+        return ("", 0) if city == "Jaipur" else (f"{city} tips", 7)
+
+    monkeypatch.setattr(city_knowledge, "summarize_city", summarize)
+    assert build_city_knowledge(["Goa", "Jaipur", "Kochi"], workers=2, store=store) == (1, 2)
+    assert store.latest("Goa") == "Goa tips"
+    assert store.latest("Jaipur") == "old tips"
+    assert store.latest("Kochi") is None
+
+
+def test_list_command_prints_every_version(path, monkeypatch, capsys):
+    CityKnowledgeStore(path).put("Goa", "tips", 4)
+    monkeypatch.setattr(city_knowledge, "CityKnowledgeStore", lambda: CityKnowledgeStore(path))
+    city_knowledge.main(["list"])
+    out = capsys.readouterr().out
+    assert "Goa" in out and "v1" in out and "4 posts" in out
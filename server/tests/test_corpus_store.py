@@ -0,0 +1,120 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from features.reddit_scraper.corpus_store import CorpusStore, place_key
+
+
+def _post(post_id, score, created_utc, comments=None, comments_failed=False):
+    return {"id": post_id, "title": f"{post_id} title", "score": score, "created_utc": created_utc,
+            "comments": comments, "comments_failed": comments_failed}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CorpusStore(str(tmp_path / "reddit_corpus.sqlite3"))
+
+
+def test_posts_are_served_by_score_with_their_comments(store):
+    store.add("goa", [
+        _post("a", 5, 100.0, [("c1", "Go to Palolem", 9), ("c2", "Skip Baga", 2)]),
+        _post("b", 50, 200.0, []),
+        _post("c", 20, 150.0),
+    ], crawl_limit=10)
+    assert store.posts("goa", 2) == [
+        {"title": "b title", "score": 50, "comments": [], "comment_scores": []},
+        {"title": "c title", "score": 20, "comments": [], "comment_scores": []},
+    ]
+    assert store.posts("goa", 3)[2]["comments"] == ["Go to Palolem", "Skip Baga"]
+    assert store.posts("jaipur", 3) == []
+
+
+def test_watermark_and_limit_only_move_forward(store):
+    assert store.crawl("goa") is None
+    store.add("goa", [_post("a", 1, 300.0)], crawl_limit=25)
+    store.add("goa", [_post("b", 1, 100.0)], crawl_limit=10)
+    crawl = store.crawl("goa")
+    assert crawl["watermark"] == 300.0
+    assert crawl["crawl_limit"] == 25
+
+
+def test_unhydrated_posts_and_failed_fetch_backoff(store):
+    store.add("goa", [_post("a", 3, 1.0), _post("b", 2, 1.0, comments_failed=True), _post("c", 1, 1.0, [])])
+    assert store.unhydrated("goa", 10) == ["a", "b"]
+    assert store.unhydrated("goa", 10, retry_after=3600) == ["a"]
+    store.set_comments({"a": [("c1", "Try the fish thali", 4)]})
+    store.mark_attempted(["a"])
+    assert store.unhydrated("goa", 10) == ["b"]
+    assert store.posts("goa", 1)[0]["comments"] == ["Try the fish thali"]
+
+
+def test_place_key():
+    assert place_key("  North   Goa ") == "north goa"
+
+
+def _submission(post_id, score, created_utc):
+    return SimpleNamespace(id=post_id, title=f"{post_id} title", score=score, created_utc=created_utc,
+                           subreddit="goa", selftext="goa trip")
+
+
+@pytest.fixture
+def searches():
+    """Watermarks of the Reddit searches made, None for a full crawl."""
+    return []
+
+
+@pytest.fixture
+def release_refresh():
+    """Set to let a background refresh's search return."""
+    return threading.Event()
+
+
+@pytest.fixture
+def scraper(store, searches, release_refresh, monkeypatch):
+    pytest.importorskip("praw")
+    pytest.importorskip("dotenv")
+    pytest.importorskip("httpx")
+    pytest.importorskip("google.genai")
+    from features.reddit_scraper import scraper
+
+    listings = {None: [_submission("old1", 10, 100.0), _submission("old2", 5, 90.0)],
+                100.0: [_submission("new1", 50, 200.0)]}
+
+    def search(place, limit, stop_at, watermark=None):
+        searches.append(watermark)
+        if watermark is not None:
+            release_refresh.wait(5)
+        return listings.get(watermark, []), "all", 1
+
+    monkeypatch.setattr(scraper, "get_corpus_store", lambda: store)
+    monkeypatch.setattr(scraper, "_search", search)
+    monkeypatch.setattr(scraper, "_hydrate", lambda ids, stop_at: ({i: [(f"{i}-c", f"about {i}", 1)] for i in ids}, set()))
+    return scraper
+
+
+def test_a_place_seen_before_is_served_from_the_corpus(scraper, searches):
+    first = scraper.fetch_reddit_comments("Goa", limit=5)
+    second = scraper.fetch_reddit_comments("goa", limit=5)
+    assert [post["title"] for post in first] == ["old1 title", "old2 title"]
+    assert second == first
+    assert searches == [None]
+
+
+def test_stale_places_refresh_in_the_background(scraper, searches, release_refresh, store, monkeypatch):
+    scraper.fetch_reddit_comments("Goa", limit=5)
+    monkeypatch.setattr(scraper, "REDDIT_REFRESH_SECONDS", 0)
+    time.sleep(0.01)
+
+    served = scraper.fetch_reddit_comments("Goa", limit=5)
+    # The stale corpus answers at once; the refresh only pulls posts newer than the watermark
+    assert [post["title"] for post in served] == ["old1 title", "old2 title"]
+    release_refresh.set()
+    for _ in range(200):
+        if not scraper._refreshing and len(store.posts("goa", 5)) == 3:
+            break
+        time.sleep(0.01)
+    assert searches == [None, 100.0]
+    assert [post["title"] for post in store.posts("goa", 5)] == ["new1 title", "old1 title", "old2 title"]
+    assert store.crawl("goa")["watermark"] == 200.0
@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+import deadline
+from deadline import DeadlineExceeded, clamp_timeout, deadline_scope, remaining, within_budget
+
+
+def test_no_deadline_outside_a_scope():
+    assert remaining() is None
+    assert clamp_timeout(30) == 30
+    assert clamp_timeout(None) is None
+
+
+def test_timeouts_shrink_to_the_remaining_budget():
+    with deadline_scope(10):
+        assert 9 < clamp_timeout(30) <= 10
+        assert clamp_timeout(5) == 5
+        assert 9 < clamp_timeout(None) <= 10
+
+
+def test_nested_scopes_only_tighten():
+    with deadline_scope(10):
+        with deadline_scope(60):
+            assert remaining() <= 10
+        with deadline_scope(2):
+            assert remaining() <= 2
+    assert remaining() is None
+
+
+def test_spent_budget_raises_deadline_exceeded(monkeypatch):
+    monkeypatch.setattr(deadline, "LLM_MIN_CALL_SECONDS", 1.5)
+    with deadline_scope(1):
+        with pytest.raises(DeadlineExceeded, match="parser"):
+            clamp_timeout(30, "parser")
+    with deadline_scope(0):
+        with pytest.raises(DeadlineExceeded):
+            clamp_timeout(None)
+
+
+def test_within_budget_falls_back_when_time_runs_out():
+    async def slow():
+        await asyncio.sleep(1)
+        return "done"
+
+    async def out_of_budget():
+        clamp_timeout(30, "summarizer")
+        return "done"
+
+    async def main():
+        with deadline_scope(0.05):
+            timed_out = await within_budget(slow(), "fallback")
+        with deadline_scope(10):
+            reserved = await within_budget(slow(), "fallback", reserve=10)
+        with deadline_scope(1):
+            skipped = await within_budget(out_of_budget(), "fallback")
+        with deadline_scope(10):
+            finished = await within_budget(asyncio.sleep(0, "done"), "fallback")
+        return timed_out, reserved, skipped, finished
+
+    assert asyncio.run(main()) == ("fallback", "fallback", "fallback", "done")
+
+
+def test_tasks_inherit_the_deadline():
+    async def main():
+        with deadline_scope(5):
+            return await asyncio.create_task(asyncio.to_thread(remaining))
+
+    assert 4 < asyncio.run(main()) <= 5
@@ -0,0 +1,56 @@
+from features.reddit_scraper.dedup import dedup_posts, minhash_signatures, near_duplicates, shingles
+
+
+def test_shingles_ignore_case_punctuation_and_one_letter_tokens():
+    assert shingles("+1, go to Baga beach!!") == shingles("Go to baga beach")
+    assert shingles("") == set()
+
+
+def test_identical_shingle_sets_get_identical_signatures():
+    signatures = minhash_signatures([shingles("try the fish thali at Ritz"), shingles("Try the fish thali at Ritz!")])
+    assert (signatures[0] == signatures[1]).all()
+
+
+def test_keeps_the_best_voted_copy_of_each_group():
+    texts = [
+        "+1, go to Baga beach",
+        "Go to baga beach!!",
+        "go to Baga beach",
+        "Dudhsagar falls is worth the jeep ride in monsoon",
+        "Avoid Calangute on weekends, far too crowded",
+    ]
+    duplicates = near_duplicates(texts, priority=[1, 40, 3, 10, 5])
+    assert duplicates == {0, 2}
+
+
+def test_distinct_comments_are_all_kept():
+    texts = [
+        "Fort Aguada at sunset is beautiful",
+        "Rent a scooter, buses are slow",
+        "Cafe Bodega in Panjim has great coffee",
+    ]
+    assert near_duplicates(texts) == set()
+
+
+def test_without_priority_the_first_copy_wins():
+    assert near_duplicates(["lol", "lol", "this is a different comment"]) == {1}
+
+
+def test_dedup_posts_keeps_scores_aligned_across_posts():
+    posts = [
+        {"title": "Goa tips", "comments": ["go to Baga beach", "Rent a scooter in Goa"], "comment_scores": [2, 7]},
+        {"title": "Goa again", "comments": ["Go to Baga beach!", "Palolem is quieter"], "comment_scores": [30, 4]},
+    ]
+    deduped = dedup_posts(posts, "Goa")
+    assert deduped[0]["comments"] == ["Rent a scooter in Goa"]
+    assert deduped[0]["comment_scores"] == [7]
+    assert deduped[1]["comments"] == ["Go to Baga beach!", "Palolem is quieter"]
+    assert deduped[1]["comment_scores"] == [30, 4]
+    assert deduped[0]["title"] == "Goa tips"
+
+
+def test_dedup_posts_without_scores_or_comments():
+    posts = [{"title": "a", "comments": ["same tip here", "same tip here"]}, {"title": "b", "comments": None}]
+    deduped = dedup_posts(posts)
+    assert deduped[0]["comments"] == ["same tip here"]
+    assert deduped[1]["comments"] == []
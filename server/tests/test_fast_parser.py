@@ -0,0 +1,80 @@
+import pytest
+
+from features.itinerary_generation.fast_parser import extract_trip_fields, unparsed_content
+
+
+def test_plain_request():
+    found, ambiguous = extract_trip_fields("3 days in Goa under 20k for 2 people")
+    assert found == {"location": "Goa", "duration_days": 3, "budget": 20000, "num_travelers": 2}
+    assert ambiguous == set()
+    assert unparsed_content("3 days in Goa under 20k for 2 people") == []
+
+
+@pytest.mark.parametrize("text, field, value", [
+    ("a week in Bombay", "location", "Mumbai"),
+    ("from Mumbai to Goa for 4 days", "location", "Goa"),
+    ("2 weeks in Jaipur", "duration_days", 14),
+    ("weekend in Pune", "duration_days", 2),
+    ("budget of 1.5 lakh", "budget", 150000),
+    ("Rs 40,000 total", "budget", 40000),
+    ("honeymoon with my wife", "num_travelers", 2),
+    ("solo backpacking", "num_travelers", 1),
+    ("trip in December", "when", "in december"),
+    ("non veg food please", "food_preferences", "non-veg"),
+    ("price including flights", "include_travel_costs", "true"),
+])
+def test_single_fields(text, field, value):
+    found, _ = extract_trip_fields(text)
+    assert found[field] == value
+
+
+def test_conflicting_mentions_are_ambiguous():
+    _, ambiguous = extract_trip_fields("Goa or Jaipur, 3 days or 5 days, 20k or 30k")
+    assert ambiguous == {"location", "duration_days", "budget"}
+
+
+def test_small_numbers_are_not_budgets():
+    found, _ = extract_trip_fields("3 days in Goa for 4 people")
+    assert "budget" not in found
+
+
+def test_party_of_is_not_nightlife():
+    found, _ = extract_trip_fields("A 4 day trip to Goa for a party of 6 with Rs 40000")
+    assert "themes" not in found
+    found, _ = extract_trip_fields("beach parties in Goa")
+    assert "nightlife" in found["themes"]
+
+
+@pytest.mark.parametrize("text", [
+    "2 days in Goa under 20k, want to visit Dudhsagar falls and avoid crowded beaches",
+    "A 4 day trip to Goa for a party of 6 with Rs 40000",
+    "3 days in Goa under 20k for 2 people, I am diabetic",
+    "3 days in Goa under 20k with my parents",
+    "3 days in Goa under 20k, no seafood",
+    "3 days in Goa, 10k per person for 4 people",
+    "3 days in Goa under 20k per day for 2 people",
+    "3 days in Goa under 20k, 2 adults and 2 kids",
+])
+def test_requests_that_need_the_llm(text):
+    assert unparsed_content(text)
+
+
+@pytest.mark.parametrize("text", [
+    "Plan a 5 day trip to Jaipur with a budget of 30000 for 2 people, heritage and food, relaxed pace",
+    "honeymoon with my wife in Udaipur for 4 days, budget 50k, luxury hotels",
+    "weekend in Mumbai under 10k, nightlife, by train, including train tickets",
+])
+def test_requests_the_extractor_reads_completely(text):
+    assert unparsed_content(text) == []
+
+
+def test_fast_parse_user_input_falls_back_and_keeps_unspecified_fields():
+    pytest.importorskip("httpx")
+    pytest.importorskip("google.genai")
+    from features.itinerary_generation.llm_parser import fast_parse_user_input, find_missing_fields
+
+    parsed = fast_parse_user_input("3 days in Goa under 20k for 2 people")
+    assert parsed["location"] == "Goa"
+    assert parsed["include_travel_costs"] == "unspecified"
+    assert "include_travel_costs" in find_missing_fields(parsed)
+    assert fast_parse_user_input("2 days in Goa under 20k, want to visit Dudhsagar falls") is None
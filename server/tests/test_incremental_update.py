@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("google.genai")
+
+import llm_client
+from llm_backends import SyntheticBackend
+from features.itinerary_generation.incremental_update import (
+    affected_days, days_mentioning_places, days_named_in_feedback, days_with_bad_weather, update_days,
+)
+
+
+def _itinerary():
+    places = ["Baga Beach", "Fort Aguada", "Dudhsagar Falls", "Old Goa churches"]
+    days = [
+        {"day": i, "morning": place, "afternoon": "Lunch in Panjim", "evening": "Sunset cruise", "estimated_cost": 2000}
+        for i, place in enumerate(places, start=1)
+    ]
+    return {"itinerary": days, "total_estimated_cost": 8000}
+
+
+@pytest.fixture(autouse=True)
+def synthetic_llm(monkeypatch):
+    monkeypatch.setattr(llm_client, "_BACKEND", SyntheticBackend(latency_ms=0))
+
+
+@pytest.mark.parametrize("feedback, days", [
+    ("make day 2 and 3 more relaxed", {2, 3}),
+    ("swap days 1-2 around", {1, 2}),
+    ("days 1, 3 & 4 need indoor plans", {1, 3, 4}),
+    ("the second day is too long", {2}),
+    ("replace the last day", {4}),
+    ("day 9 please", set()),
+])
+def test_days_named_in_feedback(feedback, days):
+    assert days_named_in_feedback(feedback, 4) == days
+
+
+def test_days_mentioning_places():
+    days = _itinerary()["itinerary"]
+    assert days_mentioning_places("Replace Fort Aguada with something else", days) == {2}
+    assert days_mentioning_places("Please add more food", days) == set()
+
+
+@pytest.mark.parametrize("feedback", [
+    "make it cheaper",
+    "more relaxed every day",
+    "change the whole trip to the north",
+    "add more cafes",
+])
+def test_trip_wide_or_unplaced_feedback_rewrites_everything(feedback):
+    assert affected_days(_itinerary(), feedback) is None
+
+
+def test_trip_level_change_for_a_named_day_stays_incremental():
+    assert affected_days(_itinerary(), "make day 2 cheaper") == {2}
+
+
+def test_bad_weather_days():
+    forecast = [
+        {"day": 1, "condition": "Sunny", "rain_chance": 10},
+        {"day": 2, "condition": "Patchy rain possible", "rain_chance": 40},
+        {"day": 3, "condition": "Cloudy", "rain_chance": 80},
+        {"day": 4, "condition": "Sunny", "rain_chance": 0},
+    ]
+    assert days_with_bad_weather(forecast) == {2, 3}
+    # Against an earlier forecast only the days that turned bad count
+    previous = [{"day": 2, "condition": "Heavy rain", "rain_chance": 90}]
+    assert days_with_bad_weather(forecast, previous) == {3}
+    assert affected_days(_itinerary(), "", forecast) == {2, 3}
+    assert affected_days(_itinerary(), "swap day 4", forecast) == {2, 3, 4}
+
+
+def test_update_days_splices_regenerated_days_and_recomputes_the_total():
+    itinerary = _itinerary()
+    before = json.dumps(itinerary["itinerary"][0])
+    updated = update_days(itinerary, {2, 3}, "more indoor plans")
+
+    assert [day["day"] for day in updated["itinerary"]] == [1, 2, 3, 4]
+    assert updated["itinerary"][0] is itinerary["itinerary"][0]
+    assert json.dumps(updated["itinerary"][0]) == before
+    assert updated["itinerary"][1]["morning"].startswith("Museum visit")
+    assert updated["itinerary"][3] is itinerary["itinerary"][3]
+    # The synthetic day costs 3000, so each regenerated day adds 1000
+    assert updated["total_estimated_cost"] == 10000
+    assert itinerary["total_estimated_cost"] == 8000
+
+
+def test_update_days_with_nothing_to_do_returns_the_itinerary():
+    itinerary = _itinerary()
+    assert update_days(itinerary, set()) is itinerary
+    assert update_days(itinerary, {9}) is itinerary
@@ -0,0 +1,60 @@
+import json
+
+from features.itinerary_generation.itinerary_stream import IncrementalArrayParser
+
+DOCUMENT = {
+    "itinerary": [
+        {"day": 1, "activities": [{"name": "Fort {Aguada}", "note": "bring \"water\" [1L]"}]},
+        {"day": 2, "activities": []},
+        {"day": 3, "activities": [{"name": "Baga"}]},
+    ],
+    "total_estimated_cost": 18000,
+}
+
+
+def _feed_in_chunks(parser, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(parser.feed(text[i:i + size]))
+    return items
+
+
+def test_yields_every_item_whatever_the_chunk_size():
+    text = json.dumps(DOCUMENT)
+    for size in (1, 7, 64, len(text)):
+        parser = IncrementalArrayParser("itinerary")
+        assert _feed_in_chunks(parser, text, size) == DOCUMENT["itinerary"]
+        assert parser.done
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    parser = IncrementalArrayParser("itinerary")
+    assert parser.feed('{"itinerary": [{"day": 1}, {"da') == [{"day": 1}]
+    assert not parser.done
+    assert parser.feed('y": 2}]}') == [{"day": 2}]
+    assert parser.done
+
+
+def test_ignores_code_fences_and_prose():
+    text = "Here is your plan:\n```json\n" + json.dumps(DOCUMENT) + "\n```"
+    assert IncrementalArrayParser().feed(text) == DOCUMENT["itinerary"]
+
+
+def test_ignores_other_arrays_and_nested_keys_with_the_same_name():
+    text = json.dumps({
+        "notes": [{"day": 0}],
+        "meta": {"itinerary": [{"day": -1}]},
+        "itinerary": [{"day": 1}],
+    })
+    assert IncrementalArrayParser().feed(text) == [{"day": 1}]
+
+
+def test_key_not_followed_by_an_array():
+    parser = IncrementalArrayParser()
+    assert parser.feed('{"itinerary": "none", "days": [{"day": 1}]}') == []
+    assert not parser.done
+
+
+def test_skips_a_malformed_item():
+    parser = IncrementalArrayParser()
+    assert parser.feed('{"itinerary": [{"day": 1,}, {"day": 2}]}') == [{"day": 2}]
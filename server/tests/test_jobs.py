@@ -0,0 +1,161 @@
+import asyncio
+import time
+from contextlib import closing
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+import jobs
+from jobs import JobQueue, JobWorkers, check_webhook_url, notify_webhook
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.sqlite3"))
+
+
+def _age(queue, job_id, seconds):
+    with closing(queue._connect()) as conn:
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - seconds, job_id))
+
+
+def test_jobs_are_claimed_oldest_first_and_finish(queue):
+    first = queue.submit("plan", {"prompt": "Goa"})
+    second = queue.submit("plan", {"prompt": "Jaipur"})
+    job = queue.claim()
+    assert job == {"id": first, "kind": "plan", "payload": {"prompt": "Goa"}, "webhook_url": None}
+    assert queue.get(first)["status"] == "running"
+    assert queue.get(second)["status"] == "queued"
+
+    queue.add_progress(first, {"stage": "parse", "status": "done"})
+    queue.finish(first, {"itinerary": []})
+    done = queue.get(first)
+    assert done["status"] == "done"
+    assert done["result"] == {"itinerary": []}
+    assert [event["stage"] for event in done["progress"]] == ["parse"]
+    assert queue.get("missing") is None
+
+
+def test_expired_lease_requeues_then_fails_once_out_of_attempts(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_LEASE_SECONDS", 60)
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 2)
+    job_id = queue.submit("plan", {})
+
+    queue.claim()
+    queue.recover()
+    assert queue.get(job_id)["status"] == "running"  # lease still held
+
+    _age(queue, job_id, 120)
+    queue.recover()
+    assert queue.get(job_id)["status"] == "queued"
+
+    assert queue.claim()["id"] == job_id
+    _age(queue, job_id, 120)
+    queue.recover()
+    lost = queue.get(job_id)
+    assert lost["status"] == "failed"
+    assert lost["attempts"] == 2
+    assert queue.claim() is None
+
+
+def test_finished_jobs_are_pruned_after_their_ttl(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_TTL_SECONDS", 60)
+    job_id = queue.submit("plan", {})
+    queue.claim()
+    queue.fail(job_id, "boom")
+    _age(queue, job_id, 120)
+    queue.recover()
+    assert queue.get(job_id) is None
+
+
+@pytest.mark.parametrize("url", [
+    "ftp://example.com/hook",
+    "http://127.0.0.1/hook",
+    "http://localhost:8000/hook",
+    "http://10.0.0.5/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::1]/hook",
+    "http://[::ffff:127.0.0.1]/hook",
+])
+def test_webhooks_to_non_public_addresses_are_rejected(url):
+    with pytest.raises(ValueError):
+        check_webhook_url(url)
+
+
+def test_webhook_host_allow_list(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_WEBHOOK_ALLOWED_HOSTS", {"hooks.example.com"})
+    with pytest.raises(ValueError, match="not allowed"):
+        check_webhook_url("https://other.example.com/hook")
+
+
+def _mock_webhooks(monkeypatch, statuses):
+    """Serve webhook POSTs from `statuses` in order, without DNS checks or backoff sleeps."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(statuses[len(calls) - 1])
+
+    client = httpx.AsyncClient
+    monkeypatch.setattr(jobs, "check_webhook_url", lambda url: None)
+    monkeypatch.setattr(jobs.httpx, "AsyncClient",
+                        lambda **kwargs: client(transport=httpx.MockTransport(handler), **kwargs))
+    sleep = asyncio.sleep
+    monkeypatch.setattr(asyncio, "sleep", lambda seconds: sleep(0))
+    return calls
+
+
+def test_webhook_retries_server_errors(monkeypatch):
+    calls = _mock_webhooks(monkeypatch, [503, 502, 200])
+    assert asyncio.run(notify_webhook("https://hooks.example.com/done", {"job_id": "1"}))
+    assert len(calls) == 3
+    assert calls[-1].headers["content-type"] == "application/json"
+
+
+def test_webhook_gives_up_after_its_attempts(monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_WEBHOOK_ATTEMPTS", 2)
+    calls = _mock_webhooks(monkeypatch, [500, 500, 500])
+    assert not asyncio.run(notify_webhook("https://hooks.example.com/done", {"job_id": "1"}))
+    assert len(calls) == 2
+
+
+def test_workers_run_jobs_and_record_progress(queue, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_POLL_SECONDS", 0.01)
+
+    async def plan(payload, report):
+        report({"stage": "parse", "status": "started"})
+        report({"stage": "parse", "status": "done"})
+        return {"location": payload["prompt"]}
+
+    async def broken(payload, report):
+        raise RuntimeError("no budget")
+
+    async def main():
+        workers = JobWorkers(queue, {"plan": plan, "broken": broken}, workers=2)
+        workers.start()
+        ok = await workers.submit("plan", {"prompt": "Goa"})
+        failed = await workers.submit("broken", {})
+        for _ in range(200):
+            if {queue.get(ok)["status"], queue.get(failed)["status"]} <= {"done", "failed"}:
+                break
+            await asyncio.sleep(0.01)
+        await workers.stop()
+        return queue.get(ok), queue.get(failed)
+
+    ok, failed = asyncio.run(main())
+    assert ok["status"] == "done"
+    assert ok["result"] == {"location": "Goa"}
+    assert [(event["stage"], event["status"]) for event in ok["progress"]] == [("parse", "started"), ("parse", "done")]
+    assert failed["status"] == "failed"
+    assert failed["error"] == "no budget"
+
+
+def test_submit_rejects_webhooks_before_queueing(queue):
+    async def main():
+        workers = JobWorkers(queue, {})
+        with pytest.raises(ValueError):
+            await workers.submit("plan", {}, webhook_url="http://127.0.0.1/hook")
+
+    asyncio.run(main())
+    assert queue.claim() is None
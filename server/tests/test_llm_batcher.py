@@ -0,0 +1,93 @@
+import asyncio
+import importlib
+import threading
+
+import pytest
+
+import llm_batcher
+from llm_batcher import AsyncLLMBatcher, LLMBatcher
+
+
+def _recording_send():
+    calls = []
+    lock = threading.Lock()
+
+    def send(prompt):
+        with lock:
+            calls.append(prompt)
+        return prompt.upper()
+
+    return send, calls
+
+
+def test_batching_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("LLM_BATCHING_ENABLED", raising=False)
+    try:
+        assert importlib.reload(llm_batcher).LLM_BATCHING_ENABLED is False
+    finally:
+        importlib.reload(llm_batcher)
+
+
+def test_identical_requests_in_a_window_are_sent_once():
+    send, calls = _recording_send()
+    batcher = LLMBatcher(send, max_wait_ms=50)
+    futures = [batcher.submit(prompt, prompt) for prompt in ["goa", "goa", "jaipur", "goa"]]
+    assert [future.result(timeout=5) for future in futures] == ["GOA", "GOA", "JAIPUR", "GOA"]
+    assert sorted(calls) == ["goa", "jaipur"]
+    assert batcher.stats.snapshot() == {"requests": 4, "batches": 1, "sent": 2, "coalesced": 2}
+
+
+def test_requests_nobody_waits_for_are_not_sent():
+    send, calls = _recording_send()
+    batcher = LLMBatcher(send, max_wait_ms=50)
+    abandoned = batcher.submit("goa", "goa")
+    assert abandoned.cancel()
+    kept = batcher.submit("jaipur", "jaipur")
+    assert kept.result(timeout=5) == "JAIPUR"
+    assert calls == ["jaipur"]
+
+
+def test_async_batcher_coalesces_and_skips_cancelled_waiters():
+    calls = []
+
+    async def send(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(0.01)
+        return prompt.upper()
+
+    async def main():
+        batcher = AsyncLLMBatcher(send, max_wait_ms=20)
+        abandoned = asyncio.ensure_future(batcher.submit("kochi", "kochi"))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        results = await asyncio.gather(*(batcher.submit(p, p) for p in ["goa", "goa", "jaipur"]))
+        return results, batcher.stats.snapshot()
+
+    results, stats = asyncio.run(main())
+    assert results == ["GOA", "GOA", "JAIPUR"]
+    assert sorted(calls) == ["goa", "jaipur"]
+    # The cancelled request counts as coalesced: it was never sent
+    assert stats["coalesced"] == 2
+
+
+@pytest.mark.parametrize("enabled, sends", [(True, 1), (False, 3)])
+def test_invoke_llm_async_coalesces_only_when_enabled(monkeypatch, enabled, sends):
+    pytest.importorskip("httpx")
+    pytest.importorskip("google.genai")
+    import llm_client
+    from llm_backends import SyntheticBackend
+
+    backend = SyntheticBackend(latency_ms=20)
+    calls = []
+    respond = backend.respond
+    monkeypatch.setattr(backend, "respond", lambda *args: calls.append(args) or respond(*args))
+    monkeypatch.setattr(llm_client, "_BACKEND", backend)
+    monkeypatch.setattr(llm_client, "LLM_BATCHING_ENABLED", enabled)
+
+    async def main():
+        return await asyncio.gather(*(llm_client.invoke_llm_async("Tips for Goa", call_site="summarizer")
+                                      for _ in range(3)))
+
+    responses = asyncio.run(main())
+    assert all("Goa" in response.text for response in responses)
+    assert len(calls) == sends
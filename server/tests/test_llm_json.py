@@ -0,0 +1,38 @@
+from llm_json import decode_llm_json, is_decodable
+
+
+def test_clean_and_fenced_json():
+    assert decode_llm_json('{"a": 1}') == {"a": 1}
+    assert decode_llm_json('```json\n[1, 2]\n```') == [1, 2]
+
+
+def test_repairs_outside_strings_only():
+    raw = 'Sure! {"tip": "None of the beaches, True story,}", "ok": True, "x": None, "days": [1, 2,],}'
+    assert decode_llm_json(raw) == {"tip": "None of the beaches, True story,}", "ok": True, "x": None, "days": [1, 2]}
+
+
+def test_smart_quotes_as_delimiters_and_inside_strings():
+    assert decode_llm_json('{“a”: “None here”, "b": False}') == {"a": "None here", "b": False}
+    assert decode_llm_json('{"s": "say “hi”", "t": None}') == {"s": "say “hi”", "t": None}
+
+
+def test_escaped_quotes_do_not_end_the_string():
+    assert decode_llm_json('{"q": "he said \\"None\\",}", "x": None,}') == {"q": 'he said "None",}', "x": None}
+
+
+def test_truncated_output_keeps_the_complete_items():
+    assert decode_llm_json('{"itinerary": [{"day": 1}, {"day": 2, "name": "Fo') == {"itinerary": [{"day": 1}]}
+    assert decode_llm_json('{"itinerary": [{"day": 1, "name": "Fort') == {"itinerary": [{"day": 1, "name": "Fort"}]}
+
+
+def test_expect_and_default():
+    assert decode_llm_json("[1]", expect=dict, default={}) == {}
+    assert decode_llm_json(None, default="fallback") == "fallback"
+    assert decode_llm_json("not json at all", default=None) is None
+
+
+def test_is_decodable():
+    assert is_decodable('{"a": 1,}', dict)
+    assert not is_decodable("[1]", dict)
+    assert not is_decodable("oops")
+    assert not is_decodable(None)
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import pytest
+
+from deadline import deadline_scope
+from pipeline import Pipeline, Stage, server_timing
+
+
+class DictMemo:
+    """In-memory stand-in for session_store.StageMemo."""
+
+    def __init__(self):
+        self.values = {}
+
+    def get(self, stage, inputs_key):
+        key = (stage, repr(inputs_key))
+        return (True, self.values[key]) if key in self.values else (False, None)
+
+    def set(self, stage, inputs_key, value):
+        self.values[(stage, repr(inputs_key))] = value
+
+
+def test_stages_receive_their_inputs_and_independent_ones_overlap():
+    async def slow(name):
+        await asyncio.sleep(0.1)
+        return name.upper()
+
+    async def weather(city):
+        return await slow(city)
+
+    async def posts(city):
+        return await slow(city + "!")
+
+    async def plan(weather, posts):
+        return f"{weather}/{posts}"
+
+    pipeline = Pipeline(
+        Stage("plan", plan, inputs=["weather", "posts"]),
+        Stage("weather", weather, inputs=["city"]),
+        Stage("posts", posts, inputs=["city"]),
+    )
+    start = time.perf_counter()
+    results, timings = asyncio.run(pipeline.run(city="goa"))
+    assert results["plan"] == "GOA/GOA!"
+    assert time.perf_counter() - start < 0.18
+    assert set(timings) == {"weather", "posts", "plan"}
+
+
+def test_plain_functions_run_in_threads():
+    pipeline = Pipeline(Stage("double", lambda x: x * 2, inputs=["x"]))
+    results, _ = asyncio.run(pipeline.run(x=21))
+    assert results["double"] == 42
+
+
+def test_unmet_inputs_and_duplicate_names_are_rejected():
+    with pytest.raises(ValueError, match="unmet inputs"):
+        asyncio.run(Pipeline(Stage("a", lambda missing: 1, inputs=["missing"])).run())
+    with pytest.raises(ValueError, match="Duplicate"):
+        Pipeline(Stage("a", lambda: 1), Stage("a", lambda: 2))
+
+
+def test_a_failing_stage_propagates_its_error():
+    async def fail(x):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(Pipeline(Stage("fail", fail, inputs=["x"])).run(x=1))
+
+
+def test_listener_sees_every_stage_start_and_finish():
+    events = []
+    pipeline = Pipeline(Stage("a", lambda x: x + 1, inputs=["x"]), Stage("b", lambda a: a + 1, inputs=["a"]))
+    asyncio.run(pipeline.run(listener=lambda stage, status, result: events.append((stage, status, result)), x=0))
+    assert events == [("a", "started", None), ("a", "done", 1), ("b", "started", None), ("b", "done", 2)]
+
+
+def test_memoized_stage_runs_once_per_key():
+    calls = []
+
+    async def parse(text):
+        calls.append(text)
+        return {"location": text}
+
+    pipeline = Pipeline(Stage("parsed", parse, inputs=["text"], memo=lambda text: text.lower().strip(" !")))
+    memo = DictMemo()
+    first, _ = asyncio.run(pipeline.run(memo=memo, text="Goa!"))
+    second, _ = asyncio.run(pipeline.run(memo=memo, text="  goa "))
+    asyncio.run(pipeline.run(memo=memo, text="Jaipur"))
+    assert first["parsed"] == second["parsed"] == {"location": "Goa!"}
+    assert calls == ["Goa!", "Jaipur"]
+
+
+def test_degraded_results_are_not_memoized():
+    calls = []
+
+    async def itinerary(parsed):
+        calls.append(parsed)
+        return {"itinerary": []}
+
+    pipeline = Pipeline(Stage("itinerary", itinerary, inputs=["parsed"], memo=lambda parsed: parsed,
+                              cacheable=lambda value: bool(value["itinerary"])))
+    memo = DictMemo()
+    asyncio.run(pipeline.run(memo=memo, parsed="goa"))
+    asyncio.run(pipeline.run(memo=memo, parsed="goa"))
+    assert len(calls) == 2
+    assert memo.values == {}
+
+
+def test_requests_with_distant_deadlines_do_not_share_a_stage():
+    calls = []
+
+    async def parse(text):
+        calls.append(text)
+        await asyncio.sleep(0.02)
+        return {"location": text}
+
+    pipeline = Pipeline(Stage("parsed", parse, inputs=["text"], memo=lambda text: text))
+
+    async def run(seconds):
+        with deadline_scope(seconds):
+            return await pipeline.run(text="goa")
+
+    async def same_deadline():
+        with deadline_scope(40):
+            await asyncio.gather(pipeline.run(text="goa"), pipeline.run(text="goa"))
+
+    async def distant_deadlines():
+        await asyncio.gather(run(40), run(400))
+
+    asyncio.run(same_deadline())
+    assert len(calls) == 1
+    asyncio.run(distant_deadlines())
+    assert len(calls) == 3
+
+
+def test_server_timing():
+    assert server_timing({"parsed": 0.0125, "plan": 1}) == "parsed;dur=12.5, plan;dur=1000.0"
+
@@ -0,0 +1,85 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("praw")
+pytest.importorskip("dotenv")
+pytest.importorskip("httpx")
+pytest.importorskip("google.genai")
+
+from features.reddit_scraper import scraper
+from features.reddit_scraper.scraper import RateLimiter
+
+
+def test_burst_then_refill_rate():
+    limiter = RateLimiter(per_minute=600, burst=3)
+    stop_at = time.monotonic() + 10
+    start = time.monotonic()
+    for _ in range(3):
+        assert limiter.acquire(stop_at)
+    assert time.monotonic() - start < 0.05
+    assert limiter.acquire(stop_at)
+    # The fourth token takes one refill interval (0.1s at 10 per second)
+    assert time.monotonic() - start >= 0.09
+
+
+def test_acquire_gives_up_when_no_token_frees_up_in_time():
+    limiter = RateLimiter(per_minute=60, burst=1)
+    assert limiter.acquire(time.monotonic() + 10)
+    start = time.monotonic()
+    assert not limiter.acquire(time.monotonic() + 0.2)
+    assert time.monotonic() - start < 0.05
+
+
+def test_concurrent_acquires_stay_within_the_bucket():
+    limiter = RateLimiter(per_minute=1200, burst=4)
+    granted = []
+    start = time.monotonic()
+    stop_at = start + 0.5
+
+    def take():
+        while limiter.acquire(stop_at):
+            granted.append(time.monotonic())
+
+    threads = [threading.Thread(target=take) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # burst + rate * elapsed, plus one for the token in flight at the deadline
+    assert len(granted) <= 4 + 20 * 0.5 + 1
+    assert max(granted) <= stop_at
+
+
+class _FakeReddit:
+    def __init__(self):
+        self.fetched = []
+        self._lock = threading.Lock()
+
+    def submission(self, id):
+        with self._lock:
+            self.fetched.append(id)
+        if id == "broken":
+            raise RuntimeError("403")
+        comment = SimpleNamespace(id=f"{id}-c1", body="Try the fish thali", score=5)
+        return SimpleNamespace(comments=SimpleNamespace(replace_more=lambda limit: None, list=lambda: [comment]))
+
+
+def test_hydration_stops_at_the_rate_limit_and_the_deadline(monkeypatch):
+    reddit = _FakeReddit()
+    monkeypatch.setattr(scraper, "_reddit", lambda: reddit)
+    monkeypatch.setattr(scraper, "rate_limiter", RateLimiter(per_minute=600, burst=2))
+    ids = ["broken"] + [f"post{i}" for i in range(20)]
+
+    start = time.monotonic()
+    comments, failed = scraper._hydrate(ids, start + 0.35)
+    elapsed = time.monotonic() - start
+
+    # 2 burst tokens plus 10 per second for 0.35s
+    assert len(reddit.fetched) <= 2 + 4 + 1
+    assert failed == ({"broken"} if "broken" in reddit.fetched else set())
+    assert 0 < len(comments) <= len(reddit.fetched) - len(failed)
+    assert all(value == [(f"{key}-c1", "Try the fish thali", 5)] for key, value in comments.items())
+    assert elapsed < 0.35 + 0.2
@@ -0,0 +1,75 @@
+import numpy as np
+
+from prompt_builder import CHARS_PER_TOKEN
+from features.reddit_scraper.selection import bm25_scores, select_corpus, tokenize
+
+
+def test_tokenize():
+    assert tokenize("Baga-Beach, 2 nights!") == ["baga", "beach", "2", "nights"]
+
+
+def test_bm25_ranks_documents_with_the_query_terms_first():
+    docs = [tokenize(text) for text in ("the weather was fine", "goa beach shacks", "goa goa beach beach shacks")]
+    scores = bm25_scores(docs, ["goa", "beach"])
+    assert scores[0] == 0
+    assert scores[2] > scores[1] > 0
+
+
+def test_bm25_query_weights_scale_the_terms():
+    docs = [tokenize("goa"), tokenize("beach"), tokenize("nothing here")]
+    scores = bm25_scores(docs, ["goa", "beach"], [2.0, 1.0])
+    assert scores[0] > scores[1]
+
+
+def test_bm25_handles_empty_input():
+    assert len(bm25_scores([], ["goa"])) == 0
+    assert np.array_equal(bm25_scores([["goa"]], []), np.zeros(1))
+
+
+def _tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def test_selection_stays_within_the_budget_and_prefers_relevant_items():
+    posts = [
+        {"title": "Goa trip report", "score": 50, "comments": [
+            "Baga beach in Goa was packed but the food at the shacks was great, try the fish thali",
+            "lol",
+            "My cat sat on the keyboard while I was reading this thread about something else entirely",
+        ], "comment_scores": [20, 300, 1]},
+        {"title": "Random question", "score": 1, "comments": ["Does anyone know a good laptop?"], "comment_scores": [1]},
+    ]
+    selected = select_corpus(posts, place="Goa", themes=["food"], budget=40)
+    assert _tokens(selected) <= 40
+    assert "fish thali" in selected
+    assert "laptop" not in selected
+
+
+def test_titles_come_along_once_per_post():
+    posts = [{"title": "Goa food", "comments": ["Goa fish curry rice", "Goa cafe culture"], "comment_scores": [5, 5]}]
+    selected = select_corpus(posts, place="Goa", budget=1000)
+    assert selected.splitlines() == ["Goa food", "- Goa fish curry rice", "- Goa cafe culture"]
+
+
+def test_an_item_that_does_not_fit_is_skipped_not_the_rest():
+    posts = [{"title": "Goa tips", "score": 10, "comments": [
+        "goa beach " * 200,
+        "short goa beach tip",
+        "another goa food tip",
+    ], "comment_scores": [100, 1, 1]}]
+    selected = select_corpus(posts, place="Goa", budget=40)
+    assert "short goa beach tip" in selected
+    assert "another goa food tip" in selected
+    assert _tokens(selected) <= 40
+
+
+def test_long_comments_are_cut():
+    posts = [{"title": "t", "comments": ["goa " * 5000]}]
+    selected = select_corpus(posts, place="Goa", budget=10_000)
+    assert selected.endswith("...")
+    assert len(selected) < 5000
+
+
+def test_nothing_to_select():
+    assert select_corpus([]) == ""
+    assert select_corpus([{"title": "  ", "comments": []}]) == ""
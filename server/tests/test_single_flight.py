@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight, normalize_text
+
+
+def test_single_flight_shares_one_execution():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"days": [1, 2]}
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do({"city": "goa"}, work) for _ in range(5)))
+        assert flight.in_flight() == 0
+        return results
+
+    results = asyncio.run(main())
+    assert calls == [1]
+    assert all(result == {"days": [1, 2]} for result in results)
+    # Followers get their own copies, so one route mutating its result cannot affect another
+    results[0]["days"].append(3)
+    assert results[1] == {"days": [1, 2]}
+
+
+def test_single_flight_runs_again_once_finished():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight("test")
+        return [await flight.do("k", work), await flight.do("k", work)]
+
+    assert asyncio.run(main()) == [1, 2]
+
+
+def test_single_flight_cancelled_follower_does_not_cancel_the_leader():
+    async def work():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        flight = SingleFlight("test")
+        leader = asyncio.ensure_future(flight.do("k", work))
+        follower = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "done"
+
+
+def test_single_flight_cancels_the_work_when_nobody_waits():
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        flight = SingleFlight("test")
+        caller = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.01)
+        return flight.in_flight()
+
+    assert asyncio.run(main()) == 0
+    assert cancelled == [True]
+
+
+def test_single_flight_errors_reach_every_caller():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("quota")
+
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(main())] == ["quota", "quota"]
+
+
+def test_normalize_text():
+    assert normalize_text("  3 Days in   GOA!! ") == "3 days in goa"
@@ -0,0 +1,264 @@
+"""
+Lightweight request tracing.
+
+Spans live in a contextvar, so children find their parent across `await`,
+asyncio tasks and asyncio.to_thread; work handed to a ThreadPoolExecutor
+keeps its parent when submitted through `propagate(func)`. Finished spans are
+batched to TRACE_EXPORT_PATH as JSON lines in the OTLP/JSON export format
+(one ExportTraceServiceRequest per line, like the OpenTelemetry Collector's
+file exporter), so the file can be replayed into any OTLP backend.
+"""
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT_PATH = os.getenv(
+    "TRACE_EXPORT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "traces.jsonl")
+)
+TRACE_FLUSH_SECONDS = float(os.getenv("TRACE_FLUSH_SECONDS", "1.0"))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "256"))
+# The export file is rotated at this size, keeping TRACE_BACKUPS older files (traces.jsonl.1, ...)
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "3"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "trip-planner-server")
+TRACE_HEADER = "X-Trace-Id"
+
+# OTLP SpanKind values
+KINDS = {"internal": 1, "server": 2, "client": 3}
+
+_CURRENT = contextvars.ContextVar("current_span", default=None)
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, kind="internal", parent=None, trace_id=None, parent_id=None, attributes=None):
+        self.trace_id = parent.trace_id if parent else (trace_id or secrets.token_hex(16))
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def to_otlp(self):
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": KINDS.get(self.kind, 1),
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class JsonlExporter:
+    """
+    Batches finished spans on a background thread and appends them to a JSONL
+    file, rotated once it passes `max_bytes` so at most `backups` old files stay.
+    """
+
+    def __init__(self, path=TRACE_EXPORT_PATH, max_bytes=TRACE_MAX_BYTES, backups=TRACE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._queue = queue.Queue()
+        threading.Thread(target=self._run, name="trace-exporter", daemon=True).start()
+
+    def export(self, span):
+        self._queue.put(span)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + TRACE_FLUSH_SECONDS
+            while len(batch) < TRACE_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch):
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", TRACE_SERVICE_NAME)]},
+            "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [span.to_otlp() for span in batch]}],
+        }]}
+        try:
+            self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(request, default=str) + "\n")
+        except OSError as e:
+            print(f"Trace export failed: {e}")
+
+    def _rotate(self):
+        if self.max_bytes <= 0 or not os.path.exists(self.path) or os.path.getsize(self.path) < self.max_bytes:
+            return
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        # traces.jsonl.2 -> .3, .1 -> .2, ...; the oldest is overwritten
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+_EXPORTER = None
+_EXPORTER_LOCK = threading.Lock()
+
+
+def _exporter():
+    global _EXPORTER
+    with _EXPORTER_LOCK:
+        if _EXPORTER is None:
+            _EXPORTER = JsonlExporter()
+    return _EXPORTER
+
+
+def current_span():
+    return _CURRENT.get()
+
+
+def current_trace_id():
+    span = _CURRENT.get()
+    return span.trace_id if span else None
+
+
+@contextmanager
+def span(name, kind="internal", traceparent=None, **attributes):
+    """
+    Time the block as a child of the current span (or a new trace).
+    `traceparent` (a W3C header value) continues a caller's trace for root spans.
+    Exceptions are recorded on the span and re-raised. With tracing disabled
+    the span is still yielded (so callers can set attributes) but not exported.
+    """
+    if not TRACING_ENABLED:
+        yield Span(name, kind, attributes=attributes)
+        return
+    parent = _CURRENT.get()
+    trace_id = parent_id = None
+    match = _TRACEPARENT.match(traceparent or "")
+    if parent is None and match:
+        trace_id, parent_id = match.group(1), match.group(2)
+    current = Span(name, kind, parent, trace_id, parent_id, attributes)
+    token = _CURRENT.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _CURRENT.reset(token)
+        current.end_ns = time.time_ns()
+        _exporter().export(current)
+
+
+def record(name, start_ns, kind="internal", error=None, **attributes):
+    """
+    Export an already finished child of the current span. For async generators,
+    where a span held open across `yield` could be closed from another context.
+    """
+    if not TRACING_ENABLED:
+        return
+    finished = Span(name, kind, _CURRENT.get(), attributes=attributes)
+    finished.start_ns = start_ns
+    finished.end_ns = time.time_ns()
+    finished.error = error
+    _exporter().export(finished)
+
+
+def traced(name=None, kind="internal", **attributes):
+    """Decorator form of span() for plain and coroutine functions."""
+    def decorate(func):
+        span_name = name or func.__qualname__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, kind, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, kind, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def propagate(func):
+    """Bind `func` to the current span, for work submitted to a thread pool."""
+    parent = _CURRENT.get()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _CURRENT.set(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _CURRENT.reset(token)
+    return wrapper
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware: one server span per HTTP request (covering streamed bodies
+    too), continuing an incoming `traceparent`, with the trace id returned in
+    the X-Trace-Id response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1")
+        name = f'{scope["method"]} {scope["path"]}'
+        with span(name, "server", traceparent=traceparent, **{"http.method": scope["method"], "http.target": scope["path"]}) as root:
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    root.set("http.status_code", message["status"])
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (TRACE_HEADER.lower().encode("latin-1"), root.trace_id.encode("latin-1"))
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)